@@ -0,0 +1,173 @@
+"""
+Срочные алерты по всплескам сигналов прямо при ингесте.
+
+На каждую пару (тема, страна) — кольцевой буфер поминутных счётчиков за
+окно ALERT_WINDOW_MIN; на тему — кольцо получасовых счётчиков за сутки
+(базовая линия). Новая строка — O(1): сдвиг кольца и инкремент. Правило:
+в окне не меньше ALERT_MIN_ITEMS сигналов темы из ALERT_BUCKETS со score >=
+ALERT_MIN_SCORE, из ALERT_MIN_COUNTRIES+ стран, и это в ALERT_BASELINE_X раз
+выше обычного для темы. После срабатывания тема молчит ALERT_COOLDOWN_MIN
+минут, если всплеск не вырос вдвое.
+
+Окно считается по времени ингеста, а не публикации: при адаптивном опросе
+(services/polling.py) строка приходит через минуты и часы после публикации,
+и по часам публикации сигналы одного всплеска в окно бы не попадали.
+Отбрасываются только строки, опубликованные раньше окна больше чем на
+ALERT_MAX_LAG_MIN (догоняющий ингест после простоя).
+"""
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+
+BASE_SLOT_MIN = 30
+BASE_SLOTS = 48  # сутки
+
+def _epoch(t: datetime) -> float:
+    # naive — это UTC (так пишет ингест)
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return t.timestamp()
+
+class Ring:
+    """Кольцо счётчиков по слотам фиксированной длины; сумма поддерживается инкрементально."""
+    __slots__ = ("slot_s", "counts", "head", "total")
+
+    def __init__(self, slots: int, slot_s: int):
+        self.slot_s = slot_s
+        self.counts = [0] * slots
+        self.head = None  # номер слота (эпоха // slot_s) последней записи
+        self.total = 0
+
+    def _advance(self, slot: int):
+        if self.head is None:
+            self.head = slot
+            return
+        n = len(self.counts)
+        steps = min(slot - self.head, n)
+        for k in range(1, steps + 1):  # не больше размера кольца
+            i = (self.head + k) % n
+            self.total -= self.counts[i]
+            self.counts[i] = 0
+        if slot > self.head:
+            self.head = slot
+
+    def add(self, ts: float, n: int = 1) -> bool:
+        slot = int(ts // self.slot_s)
+        if self.head is not None and slot <= self.head - len(self.counts):
+            return False  # старше окна
+        self._advance(slot)
+        self.counts[slot % len(self.counts)] += n
+        self.total += n
+        return True
+
+    def sum(self, now: float) -> int:
+        self._advance(int(now // self.slot_s))
+        return self.total
+
+    def mean_excluding_recent(self, now: float, recent: int) -> float:
+        """Среднее по слотам без последних recent (чтобы всплеск не завышал базу)."""
+        self._advance(int(now // self.slot_s))
+        n = len(self.counts)
+        recent_sum = sum(self.counts[(self.head - k) % n] for k in range(min(recent, n)))
+        return (self.total - recent_sum) / max(n - recent, 1)
+
+@dataclass
+class Alert:
+    bucket: str
+    count: int
+    countries: Dict[str, int]
+    baseline: float
+    titles: List[Tuple[str, str]]
+    at: datetime
+
+    @property
+    def key(self) -> str:
+        # ключ идемпотентности для outbox: тема + минута срабатывания
+        return f"alert:{self.bucket}:{self.at:%Y%m%d%H%M}"
+
+    def text(self) -> str:
+        cc = ", ".join(f"{c}×{n}" for c, n in sorted(self.countries.items(), key=lambda x: -x[1]))
+        lines = [f"⚠️ <b>AlertBox: всплеск «{self.bucket}»</b>",
+                 f"{self.count} сигналов за последние минуты: {cc} (обычно ~{self.baseline:.1f})"]
+        lines += [f"• {t} — {u}" for t, u in self.titles]
+        return "\n".join(lines)
+
+@dataclass
+class _BucketState:
+    countries: Dict[str, Ring] = field(default_factory=dict)
+    base: Ring = field(default_factory=lambda: Ring(BASE_SLOTS, BASE_SLOT_MIN * 60))
+    recent: deque = field(default_factory=lambda: deque(maxlen=5))  # (ts, title, url)
+    fired_at: float | None = None
+    fired_count: int = 0
+
+class BurstDetector:
+    def __init__(self, buckets: Iterable[str], window_min: int = 30, min_items: int = 3,
+                 min_countries: int = 2, min_score: int = 2, baseline_x: float = 3.0,
+                 cooldown_min: int = 120, max_lag_min: int = 180):
+        self.buckets = set(buckets)
+        self.window_min, self.min_items, self.min_countries = window_min, min_items, min_countries
+        self.min_score, self.baseline_x, self.cooldown_s = min_score, baseline_x, cooldown_min * 60
+        self.max_lag_s = max_lag_min * 60
+        self.state: Dict[str, _BucketState] = {}
+        self.suppressed = 0
+
+    def observe(self, row: Dict[str, Any], now: datetime | None = None) -> List[Alert]:
+        if int(row.get("score") or 0) < self.min_score:
+            return []
+        names = [b for b in (row.get("buckets") or row.get("bucket") or "").split(",") if b in self.buckets]
+        if not names:
+            return []
+        now = now or datetime.utcnow()
+        now_ts = _epoch(now)
+        if _epoch(row["published_at"]) < now_ts - self.window_min * 60 - self.max_lag_s:
+            return []  # старьё (догоняющий ингест после простоя) алертов не даёт
+        ts = now_ts  # в окно — по времени ингеста: опоздание опроса не выталкивает строку из окна
+        fired: List[Alert] = []
+        for b in names:
+            st = self.state.setdefault(b, _BucketState())
+            ring = st.countries.get(row.get("country") or "")
+            if ring is None:
+                ring = st.countries[row.get("country") or ""] = Ring(self.window_min, 60)
+            ring.add(ts)
+            st.base.add(ts)
+            st.recent.append((ts, row.get("title") or "", row.get("url") or ""))
+            # строка может попасть в несколько тем (граница + воздушное пространство) — алерт по каждой
+            alert = self._check(b, st, now)
+            if alert is not None:
+                fired.append(alert)
+        return fired
+
+    def prime(self, row: Dict[str, Any]):
+        """Только базовая линия (история после рестарта): без окон и алертов."""
+        if int(row.get("score") or 0) < self.min_score:
+            return
+        for b in (row.get("buckets") or row.get("bucket") or "").split(","):
+            if b in self.buckets:
+                self.state.setdefault(b, _BucketState()).base.add(_epoch(row["published_at"]))
+
+    def _check(self, bucket: str, st: _BucketState, now: datetime) -> Alert | None:
+        now_ts = _epoch(now)
+        per_country = {c: n for c, r in st.countries.items() if (n := r.sum(now_ts))}
+        count = sum(per_country.values())
+        if count < self.min_items or len(per_country) < self.min_countries:
+            return None
+        recent_slots = -(-self.window_min // BASE_SLOT_MIN)
+        # база — на окно той же длины
+        baseline = st.base.mean_excluding_recent(now_ts, recent_slots) * self.window_min / BASE_SLOT_MIN
+        if count < self.baseline_x * baseline:
+            return None
+        if st.fired_at is not None and now_ts - st.fired_at < self.cooldown_s and count < 2 * st.fired_count:
+            self.suppressed += 1
+            return None
+        st.fired_at, st.fired_count = now_ts, count
+        titles = [(t, u) for ts, t, u in reversed(st.recent) if ts >= now_ts - self.window_min * 60][:3]
+        return Alert(bucket, count, per_country, baseline, titles, now)
+
+    def stats(self) -> dict:
+        return {
+            "buckets": {b: {"fired_at": st.fired_at and datetime.fromtimestamp(st.fired_at, timezone.utc),
+                            "fired_count": st.fired_count} for b, st in self.state.items()},
+            "suppressed": self.suppressed,
+        }
@@ -0,0 +1,40 @@
+from typing import Any, Dict
+
+from .matcher import get_matcher
+
+# Классификация один раз при ингесте: результат лежит в колонках news_items
+# (score/bucket/country/org), отчёты фильтруют и сортируют уже в SQL.
+
+OFFICIAL = {"MFA","MOD","NATO","EEAS","EMBASSY","COUNCIL","GOV","PRES","AIRFORCE","DEFENCE"}
+
+def country_from_url(url: str) -> str:
+    u = (url or "").lower()
+    if "err.ee" in u or ".ee/" in u: return "EE"
+    if "lsm.lv" in u or ".lv/" in u: return "LV"
+    if ".lt/" in u: return "LT"
+    if ".pl/" in u: return "PL"
+    if ".fi/" in u: return "FI"
+    if "nato.int" in u: return "NATO"
+    if "europa.eu" in u or "consilium" in u: return "EU"
+    if ".ua/" in u or "ukr" in u: return "UA"
+    return "EU"
+
+def classify(title: str, url: str, raw: Dict[str, Any] | None,
+             src_country: str = "", src_org: str = "") -> Dict[str, Any]:
+    """
+    score/bucket(s)/country/org для одной новости; raw-поля важнее метаданных
+    источника. Текст сканируется один раз; если в raw нет релевантности
+    (raw["score"]), она проставляется по тому же проходу.
+    """
+    raw = raw if raw is not None else {}
+    m = get_matcher().scan(f"{title or ''} {raw.get('summary') or ''}", raw.get("transcript") or "")
+    if "score" not in raw:
+        raw["score"] = m.score
+    org = (raw.get("org") or src_org or "").upper()[:20]
+    score = int(raw.get("score", 0))
+    if org in OFFICIAL: score += 1
+    country = ((raw.get("country") or src_country or "").upper() or country_from_url(url))[:8]
+    return {
+        "score": score, "bucket": m.bucket, "buckets": ",".join(m.buckets)[:128],
+        "country": country, "org": org,
+    }
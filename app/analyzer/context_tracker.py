@@ -1,7 +1,7 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from typing import List, Dict
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import re
 
 # ---- классификаторы сигналов (темы) ----
@@ -66,3 +66,53 @@ def summarize_trends(signals: List[Sig], now: datetime, days: int = 14) -> str:
         top_cc = ", ".join(sorted(cc, key=cc.get, reverse=True)[:3]) or "-"
         lines.append(f"{b}: {trend}; top-countries: {top_cc}; count={len(arr)}")
     return "LocalTrends:\n" + "\n".join(sorted(lines))
+
+@dataclass
+class DayAgg:
+    day: date
+    bucket: str
+    country: str
+    count: int
+    weight_sum: float
+    weight_sq: float
+    t_sum: float
+    t_sq: float
+    tw_sum: float
+
+def summarize_aggregates(aggs: List[DayAgg], now: datetime, days: int = 14) -> str:
+    """
+    То же, что summarize_trends, но по дневным агрегатам: O(темы × дни).
+    Наклон — регрессия веса по времени публикации; x нормирован в [0, 1] на
+    дни, где у темы есть сигналы, и собран из сумм t, t², t·w без самих строк.
+    """
+    start = (now - timedelta(days=days)).date()
+    by_bucket: Dict[str, List[DayAgg]] = {}
+    for a in aggs:
+        if a.day >= start and a.count:
+            by_bucket.setdefault(a.bucket, []).append(a)
+    if not by_bucket:
+        return "NoLocalTrends: insufficient recent signals."
+
+    lines = []
+    for b, arr in by_bucket.items():
+        first = min(a.day for a in arr)
+        span = ((max(a.day for a in arr) - first).days + 1) * 86400.0
+        n, sx, sxx, sy, sxy = 0, 0.0, 0.0, 0.0, 0.0
+        cc: Dict[str, int] = {}
+        for a in arr:
+            d = (a.day - first).days * 86400.0
+            n += a.count
+            sx += (a.count * d + a.t_sum) / span
+            sxx += (a.count * d * d + 2 * d * a.t_sum + a.t_sq) / (span * span)
+            sy += a.weight_sum
+            sxy += (d * a.weight_sum + a.tw_sum) / span
+            cc[a.country] = cc.get(a.country, 0) + a.count
+        if n < 3:
+            trend = "unstable"
+        else:
+            var = n * sxx - sx * sx
+            slope = (n * sxy - sx * sy) / var if var > 1e-12 else 0.0
+            trend = "rising" if slope > 0.1 else ("falling" if slope < -0.1 else "flat")
+        top_cc = ", ".join(sorted(cc, key=cc.get, reverse=True)[:3]) or "-"
+        lines.append(f"{b}: {trend}; top-countries: {top_cc}; count={n}")
+    return "LocalTrends:\n" + "\n".join(sorted(lines))
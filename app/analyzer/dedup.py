@@ -0,0 +1,163 @@
+"""
+Кластеризация почти-дубликатов: один сюжет из Delfi EE/LV/LT, ERR, LSM,
+UNIAN — одна строка промпта с числом источников.
+
+Подпись — MinHash по схеме one-permutation hashing: символьные 4-граммы
+нормализованного заголовка и начала описания хешируются один раз (crc32 +
+перемешивание), старшие биты выбирают корзину, в корзине хранится минимум.
+Пустые корзины заполняются соседями (densification), так что подпись
+годится для LSH: BANDS полос по ROWS корзин. Подпись считается при ингесте
+и хранится в news_items.minhash; индекс ниже наращивается по новым строкам.
+
+Нормализация общая для ru/uk/en/pl/lt/lv: NFKD без диакритики, нижний
+регистр, кириллица в латиницу, всё кроме букв/цифр — пробел.
+"""
+from __future__ import annotations
+import struct
+import unicodedata
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+K = 32            # корзин в подписи (степень двойки)
+BANDS, ROWS = 16, 2  # P(кандидат) ≈ 1-(1-J²)^16: J=0.6 → 0.999, J=0.2 → 0.48
+SHINGLE = 4
+TEXT_LIMIT = 300  # сколько символов описания берём к заголовку
+_BIN_SHIFT = 32 - (K.bit_length() - 1)
+_VAL_MASK = (1 << _BIN_SHIFT) - 1
+_EMPTY = 0xFFFFFFFF
+_PACK = struct.Struct(f"<{K}I")
+
+_CYR = dict(zip(
+    "абвгдеёжзийклмнопрстуфхцчшщъыьэюяіїєґў",
+    ["a","b","v","g","d","e","e","zh","z","i","i","k","l","m","n","o","p","r","s","t","u","f",
+     "h","c","ch","sh","sch","","y","","e","yu","ya","i","i","e","g","u"],
+))
+
+def normalize(text: str) -> str:
+    s = unicodedata.normalize("NFKD", (text or "").lower())
+    out = []
+    for ch in s:
+        if unicodedata.combining(ch):
+            continue
+        if ch in _CYR:
+            out.append(_CYR[ch])
+        elif ch.isalnum():
+            out.append(ch)
+        else:
+            out.append(" ")
+    return " ".join("".join(out).split())
+
+def signature(title: str, summary: str = "") -> bytes:
+    text = normalize(f"{title or ''} {(summary or '')[:TEXT_LIMIT]}")
+    bins = [_EMPTY] * K
+    for i in range(max(len(text) - SHINGLE + 1, 1)):
+        h = (zlib.crc32(text[i:i + SHINGLE].encode()) * 0x9E3779B1) & 0xFFFFFFFF
+        b, v = h >> _BIN_SHIFT, h & _VAL_MASK
+        if v < bins[b]:
+            bins[b] = v
+    # densification: пустая корзина берёт значение следующей непустой (по кругу)
+    if _EMPTY in bins and any(v != _EMPTY for v in bins):
+        orig = bins[:]
+        for b in range(K):
+            if orig[b] == _EMPTY:
+                j = 1
+                while orig[(b + j) % K] == _EMPTY:
+                    j += 1
+                # сдвиг j в старших битах: заимствованное значение не совпадёт с «родным»
+                bins[b] = orig[(b + j) % K] | (j << _BIN_SHIFT) & 0xFFFFFFFF
+    return _PACK.pack(*bins)
+
+def _sim(va: Tuple[int, ...], vb: Tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(va, vb)) / K
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Оценка жаккаровой близости шинглов по двум подписям."""
+    return _sim(_PACK.unpack(a), _PACK.unpack(b))
+
+def _bands(sig: bytes) -> Iterable[bytes]:
+    step = ROWS * 4
+    for i in range(BANDS):
+        yield bytes([i]) + sig[i * step:(i + 1) * step]
+
+@dataclass
+class Story:
+    id: int                      # id представителя (первой новости)
+    members: List[int] = field(default_factory=list)
+    sources: set = field(default_factory=set)
+    first_seen: datetime | None = None
+
+    @property
+    def n_sources(self) -> int:
+        return len(self.sources)
+
+class StoryIndex:
+    """
+    Инкрементальный LSH-индекс сюжетов. add() — O(BANDS) на новость;
+    evict_before() выкидывает старое, чтобы индекс держал только окно.
+    """
+    def __init__(self, threshold: float = 0.5):
+        self.threshold = threshold
+        self.buckets: Dict[bytes, List[int]] = {}
+        self.sigs: Dict[int, Tuple[int, ...]] = {}
+        self.seen_at: Dict[int, datetime] = {}
+        self.story_of: Dict[int, int] = {}
+        self.stories: Dict[int, Story] = {}
+        self.last_id = 0
+
+    def add(self, item_id: int, sig: bytes, source_id: int, published_at: datetime) -> int:
+        if item_id in self.sigs:
+            return self.story_of[item_id]
+        best, best_sim = None, self.threshold
+        keys = list(_bands(sig))
+        vals = _PACK.unpack(sig)
+        for key in keys:
+            for other in self.buckets.get(key, ()):
+                sim = _sim(vals, self.sigs[other])
+                if sim >= best_sim:
+                    best, best_sim = other, sim
+        sid = self.story_of[best] if best is not None else item_id
+        st = self.stories.get(sid)
+        if st is None:
+            st = self.stories[sid] = Story(id=sid)
+        st.members.append(item_id)
+        st.sources.add(source_id)
+        if st.first_seen is None or published_at < st.first_seen:
+            st.first_seen = published_at
+        self.sigs[item_id] = vals
+        self.seen_at[item_id] = published_at
+        self.story_of[item_id] = sid
+        for key in keys:
+            self.buckets.setdefault(key, []).append(item_id)
+        self.last_id = max(self.last_id, item_id)
+        return sid
+
+    def evict_before(self, cutoff: datetime) -> int:
+        old = [i for i, t in self.seen_at.items() if t < cutoff]
+        if not old:
+            return 0
+        gone = set(old)
+        for i in old:
+            sig = _PACK.pack(*self.sigs.pop(i))
+            del self.seen_at[i]
+            sid = self.story_of.pop(i)
+            st = self.stories.get(sid)
+            if st is not None:
+                st.members = [m for m in st.members if m not in gone]
+                if not st.members:
+                    del self.stories[sid]
+            for key in _bands(sig):
+                arr = self.buckets.get(key)
+                if arr is not None:
+                    arr[:] = [m for m in arr if m not in gone]
+                    if not arr:
+                        del self.buckets[key]
+        return len(old)
+
+def cluster(items: Iterable[Tuple[int, bytes, int, datetime]], threshold: float = 0.5) -> Dict[int, int]:
+    """Разовая кластеризация: [(id, подпись, source_id, время)] -> {id: id сюжета}."""
+    idx = StoryIndex(threshold)
+    for item_id, sig, source_id, t in sorted(items, key=lambda x: x[3]):
+        idx.add(item_id, sig, source_id, t)
+    return dict(idx.story_of)
@@ -0,0 +1,172 @@
+"""
+Однопроходный матчер сигналов: один скомпилированный regex вместо
+fetchers.PAT + перебора context_tracker.KEY_PATS.
+
+Каждое регулярное выражение словаря вида \\b(alt1|alt2|...)\\b режется на
+альтернативы; одинаковые альтернативы из разных тем склеиваются, и каждая
+получает именованную группу. Альтернативы сгруппированы по первой букве
+с lookahead, поэтому движок на каждой позиции проверяет только «свою»
+ветку. Один finditer по тексту даёт все темы сразу и счётчики попаданий.
+
+Словарь можно подменить JSON-файлом (SIGNALS_VOCAB) — он перечитывается
+на лету при изменении mtime:
+    {"relevance": ["\\\\b(...)\\\\b", ...], "buckets": [["airspace", "\\\\b(...)\\\\b"], ...]}
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+from .context_tracker import KEY_BUCKETS
+
+RELEVANCE = "_relevance"    # служебная метка для триггеров «военка/угрозы»
+RELEVANT_SCORE = 2          # как в fetchers.fetch_rss: 2 если релевантно, иначе 0
+_META = set("\\.^$*+?{}[]()|")
+
+@dataclass
+class MatchResult:
+    buckets: List[str] = field(default_factory=list)    # в порядке словаря
+    hits: Dict[str, int] = field(default_factory=dict)  # тема -> число совпадений
+    relevant: bool = False
+
+    @property
+    def bucket(self) -> str | None:
+        # то же, что вернул бы context_tracker.bucket_of (первая тема по порядку)
+        return self.buckets[0] if self.buckets else None
+
+    @property
+    def score(self) -> int:
+        return RELEVANT_SCORE if self.relevant else 0
+
+def split_alternatives(rx: str) -> List[str]:
+    """\\b(a|b(c|d)|e)\\b -> ["a", "b(c|d)", "e"]; прочие выражения — как есть."""
+    if not (rx.startswith(r"\b(") and rx.endswith(r")\b")):
+        return [rx]
+    inner = rx[3:-3]
+    out, cur, depth, esc, in_cls = [], [], 0, False, False
+    for ch in inner:
+        if esc:
+            cur.append(ch); esc = False; continue
+        if ch == "\\":
+            cur.append(ch); esc = True; continue
+        if in_cls:
+            cur.append(ch); in_cls = ch != "]"; continue
+        if ch == "[": in_cls = True
+        elif ch == "(": depth += 1
+        elif ch == ")": depth -= 1
+        elif ch == "|" and depth == 0:
+            out.append("".join(cur)); cur = []; continue
+        cur.append(ch)
+    if depth != 0:
+        return [rx]
+    out.append("".join(cur))
+    return out
+
+def default_vocab() -> Dict[str, list]:
+    from ..services.fetchers import TRIGGERS  # лениво: fetchers сам может звать матчер
+    return {"relevance": list(TRIGGERS), "buckets": [list(kb) for kb in KEY_BUCKETS]}
+
+class Matcher:
+    def __init__(self, relevance: Sequence[str], buckets: Sequence[Tuple[str, str]]):
+        self.bucket_order = [name for name, _ in buckets]
+        labels_by_alt: Dict[str, List[str]] = {}
+        for rx in relevance:
+            for alt in split_alternatives(rx):
+                labels_by_alt.setdefault(alt, []).append(RELEVANCE)
+        for name, rx in buckets:
+            for alt in split_alternatives(rx):
+                labs = labels_by_alt.setdefault(alt, [])
+                if name not in labs:
+                    labs.append(name)
+        alts = list(labels_by_alt)
+        self.group_labels: Dict[str, Tuple[str, ...]] = {
+            f"a{i}": tuple(labels_by_alt[a]) for i, a in enumerate(alts)
+        }
+        self.regex = re.compile(self._build(alts), re.IGNORECASE)
+
+    @staticmethod
+    def _build(alts: List[str]) -> str:
+        by_first: Dict[str, List[int]] = {}
+        generic: List[int] = []
+        for i, a in enumerate(alts):
+            c = a[:1]
+            if c and c not in _META:
+                by_first.setdefault(c.lower(), []).append(i)
+            else:
+                generic.append(i)
+        parts = []
+        for c, ids in by_first.items():
+            cls = re.escape(c) + re.escape(c.upper())
+            parts.append(f"(?=[{cls}])(?:" + "|".join(f"(?P<a{i}>{alts[i]})" for i in ids) + ")")
+        parts += [f"(?P<a{i}>{alts[i]})" for i in generic]
+        head = ""
+        if not generic:
+            firsts = "".join(re.escape(c) + re.escape(c.upper()) for c in by_first)
+            head = f"(?=[{firsts}])"
+        return r"\b" + head + "(?:" + "|".join(parts) + r")\b"
+
+    def scan(self, text: str, extra: str = "") -> MatchResult:
+        """
+        text — заголовок+описание (по ним же релевантность, как is_relevant);
+        extra — длинный хвост (транскрипт), учитывается только для тем.
+        """
+        hits: Dict[str, int] = {}
+        relevant = False
+        for part, with_rel in ((text, True), (extra, False)):
+            if not part:
+                continue
+            for m in self.regex.finditer(part):
+                for lab in self.group_labels[m.lastgroup]:
+                    if lab == RELEVANCE:
+                        relevant = relevant or with_rel
+                    else:
+                        hits[lab] = hits.get(lab, 0) + 1
+        return MatchResult(
+            buckets=[b for b in self.bucket_order if b in hits],
+            hits=hits, relevant=relevant,
+        )
+
+# ---------- общий экземпляр с горячей перезагрузкой словаря ----------
+
+VOCAB_PATH = os.getenv("SIGNALS_VOCAB", "")
+RELOAD_CHECK_S = 30.0
+
+_lock = threading.Lock()
+_matcher: Matcher | None = None
+_mtime: float | None = None
+_checked_at = 0.0
+
+def _load(path: str) -> Matcher:
+    vocab = default_vocab()
+    if path:
+        with open(path, encoding="utf-8") as f:
+            vocab.update(json.load(f))
+    return Matcher(vocab["relevance"], [tuple(b) for b in vocab["buckets"]])
+
+def reload(path: str | None = None) -> Matcher:
+    global _matcher, _mtime, _checked_at
+    path = VOCAB_PATH if path is None else path
+    with _lock:
+        m = _load(path)
+        _matcher = m
+        _mtime = os.path.getmtime(path) if path else None
+        _checked_at = time.monotonic()
+    return m
+
+def get_matcher() -> Matcher:
+    global _checked_at
+    if _matcher is None:
+        return reload()
+    if VOCAB_PATH and time.monotonic() - _checked_at > RELOAD_CHECK_S:
+        _checked_at = time.monotonic()
+        try:
+            if os.path.getmtime(VOCAB_PATH) != _mtime:
+                return reload()
+        except Exception as e:
+            # битый файл словаря не должен ронять ингест — работаем на старом
+            print(f"[matcher] reload failed: {e}")
+    return _matcher
@@ -0,0 +1,101 @@
+"""
+Компактное множество уже виденных url: фильтр Блума по 64-битным хешам
+нормализованных url.
+
+Размер — из ожидаемого числа url n и доли ложных срабатываний p:
+m = -n·ln p / ln²2 бит, k = m/n·ln 2 хешей (1M url при p=0.001 — ~1.7 МБ,
+k=10). Позиции — двойным хешированием из одного 64-битного хеша
+(h1 + i·h2), так что url хешируется один раз. «Нет» — точно новый url,
+«да» — скорее всего виденный (проверка по news_items.url_hash).
+
+Заполнение пачкой — на NumPy, если он есть (pip install -e .[analytics]),
+иначе циклом.
+"""
+from __future__ import annotations
+import hashlib
+import math
+from typing import Iterable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# метки рекламы/шаринга — на сюжет не влияют
+TRACKING = ("utm_", "fbclid", "gclid", "yclid", "mc_cid", "mc_eid", "_ga", "ref_src")
+MASK64 = (1 << 64) - 1
+
+def normalize_url(url: str) -> str:
+    """Схема/хост в нижний регистр, без фрагмента, порта по умолчанию и трекинговых параметров."""
+    s = (url or "").strip()
+    try:
+        p = urlsplit(s)
+    except ValueError:
+        return s
+    if not p.netloc:
+        return s
+    scheme = p.scheme.lower() or "http"
+    host = (p.hostname or "").lower()
+    if p.port and not ((scheme == "http" and p.port == 80) or (scheme == "https" and p.port == 443)):
+        host = f"{host}:{p.port}"
+    query = p.query
+    if query and any(t in query.lower() for t in TRACKING):  # разбор query — только если есть что выкинуть
+        query = urlencode([(k, v) for k, v in parse_qsl(query, keep_blank_values=True)
+                           if not k.lower().startswith(TRACKING)])
+    return urlunsplit((scheme, host, p.path or "/", query, ""))
+
+def url_hash(url: str) -> int:
+    """Знаковое 64-битное (BigInteger) от нормализованного url."""
+    h = int.from_bytes(hashlib.blake2b(normalize_url(url).encode(), digest_size=8).digest(), "big")
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+class BloomFilter:
+    __slots__ = ("m", "k", "bits", "count")
+
+    def __init__(self, capacity: int, fp_rate: float):
+        capacity, fp_rate = max(capacity, 1), min(max(fp_rate, 1e-9), 0.5)
+        self.m = max(int(-capacity * math.log(fp_rate) / math.log(2) ** 2), 64)
+        self.k = max(round(self.m / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.m + 7) // 8)
+        self.count = 0
+
+    def _positions(self, h: int):
+        h &= MASK64
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    def add(self, h: int):
+        for pos in self._positions(h):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, h: int) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(h))
+
+    def add_many(self, hashes: Iterable[int]):
+        if np is None:
+            for h in hashes:
+                self.add(h)
+            return
+        hs = np.fromiter((h & MASK64 for h in hashes), dtype=np.uint64)
+        if not len(hs):
+            return
+        h1 = (hs & np.uint64(0xFFFFFFFF))
+        h2 = (hs >> np.uint64(32)) | np.uint64(1)
+        view = np.frombuffer(self.bits, dtype=np.uint8)
+        m = np.uint64(self.m)
+        for i in range(self.k):
+            pos = (h1 + np.uint64(i) * h2) % m
+            np.bitwise_or.at(view, (pos >> np.uint64(3)).astype(np.int64),
+                             (np.uint8(1) << (pos & np.uint64(7)).astype(np.uint8)))
+        self.count += len(hs)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def fp_rate(self) -> float:
+        """Оценка доли ложных срабатываний при текущем заполнении."""
+        return (1 - math.exp(-self.k * self.count / self.m)) ** self.k
@@ -0,0 +1,177 @@
+"""
+Векторизованная аналитика трендов на колонках NumPy.
+
+Сигналы лежат колонками: ts (unix-секунды), weight, n (кратность — для
+дневных агрегатов), коды темы и страны. Всё считается через bincount
+и матричные операции, без циклов по сигналам, — 100k+ сигналов за
+миллисекунды, так что окно истории можно расширять.
+
+- bucket_slopes: наклон веса по времени по каждой теме;
+- bursts: всплески (z-score текущего окна против базовой линии);
+- cooccurrence: пары тем, активных в пределах N дней — правило
+  «2+ категории за 10–14 дней» из HISTORICAL_PRIORS.
+
+NumPy — необязательная зависимость (pip install -e .[analytics]).
+"""
+from __future__ import annotations
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from .context_tracker import DayAgg
+
+BALTIC = ("EE", "LV", "LT", "PL", "FI")
+DAY = 86400.0
+
+def available() -> bool:
+    return np is not None
+
+def _epoch(t: datetime) -> float:
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return t.timestamp()
+
+class SignalFrame:
+    __slots__ = ("ts", "weight", "n", "bucket", "country", "buckets", "countries")
+
+    def __init__(self, ts, weight, n, bucket, country, buckets: Sequence[str], countries: Sequence[str]):
+        self.ts, self.weight, self.n = ts, weight, n
+        self.bucket, self.country = bucket, country
+        self.buckets, self.countries = list(buckets), list(countries)
+
+    def __len__(self) -> int:
+        return int(self.ts.shape[0])
+
+    @classmethod
+    def from_signals(cls, rows: Iterable[Tuple[datetime, float, str, str]]) -> "SignalFrame":
+        """rows: (published_at, score, buckets через запятую, country); мультитемы разворачиваются."""
+        ts, w, b, c = [], [], [], []
+        bidx: Dict[str, int] = {}
+        cidx: Dict[str, int] = {}
+        for t, weight, names, country in rows:
+            e = _epoch(t)
+            ci = cidx.setdefault(country or "", len(cidx))
+            for name in (names or "").split(","):
+                if not name:
+                    continue
+                ts.append(e); w.append(weight); c.append(ci)
+                b.append(bidx.setdefault(name, len(bidx)))
+        return cls(np.asarray(ts, dtype=np.float64), np.asarray(w, dtype=np.float64),
+                   np.ones(len(ts), dtype=np.float64), np.asarray(b, dtype=np.int32),
+                   np.asarray(c, dtype=np.int32), list(bidx), list(cidx))
+
+    @classmethod
+    def from_aggregates(cls, aggs: Iterable[DayAgg]) -> "SignalFrame":
+        """Дневные агрегаты -> точки в среднем времени публикации за день, n = count."""
+        ts, w, n, b, c = [], [], [], [], []
+        bidx: Dict[str, int] = {}
+        cidx: Dict[str, int] = {}
+        for a in aggs:
+            if not a.count:
+                continue
+            day0 = _epoch(datetime(a.day.year, a.day.month, a.day.day))
+            ts.append(day0 + a.t_sum / a.count)
+            w.append(a.weight_sum); n.append(a.count)
+            b.append(bidx.setdefault(a.bucket, len(bidx)))
+            c.append(cidx.setdefault(a.country, len(cidx)))
+        return cls(np.asarray(ts, dtype=np.float64), np.asarray(w, dtype=np.float64),
+                   np.asarray(n, dtype=np.float64), np.asarray(b, dtype=np.int32),
+                   np.asarray(c, dtype=np.int32), list(bidx), list(cidx))
+
+    def select(self, mask) -> "SignalFrame":
+        return SignalFrame(self.ts[mask], self.weight[mask], self.n[mask],
+                           self.bucket[mask], self.country[mask], self.buckets, self.countries)
+
+    def in_countries(self, codes: Sequence[str]) -> "SignalFrame":
+        keep = np.asarray([cc in codes for cc in self.countries] or [False], dtype=bool)
+        return self.select(keep[self.country])
+
+def bucket_slopes(f: SignalFrame, now: datetime, days: int = 14) -> Dict[str, Tuple[float, int]]:
+    """Тема -> (наклон веса на нормированном [0, 1] времени, число сигналов)."""
+    f = f.select(f.ts >= _epoch(now) - days * DAY)
+    nb = len(f.buckets)
+    if not len(f) or not nb:
+        return {}
+    tmin = np.full(nb, np.inf); tmax = np.full(nb, -np.inf)
+    np.minimum.at(tmin, f.bucket, f.ts)
+    np.maximum.at(tmax, f.bucket, f.ts)
+    span = np.maximum(tmax - tmin, 1.0)
+    x = (f.ts - tmin[f.bucket]) / span[f.bucket]
+    # y — средний вес точки; n — её кратность (для агрегатов)
+    y = f.weight / f.n
+    cnt = np.bincount(f.bucket, weights=f.n, minlength=nb)
+    sx = np.bincount(f.bucket, weights=f.n * x, minlength=nb)
+    sxx = np.bincount(f.bucket, weights=f.n * x * x, minlength=nb)
+    sy = np.bincount(f.bucket, weights=f.n * y, minlength=nb)
+    sxy = np.bincount(f.bucket, weights=f.n * x * y, minlength=nb)
+    var = cnt * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(var > 1e-12, (cnt * sxy - sx * sy) / var, 0.0)
+    return {f.buckets[i]: (float(slope[i]), int(cnt[i])) for i in range(nb) if cnt[i] > 0}
+
+def _binned_counts(f: SignalFrame, now: datetime, window_s: float, nbins: int):
+    age = _epoch(now) - f.ts
+    k = np.floor(age / window_s).astype(np.int64)
+    m = (k >= 0) & (k < nbins)
+    nb = len(f.buckets)
+    flat = np.bincount(f.bucket[m] * nbins + k[m], weights=f.n[m], minlength=nb * nbins)
+    return flat.reshape(nb, nbins)  # [тема, окно назад от now]
+
+def bursts(f: SignalFrame, now: datetime, window_h: float = 24, baseline_days: int = 14,
+           z: float = 3.0, min_count: int = 3) -> List[Tuple[str, int, float, float]]:
+    """
+    Всплески: число сигналов темы в последнем окне против окон базовой линии.
+    Возвращает [(тема, сейчас, среднее базы, z)] по убыванию z.
+    """
+    window_s = window_h * 3600.0
+    nbins = max(int(baseline_days * DAY / window_s), 2)
+    if not len(f) or not f.buckets:
+        return []
+    counts = _binned_counts(f, now, window_s, nbins)
+    cur, base = counts[:, 0], counts[:, 1:]
+    mu, sd = base.mean(axis=1), base.std(axis=1)
+    # пуассоновский пол: на тихих темах единичный сигнал не должен давать z=∞
+    sd = np.maximum(sd, np.sqrt(np.maximum(mu, 1.0)))
+    zs = (cur - mu) / sd
+    idx = np.nonzero((zs >= z) & (cur >= min_count))[0]
+    out = [(f.buckets[i], int(cur[i]), float(mu[i]), float(zs[i])) for i in idx]
+    return sorted(out, key=lambda r: -r[3])
+
+def cooccurrence(f: SignalFrame, now: datetime, within_days: int = 10,
+                 horizon_days: int = 14) -> List[Tuple[str, str, int]]:
+    """
+    Пары тем, обе активные за последние within_days дней. Третье число — в скольких
+    скользящих окнах по within_days (в пределах horizon_days) пара встречалась вместе.
+    """
+    nb = len(f.buckets)
+    if not len(f) or nb < 2:
+        return []
+    presence = _binned_counts(f, now, DAY, horizon_days + within_days) > 0
+    # R[b, d] — была ли тема b активна в днях [d, d + within_days) назад от now
+    cs = np.concatenate([np.zeros((nb, 1)), np.cumsum(presence, axis=1)], axis=1)
+    active = (cs[:, within_days:within_days + horizon_days] - cs[:, :horizon_days]) > 0
+    both = active.astype(np.int64) @ active.T.astype(np.int64)
+    now_b = np.nonzero(active[:, 0])[0]
+    out = [(f.buckets[i], f.buckets[j], int(both[i, j]))
+           for ii, i in enumerate(now_b) for j in now_b[ii + 1:]]
+    return sorted(out, key=lambda r: -r[2])
+
+def summarize_frame(f: SignalFrame, now: datetime, days: int = 14, *,
+                    cooccur_days: int = 10, burst_z: float = 3.0) -> str:
+    """Дополнительные скрытые строки для промпта: всплески и совпадения тем в Балтии."""
+    lines = []
+    for b, cur, mu, zs in bursts(f, now, window_h=24, baseline_days=days, z=burst_z):
+        lines.append(f"burst: {b} last24h={cur} baseline={mu:.1f}/day z={zs:.1f}")
+    pairs = cooccurrence(f.in_countries(BALTIC), now, within_days=cooccur_days, horizon_days=days)
+    if pairs:
+        cats = sorted({p[0] for p in pairs} | {p[1] for p in pairs})
+        lines.append(f"co-occurrence (<= {cooccur_days}d, Baltic theatre): {len(cats)} categories: {', '.join(cats)}")
+        for a, b, k in pairs[:5]:
+            lines.append(f"  pair: {a}+{b} windows={k}")
+    if not lines:
+        return ""
+    return "LocalSignals:\n" + "\n".join(lines)
@@ -0,0 +1,98 @@
+"""
+Разметка уже сохранённых новостей: score/bucket/country/org и подпись сюжета.
+
+    python -m app.backfill          # только неразмеченные строки
+    python -m app.backfill --all    # пересчитать всё (после смены словарей)
+    python -m app.backfill --trends # только пересобрать trend_aggregates
+
+После разметки агрегаты трендов пересобираются из истории. Заодно
+дозаполняется news_items.url_hash (фильтр виденных url, services/seen.py).
+
+Схему (в том числе старой БД, созданной до миграций) сначала доводит
+до head — app/migrate.py.
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import or_, select, update
+
+from . import migrate
+from .analyzer.classify import classify
+from .analyzer.dedup import signature
+from .analyzer.urlset import url_hash
+from .db import SessionLocal
+from .models import NewsItem, Source
+from .services import blobstore
+from .services.trends import rebuild_aggregates
+
+BATCH = 500
+
+async def fill_url_hashes() -> int:
+    done = 0
+    async with SessionLocal() as session:
+        while True:
+            rows = (await session.execute(
+                select(NewsItem.id, NewsItem.url).where(NewsItem.url_hash.is_(None)).order_by(NewsItem.id).limit(BATCH)
+            )).all()
+            if not rows:
+                break
+            await session.execute(update(NewsItem), [{"id": r.id, "url_hash": url_hash(r.url or "")} for r in rows])
+            await session.commit()
+            done += len(rows)
+    if done:
+        print(f"[backfill] url_hash filled for {done} rows")
+    return done
+
+async def backfill(all_rows: bool = False) -> int:
+    await migrate.upgrade()
+    await fill_url_hashes()
+
+    done, last_id = 0, 0
+    async with SessionLocal() as session:
+        sources = {s.id: s for s in (await session.execute(select(Source))).scalars()}
+        while True:
+            q = select(NewsItem.id, NewsItem.source_id, NewsItem.title, NewsItem.url, NewsItem.raw) \
+                .where(NewsItem.id > last_id).order_by(NewsItem.id).limit(BATCH)
+            if not all_rows:
+                q = q.where(or_(NewsItem.country.is_(None), NewsItem.country == "", NewsItem.minhash.is_(None)))
+            rows = (await session.execute(q)).all()
+            if not rows:
+                break
+            await blobstore.hydrate(session, [r.raw for r in rows])  # классификатор смотрит и транскрипт
+            params = []
+            for r in rows:
+                src = sources.get(r.source_id)
+                cls = classify(r.title or "", r.url or "", r.raw,
+                               getattr(src, "country", "") or "", getattr(src, "org", "") or "")
+                params.append({"id": r.id, **cls,
+                               "minhash": signature(r.title or "", (r.raw or {}).get("summary", ""))})
+            # bulk UPDATE по первичному ключу — один executemany на пакет
+            await session.execute(update(NewsItem), params)
+            await session.commit()
+            done += len(rows)
+            last_id = rows[-1].id
+            print(f"[backfill] classified {done}")
+    if done:
+        await rebuild_trends()
+    return done
+
+async def rebuild_trends() -> int:
+    await migrate.upgrade()
+    async with SessionLocal() as session:
+        n = await rebuild_aggregates(session)
+    print(f"[backfill] trend aggregates rebuilt from {n} signals")
+    return n
+
+def main():
+    ap = argparse.ArgumentParser(description="Classify stored news items")
+    ap.add_argument("--all", action="store_true", help="re-classify every row, not only unclassified ones")
+    ap.add_argument("--trends", action="store_true", help="only rebuild trend aggregates from history")
+    args = ap.parse_args()
+    if args.trends:
+        asyncio.run(rebuild_trends())
+        return
+    n = asyncio.run(backfill(all_rows=args.all))
+    print(f"[backfill] done: {n}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Уплотнение хранилища вручную (то же делает планировщик раз в сутки в COMPACT_HOUR):
+
+    python -m app.compact                # RETENTION_DAYS из окружения
+    python -m app.compact --days 90      # своё окно горячей таблицы (0 — не архивировать)
+    python -m app.compact --vacuum       # плюс VACUUM (SQLite): вернуть место на диске
+    python -m app.compact --stats        # только показать размеры
+
+Большие поля raw -> raw_blobs, строки старше окна -> archive_segments,
+неиспользуемые блобы удаляются (services/compaction.py).
+"""
+import argparse
+import asyncio
+import json
+
+from . import migrate
+from .db import SessionLocal
+from .services import compaction
+
+async def run(days: int | None, vacuum: bool, stats_only: bool) -> dict:
+    await migrate.upgrade()
+    if not stats_only:
+        await compaction.run_compaction(days=days, vacuum=vacuum or None)
+    async with SessionLocal() as session:
+        return await compaction.storage_stats(session)
+
+def main():
+    ap = argparse.ArgumentParser(description="Archive old news items and compact raw payload storage")
+    ap.add_argument("--days", type=int, default=None, help="keep this many days in news_items (default RETENTION_DAYS)")
+    ap.add_argument("--vacuum", action="store_true", help="VACUUM the SQLite file afterwards")
+    ap.add_argument("--stats", action="store_true", help="only print storage stats")
+    args = ap.parse_args()
+    print(json.dumps(asyncio.run(run(args.days, args.vacuum, args.stats)), default=str, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
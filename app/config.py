@@ -8,11 +8,101 @@ class Settings(BaseModel):
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
     max_tokens: int = int(os.getenv("MAX_TOKENS", "400"))
     database_url: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./alertbox.db")
+    # профиль БД (app/db.py). SQLite: WAL, synchronous, mmap и ожидание чужой записи вместо «database is locked»
+    sqlite_wal: bool = os.getenv("SQLITE_WAL", "1").lower() not in ("0", "false", "no")
+    sqlite_synchronous: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+    sqlite_mmap_mb: int = int(os.getenv("SQLITE_MMAP_MB", "256"))
+    sqlite_busy_ms: int = int(os.getenv("SQLITE_BUSY_MS", "5000"))
+    # PostgreSQL: пул соединений, кеш подготовленных запросов (0 — за pgbouncer в transaction mode), COPY для ингеста
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_recycle_s: int = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+    pg_stmt_cache: int = int(os.getenv("PG_STMT_CACHE", "500"))
+    pg_copy_min_rows: int = int(os.getenv("PG_COPY_MIN_ROWS", "50"))  # 0 — без COPY
     groq_api_key: str | None = os.getenv("GROQ_API_KEY")
     openai_api_key: str | None = os.getenv("OPENAI_API_KEY")
+    groq_url: str = os.getenv("GROQ_URL") or "https://api.groq.com/openai/v1/chat/completions"
+    openai_url: str = os.getenv("OPENAI_URL") or "https://api.openai.com/v1/chat/completions"
+    # кеш ответов LLM (SQLite/БД приложения): TTL и предельное число записей
+    llm_cache: bool = os.getenv("LLM_CACHE", "1").lower() not in ("0", "false", "no")
+    llm_cache_ttl_s: int = int(os.getenv("LLM_CACHE_TTL_S", "21600"))
+    llm_cache_max: int = int(os.getenv("LLM_CACHE_MAX", "500"))
+    llm_hedge: bool = os.getenv("LLM_HEDGE", "1").lower() not in ("0", "false", "no")
+    llm_hedge_delay_s: float = float(os.getenv("LLM_HEDGE_DELAY_S", "2.0"))
+    # бюджет входных токенов промпта отчёта (оценка локальная) и сколько сигналов брать всегда
+    llm_input_budget: int = int(os.getenv("LLM_INPUT_BUDGET", "3000"))
+    pack_min_signals: int = int(os.getenv("PACK_MIN_SIGNALS", "5"))
+    report_max_signals: int = int(os.getenv("REPORT_MAX_SIGNALS", "60"))
+    # фоновые задания отчётов: сколько генерируется одновременно и сколько помнить
+    report_workers: int = int(os.getenv("REPORT_WORKERS", "2"))
+    report_jobs_keep: int = int(os.getenv("REPORT_JOBS_KEEP", "200"))
+    # аренда одинаковых заданий между процессами (API / планировщик) — не дольше генерации
+    report_job_lease_s: int = int(os.getenv("REPORT_JOB_LEASE_S", "900"))
+    # доставка в Telegram: лимиты Telegram (≈30 сообщений/с на бота, ≈1/с в чат), повторы
+    tg_rate_global: float = float(os.getenv("TG_RATE_GLOBAL", "25"))
+    tg_rate_chat: float = float(os.getenv("TG_RATE_CHAT", "1"))
+    tg_chat_burst: int = int(os.getenv("TG_CHAT_BURST", "3"))
+    tg_max_attempts: int = int(os.getenv("TG_MAX_ATTEMPTS", "8"))
+    tg_poll_s: float = float(os.getenv("TG_POLL_S", "2"))
+    # срочные алерты при ингесте: темы, окно, пороги, тишина после срабатывания
+    alerts: bool = os.getenv("ALERTS", "1").lower() not in ("0", "false", "no")
+    alert_buckets: list[str] = (os.getenv("ALERT_BUCKETS") or "border,airspace").split(",")
+    alert_window_min: int = int(os.getenv("ALERT_WINDOW_MIN", "30"))
+    alert_min_items: int = int(os.getenv("ALERT_MIN_ITEMS", "3"))
+    alert_min_countries: int = int(os.getenv("ALERT_MIN_COUNTRIES", "2"))
+    alert_min_score: int = int(os.getenv("ALERT_MIN_SCORE", "2"))
+    alert_baseline_x: float = float(os.getenv("ALERT_BASELINE_X", "3"))
+    alert_cooldown_min: int = int(os.getenv("ALERT_COOLDOWN_MIN", "120"))
+    alert_max_lag_min: int = int(os.getenv("ALERT_MAX_LAG_MIN", "180"))
+    # непрерывный опрос лент: у каждого источника свой интервал в [min, max]
+    poller: bool = os.getenv("POLLER", "1").lower() not in ("0", "false", "no")
+    poll_min_s: int = int(os.getenv("POLL_MIN_S", "300"))
+    poll_max_s: int = int(os.getenv("POLL_MAX_S", "43200"))
+    poll_items_per_poll: float = float(os.getenv("POLL_ITEMS_PER_POLL", "3"))
+    poll_jitter: float = float(os.getenv("POLL_JITTER", "0.15"))
+    # запросов в сутки на все ленты: 0 — 2 на источник (как cron), N — явный бюджет, <0 — без лимита
+    poll_budget_per_day: int = int(os.getenv("POLL_BUDGET_PER_DAY", "0"))
+    # несколько процессов планировщика: срок аренды лент и блокировки слота отчёта
+    lease_s: int = int(os.getenv("LEASE_S", "600"))
+    poll_batch: int = int(os.getenv("POLL_BATCH", "50"))  # лент за одну аренду
+    report_lock_s: int = int(os.getenv("REPORT_LOCK_S", "21600"))
     report_langs: list[str] = os.getenv("REPORT_LANGS", "ru,en").split(",")
+    # остальные языки — переводом основного отчёта, а не полной генерацией
+    report_translate: bool = os.getenv("REPORT_TRANSLATE", "0").lower() in ("1", "true", "yes")
     schedule_cron: str = os.getenv("SCHEDULE_CRON", "0 6,18 * * *")
     region: str = os.getenv("REGION", "Baltics")
     rss_sources: list[str] = os.getenv("RSS_SOURCES", "").split(",") if os.getenv("RSS_SOURCES") else []
+    use_historical_priors: bool = os.getenv("USE_HISTORICAL_PRIORS", "1").lower() not in ("0", "false", "no")
+    history_window_days: int = int(os.getenv("HISTORY_WINDOW_DAYS") or "14")
+    trend_cooccur_days: int = int(os.getenv("TREND_COOCCUR_DAYS", "10"))
+    trend_burst_z: float = float(os.getenv("TREND_BURST_Z", "3.0"))
+    # склейка почти-дубликатов: порог оценки жаккаровой близости подписей
+    cluster_threshold: float = float(os.getenv("CLUSTER_THRESHOLD", "0.5"))
+    # сбор лент: общий пул соединений, лимиты на всё и на хост, таймауты/повторы
+    fetch_concurrency: int = int(os.getenv("FETCH_CONCURRENCY", "16"))
+    fetch_per_host: int = int(os.getenv("FETCH_PER_HOST", "4"))
+    fetch_timeout: float = float(os.getenv("FETCH_TIMEOUT", "20"))
+    fetch_source_deadline: float = float(os.getenv("FETCH_SOURCE_DEADLINE", "60"))
+    fetch_retries: int = int(os.getenv("FETCH_RETRIES", "2"))
+    # конвейер ингеста: размер пакета записи и глубина очередей между стадиями
+    ingest_batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", "200"))
+    ingest_queue_size: int = int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+    # фильтр Блума виденных url: ёмкость, доля ложных срабатываний, сверять ли «да» с БД
+    seen_filter: bool = os.getenv("SEEN_FILTER", "1").lower() not in ("0", "false", "no")
+    seen_capacity: int = int(os.getenv("SEEN_CAPACITY", "1000000"))
+    seen_fp_rate: float = float(os.getenv("SEEN_FP_RATE", "0.001"))
+    seen_confirm: bool = os.getenv("SEEN_CONFIRM", "1").lower() not in ("0", "false", "no")
+    # транскрипты YouTube: потоков на синхронный API и через сколько часов перепроверять «субтитров нет»
+    transcript_workers: int = int(os.getenv("TRANSCRIPT_WORKERS", "4"))
+    transcript_retry_h: float = float(os.getenv("TRANSCRIPT_RETRY_H", "6"))
+    # хранение: поля raw длиннее BLOB_MIN_BYTES — в raw_blobs (0 — не выносить), кодек auto/zstd/zlib
+    blob_min_bytes: int = int(os.getenv("BLOB_MIN_BYTES", "2048"))
+    blob_codec: str = os.getenv("BLOB_CODEC", "auto").lower()
+    # ночное уплотнение: news_items старше RETENTION_DAYS -> месячные архивные сегменты (0 — хранить всё)
+    retention_days: int = int(os.getenv("RETENTION_DAYS", "180"))
+    archive_batch: int = int(os.getenv("ARCHIVE_BATCH", "5000"))
+    archive_segment_rows: int = int(os.getenv("ARCHIVE_SEGMENT_ROWS", "50000"))
+    compact_hour: int = int(os.getenv("COMPACT_HOUR", "4"))
+    compact_vacuum: bool = os.getenv("COMPACT_VACUUM", "0").lower() not in ("0", "false", "no")
 
 settings = Settings()
@@ -1,8 +1,67 @@
+"""
+Движок БД и профиль под диалект.
+
+SQLite (по умолчанию): на каждом соединении — journal_mode=WAL (читатели не
+ждут писателя, API и планировщик не блокируют друг друга на коммитах ингеста),
+synchronous=NORMAL (в WAL — без fsync на каждый коммит, целостность
+сохраняется), mmap_size и busy_timeout (чужая запись — ждать, а не падать
+с «database is locked»).
+
+PostgreSQL: пул DB_POOL_SIZE + DB_MAX_OVERFLOW с pre-ping и recycle, кеш
+подготовленных запросов драйвера (PG_STMT_CACHE; 0 — за pgbouncer в
+transaction mode), пакеты ингеста от PG_COPY_MIN_ROWS строк — через COPY
+(copy_insert).
+
+Схема — миграциями Alembic (app/migrate.py), не create_all.
+"""
+import json
+import uuid
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import JSON, Table, event
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from .config import settings
 
-engine = create_async_engine(settings.database_url, future=True, echo=False)
+def engine_options(url: str) -> tuple[URL, Dict[str, Any]]:
+    u = make_url(url)
+    # JSON-колонки (raw) — UTF-8 как есть: с \uXXXX кириллица занимает втрое-вшестеро больше
+    opts: Dict[str, Any] = {"future": True, "echo": False,
+                            "json_serializer": lambda o: json.dumps(o, ensure_ascii=False)}
+    backend, driver = u.get_backend_name(), u.get_driver_name()
+    if backend == "sqlite":
+        opts["connect_args"] = {"timeout": settings.sqlite_busy_ms / 1000}
+    elif backend == "postgresql":
+        opts.update(pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow,
+                    pool_recycle=settings.db_pool_recycle_s, pool_pre_ping=True)
+        n = settings.pg_stmt_cache
+        if driver == "asyncpg":
+            # кеш SQLAlchemy (prepared_statement_cache_size) и самого asyncpg (statement_cache_size)
+            if "prepared_statement_cache_size" not in u.query:
+                u = u.update_query_dict({"prepared_statement_cache_size": str(n)})
+            opts["connect_args"] = {"statement_cache_size": n,
+                                    "server_settings": {"application_name": "alertbox"}}
+            if n == 0:
+                # pgbouncer: серверное соединение общее, имена подготовленных запросов — уникальные
+                opts["connect_args"]["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        elif driver == "psycopg":
+            opts["connect_args"] = {"prepare_threshold": 5 if n else None}
+    return u, opts
+
+def sqlite_pragmas(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    if settings.sqlite_wal:
+        cur.execute("PRAGMA journal_mode=WAL")  # для :memory: останется memory
+    cur.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cur.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_mb * 2**20}")
+    cur.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_ms}")
+    cur.close()
+
+_url, _opts = engine_options(settings.database_url)
+engine = create_async_engine(_url, **_opts)
+if engine.dialect.name == "sqlite":
+    event.listen(engine.sync_engine, "connect", sqlite_pragmas)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 class Base(DeclarativeBase):
@@ -11,3 +70,37 @@ class Base(DeclarativeBase):
 async def get_session() -> AsyncSession:
     async with SessionLocal() as session:
         yield session
+
+def copy_enabled(session: AsyncSession, n: int) -> bool:
+    bind = session.get_bind()
+    return (bind.dialect.name == "postgresql" and bind.dialect.driver == "asyncpg"
+            and 0 < settings.pg_copy_min_rows <= n)
+
+async def copy_insert(session: AsyncSession, table: Table, rows: List[Dict[str, Any]],
+                      conflict: str, returning: Sequence[str]) -> list:
+    """
+    PostgreSQL/asyncpg: COPY пакета во временную таблицу, затем
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING — COPY сам конфликты
+    не разрешает. В транзакции сессии; коммит — на вызывающем.
+    Возвращает кортежи колонок returning у реально вставленных строк.
+    """
+    cols = list(rows[0])
+    json_cols = {c for c in cols if isinstance(table.c[c].type, JSON)}
+    col_sql = ", ".join(f'"{c}"' for c in cols)
+    stage = f"_copy_{table.name}"
+    conn = await session.connection()
+    # через SQLAlchemy: транзакция сессии уже открыта, COPY ниже идёт в ней же
+    await conn.exec_driver_sql(
+        f'CREATE TEMP TABLE IF NOT EXISTS {stage} ON COMMIT DELETE ROWS AS SELECT {col_sql} FROM "{table.name}" WITH NO DATA'
+    )
+    raw = (await conn.get_raw_connection()).driver_connection
+    await raw.copy_records_to_table(stage, columns=cols, records=[
+        tuple(json.dumps(r[c], ensure_ascii=False) if c in json_cols else r[c] for c in cols) for r in rows
+    ])
+    res = await conn.exec_driver_sql(
+        f'INSERT INTO "{table.name}" ({col_sql}) SELECT {col_sql} FROM {stage} '
+        f'ON CONFLICT ("{conflict}") DO NOTHING RETURNING ' + ", ".join(f'"{c}"' for c in returning)
+    )
+    inserted = [tuple(r) for r in res.all()]
+    await conn.exec_driver_sql(f"DELETE FROM {stage}")  # второй пакет в той же транзакции
+    return inserted
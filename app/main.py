@@ -1,92 +1,237 @@
-from fastapi import FastAPI, Depends, HTTPException, Request
+import asyncio
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import and_, or_, select, tuple_
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
-from .db import get_session, engine, Base
-from .models import Report, Source, NewsItem
-from .schemas import ReportOut
+from .db import get_session, SessionLocal
+from . import migrate
+from .models import Report, Source
+from .schemas import NewsOut, ReportOut
 from .config import settings
-from .services.reports import generate_daily_report
-from .services.fetchers import fetch_any, is_relevant
-from .services.notify import send_telegram
+from .services.reports import stream_daily_report
+from .services.fetchers import close_client, cache_stats
+from .services import alerting, compaction, jobs, llm, paging, polling, search, seen, transcripts
+from .services.pipeline import run_ingest
+from .services import notify
 
 app = FastAPI(title="AlertBox Baltic API")
 
 @app.on_event("startup")
 async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await migrate.upgrade()
+    async with SessionLocal() as session:
+        await seen.warm_up(session)
+    # доставка Telegram из outbox — в фоне
+    app.state.outbox = asyncio.create_task(notify.run_outbox_worker())
+    # поисковый индекс пуст при непустой news_items (БД до миграции 0003) — заполнить в фоне
+    app.state.search_fill = asyncio.create_task(search.refill())
+
+@app.on_event("shutdown")
+async def shutdown():
+    for name in ("outbox", "search_fill"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    await close_client()
+    await llm.close_client()
+    await notify.close_client()
+    transcripts.shutdown()
 
 @app.get("/health")
 async def health():
     return {"status": "ok", "region": settings.region}
 
-@app.post("/report", response_model=ReportOut)
-async def make_report(session: AsyncSession = Depends(get_session)):
+@app.post("/report", status_code=202)
+async def make_report(window_h: int = 48, langs: str | None = None, translate: bool | None = None):
+    # задание в фоне; одинаковый запрос, пока оно идёт, получает тот же id
+    job = jobs.submit(window_h=window_h, langs=langs.split(",") if langs else None, translate=translate)
+    return job.as_dict()
+
+@app.get("/report/jobs/{job_id}")
+async def report_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No such job")
+    return job.as_dict()
+
+@app.get("/report/jobs/{job_id}/result", response_model=ReportOut)
+async def report_job_result(job_id: str, wait: float = 0, lang: str | None = None,
+                            session: AsyncSession = Depends(get_session)):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No such job")
+    if wait > 0 and not job.done.is_set():
+        try:
+            await jobs.wait(job, timeout=min(wait, 120))
+        except asyncio.TimeoutError:
+            pass
+    if job.status == "error":
+        raise HTTPException(status_code=502, detail=job.error)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if lang and lang not in job.report_ids:
+        raise HTTPException(status_code=404, detail=f"No {lang} report in this job")
+    rep = await session.get(Report, job.report_ids[lang] if lang else job.report_id)
+    if rep is None:
+        raise HTTPException(status_code=404, detail="Report no longer exists")
+    return rep
+
+@app.post("/report/stream")
+async def make_report_stream():
+    # сессия своя: зависимость get_session закрывается раньше, чем дочитан поток
+    async def body():
+        async with SessionLocal() as session:
+            try:
+                async for chunk in stream_daily_report(session):
+                    yield chunk
+            except Exception as e:
+                yield f"\n[error] {e}\n"
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8")
+
+@app.get("/llm/stats")
+async def llm_stats():
+    # задержки p50/p95 и доля ошибок по провайдерам (с момента старта процесса)
+    return llm.provider_stats()
+
+def _csv(v: str | None) -> list[str]:
+    return [x.strip() for x in v.split(",") if x.strip()] if v else []
+
+@app.get("/news", response_model=list[NewsOut])
+async def list_news(request: Request, response: Response, q: str = "", country: str | None = None,
+                    bucket: str | None = None, org: str | None = None, source_id: int | None = None,
+                    min_score: int | None = None, since: datetime | None = None, until: datetime | None = None,
+                    cursor: str | None = None, limit: int = 50, session: AsyncSession = Depends(get_session)):
+    # полнотекстовый поиск и фильтры, от новых к старым; следующая страница — Link rel="next"
+    limit = paging.clamp(limit, 200)
+    after = paging.decode_cursor(cursor, 1)
     try:
-        rep = await generate_daily_report(session)
-        return rep
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=str(e))
+        rows = await search.search_news(
+            session, q, country=_csv(country), bucket=_csv(bucket), org=_csv(org), source_id=source_id,
+            min_score=min_score, since=since, until=until, before_id=after[0] if after else None, limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    etag = paging.etag_of(rows)
+    if paging.not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    paging.page_headers(request, response, etag, paging.encode_cursor(rows[-1]["id"]) if len(rows) == limit else None)
+    return rows
 
 @app.get("/reports", response_model=list[ReportOut])
-async def list_reports(session: AsyncSession = Depends(get_session)):
-    rows = (await session.execute(select(Report).order_by(Report.created_at.desc()).limit(20))).scalars().all()
-    return rows
+async def list_reports(request: Request, response: Response, lang: str | None = None, run_id: str | None = None,
+                       cursor: str | None = None, limit: int = 20, session: AsyncSession = Depends(get_session)):
+    limit = paging.clamp(limit, 100)
+    q = select(Report.id, Report.created_at).order_by(Report.created_at.desc(), Report.id.desc()).limit(limit)
+    if lang:
+        q = q.where(Report.lang == lang)
+    if run_id:
+        q = q.where(Report.run_id == run_id)
+    after = paging.decode_cursor(cursor, 2)
+    if after:
+        try:
+            created = datetime.fromisoformat(after[0])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Bad cursor")
+        q = q.where(tuple_(Report.created_at, Report.id) < tuple_(created, after[1]))
+    keys = (await session.execute(q)).all()
+    # отчёты не меняются после записи: ETag по ключам страницы, текст для 304 не читается
+    etag = paging.etag_of([tuple(k) for k in keys])
+    if paging.not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    paging.page_headers(request, response, etag, paging.encode_cursor(keys[-1].created_at, keys[-1].id) if len(keys) == limit else None)
+    if not keys:
+        return []
+    rows = {r.id: r for r in (await session.execute(
+        select(Report).where(Report.id.in_([k.id for k in keys]))
+    )).scalars()}
+    return [rows[k.id] for k in keys]
 
 @app.get("/sources")
-async def list_sources(session: AsyncSession = Depends(get_session)):
-    rows = (await session.execute(select(Source))).scalars().all()
-    rows = sorted(rows, key=lambda r: getattr(r, "priority", 0), reverse=True)
-    return [
-        {"id": r.id, "name": r.name, "url": r.url, "type": getattr(r, "type","rss"),
-         "country": getattr(r,"country",""), "org": getattr(r,"org",""),
-         "priority": getattr(r,"priority",0)}
-        for r in rows
-    ]
+async def list_sources(request: Request, response: Response, cursor: str | None = None, limit: int = 200,
+                       session: AsyncSession = Depends(get_session)):
+    limit = paging.clamp(limit, 1000)
+    q = (select(Source.id, Source.name, Source.url, Source.type, Source.country, Source.org, Source.priority)
+         .order_by(Source.priority.desc(), Source.id).limit(limit))
+    after = paging.decode_cursor(cursor, 2)
+    if after:
+        q = q.where(or_(Source.priority < after[0], and_(Source.priority == after[0], Source.id > after[1])))
+    rows = [dict(r._mapping) for r in (await session.execute(q)).all()]
+    etag = paging.etag_of(rows)
+    if paging.not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    last = rows[-1] if len(rows) == limit else None
+    paging.page_headers(request, response, etag, paging.encode_cursor(last["priority"], last["id"]) if last else None)
+    return rows
+
+@app.get("/sources/cache")
+async def sources_cache():
+    # попадания/промахи условного GET по каждой ленте
+    return cache_stats()
+
+@app.get("/sources/seen")
+async def sources_seen():
+    # фильтр виденных url: память, ожидаемая и наблюдаемая доля ложных срабатываний
+    return seen.stats()
+
+@app.get("/sources/transcripts")
+async def sources_transcripts():
+    # транскрипты YouTube: из кеша / уже в БД / скачано / субтитров нет
+    return transcripts.stats()
+
+@app.get("/storage/stats")
+async def storage_stats(session: AsyncSession = Depends(get_session)):
+    # горячая таблица, raw_blobs, архивные сегменты и последний проход уплотнения
+    return await compaction.storage_stats(session)
+
+@app.get("/sources/polling")
+async def sources_polling(session: AsyncSession = Depends(get_session)):
+    # интервалы и расписание непрерывного опроса (python -m app.scheduler)
+    return {"per_day": round(await polling.projected_per_day(session)), "budget": await polling.budget_per_day(session),
+            "sources": await polling.schedule_view(session)}
 
 @app.post("/ingest/all")
 async def ingest_all(session: AsyncSession = Depends(get_session)):
     sources = (await session.execute(select(Source))).scalars().all()
-    total_added = 0
-    for src in sources:
-        is_shvets = "швец" in (src.name or "").lower() or "yuryshvets" in (src.url or "").lower()
-        items = await fetch_any(src.type, src.url, shvets=is_shvets)
-        for it in items:
-            exists = (await session.execute(select(NewsItem).where(NewsItem.url == it["url"]))).scalars().first()
-            if exists:
-                continue
-            pub = it["published_at"]
-            if hasattr(pub, "tzinfo") and pub.tzinfo is not None:
-                pub = pub.replace(tzinfo=None)
-            session.add(NewsItem(
-                source_id=src.id, title=(it["title"] or "")[:500], url=(it["url"] or "")[:1000],
-                published_at=pub if isinstance(pub, datetime) else datetime.utcnow(),
-                lang="ru", raw=it.get("raw", {})
-            ))
-            total_added += 1
-    await session.commit()
-    return {"sources": len(sources), "added": total_added}
+    res = await run_ingest(session, sources)
+    names = {src.id: src.name for src in sources}
+    res["per_source"] = {names[sid]: st for sid, st in res["per_source"].items()}
+    return res
+
+@app.get("/alerts/stats")
+async def alerts_stats():
+    # последние срабатывания по темам и число подавленных повторов
+    return alerting.stats()
 
 # ---------- Telegram notifications ----------
 @app.post("/notify/test")
 async def notify_test():
-    ok = await send_telegram("<b>AlertBox test</b> — проверка связи.", parse_mode="HTML")
+    # только постановка в outbox; доставка — воркер
+    ok = await notify.enqueue("<b>AlertBox test</b> — проверка связи.", parse_mode="HTML")
     if not ok.get("ok"):
         raise HTTPException(status_code=500, detail=str(ok))
     return ok
 
 @app.post("/notify/last")
 async def notify_last(session: AsyncSession = Depends(get_session)):
-    last = (await session.execute(select(Report).order_by(Report.created_at.desc()).limit(1))).scalars().first()
+    # основной язык прогона (первый в REPORT_LANGS)
+    lang = (settings.report_langs[0] or "ru").strip()
+    last = (await session.execute(
+        select(Report).where(Report.lang == lang).order_by(Report.created_at.desc()).limit(1)
+    )).scalars().first()
     if not last:
         raise HTTPException(status_code=404, detail="No report")
     TZ = ZoneInfo("Europe/Tallinn")
     title = f"🛰️ AlertBox Baltic — обзор ({datetime.now(TZ).strftime('%d.%m.%Y %H:%M %Z')})"
     text = f"<b>{title}</b>\n\n{last.content}"
-    ok = await send_telegram(text, parse_mode="HTML")
+    # ключ по id отчёта: повторный вызов не разошлёт его второй раз
+    ok = await notify.enqueue(text, key=f"report:{last.id}", parse_mode="HTML", session=session)
     if not ok.get("ok"):
         raise HTTPException(status_code=500, detail=str(ok))
     return ok
+
+@app.get("/notify/outbox")
+async def notify_outbox(session: AsyncSession = Depends(get_session)):
+    return await notify.outbox_stats(session)
@@ -0,0 +1,107 @@
+"""
+Схема БД — миграции Alembic (app/migrations/versions).
+
+API, планировщик и CLI на старте вызывают upgrade() вместо create_all:
+- новая БД создаётся миграциями;
+- БД без alembic_version, но с таблицами (создана create_all до миграций),
+  доводится до моделей (ensure_schema: недостающие таблицы, колонки и
+  индексы, поисковый индекс) и помечается head — модели и head совпадают;
+- дальше — обычный upgrade head.
+
+Несколько процессов стартуют одновременно — миграции идут по очереди:
+SQLite — BEGIN IMMEDIATE (остальные ждут SQLITE_BUSY_MS), PostgreSQL —
+advisory lock на время транзакции.
+
+    python -m app.migrate              # upgrade head
+    python -m app.migrate current      # текущая ревизия
+    alembic revision --autogenerate -m "..."   # новая миграция после правки models.py
+"""
+import argparse
+import asyncio
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from .db import Base, engine
+from . import models  # noqa: F401 — таблицы в metadata
+from .services import search
+
+MIGRATIONS = Path(__file__).resolve().parent / "migrations"
+PG_LOCK_KEY = 0x616C6572  # "aler"
+
+def alembic_config(connection=None) -> Config:
+    cfg = Config()
+    cfg.set_main_option("script_location", str(MIGRATIONS))
+    cfg.attributes["connection"] = connection
+    return cfg
+
+def _add_missing_columns(sync_conn) -> list[str]:
+    insp = inspect(sync_conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        have = {c["name"] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in have:
+                continue
+            ddl = col.type.compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {ddl}')
+            added.append(f"{table.name}.{col.name}")
+        # create_all не трогает индексы уже существующих таблиц
+        for idx in table.indexes:
+            idx.create(sync_conn, checkfirst=True)
+    return added
+
+async def ensure_schema(conn: AsyncConnection) -> list[str]:
+    """Старая БД без миграций -> схема моделей (только добавление)."""
+    added = await conn.run_sync(_add_missing_columns)
+    await conn.run_sync(Base.metadata.create_all)
+    await conn.run_sync(search.create_index)  # head включает 0003, а в моделях индекса нет
+    return added
+
+def _current(sync_conn) -> str | None:
+    return MigrationContext.configure(sync_conn).get_current_revision()
+
+def _upgrade(sync_conn, legacy: bool):
+    cfg = alembic_config(sync_conn)
+    if legacy:
+        command.stamp(cfg, "head")
+    command.upgrade(cfg, "head")
+
+async def upgrade() -> str | None:
+    async with engine.connect() as conn:
+        dialect = conn.dialect.name
+        if dialect == "sqlite":
+            await conn.exec_driver_sql("BEGIN IMMEDIATE")
+        elif dialect == "postgresql":
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": PG_LOCK_KEY})
+        before = await conn.run_sync(_current)
+        legacy = before is None and await conn.run_sync(lambda c: inspect(c).has_table("news_items"))
+        if legacy:
+            added = await ensure_schema(conn)
+            print(f"[migrate] schema before migrations: brought up to models ({', '.join(added) or 'no new columns'}), stamped head")
+        await conn.run_sync(_upgrade, legacy)
+        after = await conn.run_sync(_current)
+        await conn.commit()
+    if after != before:
+        print(f"[migrate] {before or 'empty'} -> {after}")
+    return after
+
+async def current() -> str | None:
+    async with engine.connect() as conn:
+        return await conn.run_sync(_current)
+
+def main():
+    ap = argparse.ArgumentParser(description="Apply database migrations")
+    ap.add_argument("cmd", nargs="?", default="upgrade", choices=("upgrade", "current"))
+    args = ap.parse_args()
+    rev = asyncio.run(upgrade() if args.cmd == "upgrade" else current())
+    print(f"[migrate] at {rev}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Окружение Alembic. URL и движок — из app.db (с профилем SQLite/PostgreSQL),
+метаданные — app.models. app.migrate.upgrade передаёт своё соединение
+через config.attributes["connection"]; из CLI (alembic ...) — свой async-движок.
+"""
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy.engine import Connection
+
+from app.db import Base, engine
+import app.models  # noqa: F401 — таблицы в metadata
+from app.services import search
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+target_metadata = Base.metadata
+
+def include_name(name, type_, parent_names):
+    # поисковый индекс (миграция 0003) живёт вне моделей
+    return not (type_ == "table" and search.is_index_table(name))
+
+def _configure(**kw):
+    context.configure(target_metadata=target_metadata, compare_type=True, include_name=include_name, **kw)
+
+def run_migrations_offline():
+    _configure(url=engine.url.render_as_string(hide_password=False), literal_binds=True,
+               dialect_opts={"paramstyle": "named"}, render_as_batch=engine.dialect.name == "sqlite")
+    with context.begin_transaction():
+        context.run_migrations()
+
+def do_run_migrations(connection: Connection):
+    # SQLite не умеет большую часть ALTER TABLE: изменения колонок — через batch (копия таблицы)
+    _configure(connection=connection, render_as_batch=connection.dialect.name == "sqlite")
+    with context.begin_transaction():
+        context.run_migrations()
+
+async def run_async_migrations():
+    async with engine.connect() as conn:
+        await conn.run_sync(do_run_migrations)
+        await conn.commit()
+    await engine.dispose()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+elif config.attributes.get("connection") is not None:
+    do_run_migrations(config.attributes["connection"])
+else:
+    asyncio.run(run_async_migrations())
@@ -0,0 +1,179 @@
+"""baseline schema: таблицы и индексы, которые до миграций создавал create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 23:31:12.187614
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('archive_segments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.String(length=7), nullable=False),
+        sa.Column('codec', sa.String(length=8), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('min_id', sa.Integer(), nullable=False),
+        sa.Column('max_id', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_archive_segments_month', 'archive_segments', ['month'])
+    op.create_table('feed_state',
+        sa.Column('url', sa.String(length=500), nullable=False),
+        sa.Column('etag', sa.String(length=256), nullable=False),
+        sa.Column('last_modified', sa.String(length=64), nullable=False),
+        sa.Column('body_hash', sa.String(length=64), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False),
+        sa.Column('misses', sa.Integer(), nullable=False),
+        sa.Column('cursor_keys', sa.Text(), nullable=False),
+        sa.Column('cursor_published', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('url')
+    )
+    op.create_table('leader_locks',
+        sa.Column('name', sa.String(length=128), nullable=False),
+        sa.Column('owner', sa.String(length=64), nullable=False),
+        sa.Column('until', sa.DateTime(), nullable=False),
+        sa.Column('acquired_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.create_index('ix_leader_locks_until', 'leader_locks', ['until'])
+    op.create_table('llm_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('provider', sa.String(length=16), nullable=False),
+        sa.Column('model', sa.String(length=64), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_llm_cache_created_at', 'llm_cache', ['created_at'])
+    op.create_table('raw_blobs',
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('codec', sa.String(length=8), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('touched_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('hash')
+    )
+    op.create_index('ix_raw_blobs_touched_at', 'raw_blobs', ['touched_at'])
+    op.create_table('reports',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('period', sa.String(length=64), nullable=False),
+        sa.Column('region', sa.String(length=64), nullable=False),
+        sa.Column('lang', sa.String(length=8), nullable=False),
+        sa.Column('run_id', sa.String(length=32), nullable=True),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('meta', sa.JSON(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_reports_created_at', 'reports', ['created_at'])
+    op.create_index('ix_reports_lang', 'reports', ['lang'])
+    op.create_index('ix_reports_run_id', 'reports', ['run_id'])
+    op.create_table('sources',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=200), nullable=False),
+        sa.Column('url', sa.String(length=500), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('country', sa.String(length=32), nullable=False),
+        sa.Column('org', sa.String(length=64), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('poll_interval_s', sa.Integer(), nullable=True),
+        sa.Column('next_poll_at', sa.DateTime(), nullable=True),
+        sa.Column('last_polled_at', sa.DateTime(), nullable=True),
+        sa.Column('fail_streak', sa.Integer(), nullable=False),
+        sa.Column('idle_streak', sa.Integer(), nullable=False),
+        sa.Column('publish_rate', sa.Float(), nullable=False),
+        sa.Column('lease_owner', sa.String(length=64), nullable=True),
+        sa.Column('lease_until', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('url')
+    )
+    op.create_index('ix_sources_lease_until', 'sources', ['lease_until'])
+    op.create_index('ix_sources_name', 'sources', ['name'], unique=True)
+    op.create_index('ix_sources_next_poll_at', 'sources', ['next_poll_at'])
+    op.create_table('telegram_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('chat_id', sa.String(length=64), nullable=False),
+        sa.Column('part', sa.Integer(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('parse_mode', sa.String(length=16), nullable=False),
+        sa.Column('status', sa.String(length=12), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(length=300), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('key')
+    )
+    op.create_index('ix_telegram_outbox_chat_id', 'telegram_outbox', ['chat_id'])
+    op.create_index('ix_telegram_outbox_next_attempt_at', 'telegram_outbox', ['next_attempt_at'])
+    op.create_index('ix_telegram_outbox_status', 'telegram_outbox', ['status'])
+    op.create_table('transcript_cache',
+        sa.Column('video_id', sa.String(length=32), nullable=False),
+        sa.Column('status', sa.String(length=8), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('video_id')
+    )
+    op.create_table('trend_aggregates',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('bucket', sa.String(length=16), nullable=False),
+        sa.Column('country', sa.String(length=8), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('weight_sum', sa.Float(), nullable=False),
+        sa.Column('weight_sq', sa.Float(), nullable=False),
+        sa.Column('t_sum', sa.Float(), nullable=False),
+        sa.Column('t_sq', sa.Float(), nullable=False),
+        sa.Column('tw_sum', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'bucket', 'country')
+    )
+    op.create_table('news_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=500), nullable=False),
+        sa.Column('url', sa.String(length=1000), nullable=False),
+        sa.Column('url_hash', sa.BigInteger(), nullable=True),
+        sa.Column('published_at', sa.DateTime(), nullable=False),
+        sa.Column('lang', sa.String(length=8), nullable=False),
+        sa.Column('raw', sa.JSON(), nullable=False),
+        sa.Column('score', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.String(length=16), nullable=True),
+        sa.Column('buckets', sa.String(length=128), nullable=False),
+        sa.Column('country', sa.String(length=8), nullable=False),
+        sa.Column('org', sa.String(length=20), nullable=False),
+        sa.Column('minhash', sa.LargeBinary(), nullable=True),
+        sa.ForeignKeyConstraint(['source_id'], ['sources.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('url', name='uq_news_url')
+    )
+    op.create_index('ix_news_items_bucket', 'news_items', ['bucket'])
+    op.create_index('ix_news_items_country', 'news_items', ['country'])
+    op.create_index('ix_news_items_org', 'news_items', ['org'])
+    op.create_index('ix_news_items_published_at', 'news_items', ['published_at'])
+    op.create_index('ix_news_items_url_hash', 'news_items', ['url_hash'])
+    op.create_index('ix_news_pub_score', 'news_items', ['published_at', 'score'])
+
+def downgrade():
+    op.drop_table('news_items')
+    op.drop_table('trend_aggregates')
+    op.drop_table('transcript_cache')
+    op.drop_table('telegram_outbox')
+    op.drop_table('sources')
+    op.drop_table('reports')
+    op.drop_table('raw_blobs')
+    op.drop_table('llm_cache')
+    op.drop_table('leader_locks')
+    op.drop_table('feed_state')
+    op.drop_table('archive_segments')
@@ -0,0 +1,29 @@
+"""составные индексы под реальные запросы
+
+- news_items(source_id, published_at): внешний ключ без индекса, выборки по ленте;
+- reports(lang, created_at): последний отчёт на языке и /reports?lang= без сортировки;
+- telegram_outbox(status, next_attempt_at): проход доставки каждые TG_POLL_S секунд.
+
+if_not_exists — на случай, если индекс уже создан вручную или старым
+python -m app.backfill (он создавал все индексы моделей).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 23:40:00.000000
+"""
+from alembic import op
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_news_source_pub', 'news_items', ['source_id', 'published_at'], if_not_exists=True)
+    op.create_index('ix_reports_lang_created', 'reports', ['lang', 'created_at'], if_not_exists=True)
+    op.create_index('ix_outbox_due', 'telegram_outbox', ['status', 'next_attempt_at'], if_not_exists=True)
+
+def downgrade():
+    op.drop_index('ix_outbox_due', table_name='telegram_outbox')
+    op.drop_index('ix_reports_lang_created', table_name='reports')
+    op.drop_index('ix_news_source_pub', table_name='news_items')
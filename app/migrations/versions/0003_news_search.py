@@ -0,0 +1,27 @@
+"""полнотекстовый индекс новостей (GET /news?q=)
+
+SQLite — FTS5 news_fts без содержимого, PostgreSQL — news_search(tsvector)
+с GIN-индексом; DDL — app/services/search.index_ddl. Заполняется
+ингестом; существующие строки — python -m app.search --rebuild (API на старте
+делает это сам, если индекс пуст).
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 01:10:00.000000
+"""
+from alembic import op
+
+from app.services import search
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    for ddl in search.index_ddl(op.get_context().dialect.name):
+        op.execute(ddl)
+
+def downgrade():
+    for ddl in search.drop_ddl(op.get_context().dialect.name):
+        op.execute(ddl)
@@ -1,6 +1,6 @@
-from sqlalchemy import String, Text, DateTime, Integer, ForeignKey, JSON, UniqueConstraint
+from sqlalchemy import BigInteger, String, Text, DateTime, Date, Integer, Float, ForeignKey, JSON, LargeBinary, UniqueConstraint, Index, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from datetime import datetime
+from datetime import datetime, date
 from .db import Base
 
 class Source(Base):
@@ -12,6 +12,16 @@ class Source(Base):
     country: Mapped[str] = mapped_column(String(32), default="")   # EE/LV/LT/FI/PL/UA/EU/NATO/...
     org: Mapped[str] = mapped_column(String(64), default="")       # MOD/MFA/MEDIA/NATO/COUNCIL/EU
     priority: Mapped[int] = mapped_column(Integer, default=5)      # 1..10
+    # адаптивный опрос (services/polling.py)
+    poll_interval_s: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    next_poll_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, index=True)
+    last_polled_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    fail_streak: Mapped[int] = mapped_column(Integer, default=0)
+    idle_streak: Mapped[int] = mapped_column(Integer, default=0)   # подряд без новых строк
+    publish_rate: Mapped[float] = mapped_column(Float, default=0.0)  # новых строк в час, EWMA
+    # аренда источника воркером планировщика (services/leases.py)
+    lease_owner: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    lease_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, index=True)
 
 class NewsItem(Base):
     __tablename__ = "news_items"
@@ -19,18 +29,137 @@ class NewsItem(Base):
     source_id: Mapped[int] = mapped_column(ForeignKey("sources.id"))
     title: Mapped[str] = mapped_column(String(500))
     url: Mapped[str] = mapped_column(String(1000))
+    # 64-битный хеш нормализованного url (analyzer/urlset.py): проверка «уже есть» по узкому индексу
+    url_hash: Mapped[int | None] = mapped_column(BigInteger, nullable=True, index=True)
     published_at: Mapped[datetime] = mapped_column(DateTime, index=True)
     lang: Mapped[str] = mapped_column(String(8), default="ru")
     raw: Mapped[dict] = mapped_column(JSON)
-    __table_args__ = (UniqueConstraint("url", name="uq_news_url"),)
+    # классификация при ингесте (app.analyzer.classify); пустой country — ещё не размечено
+    score: Mapped[int] = mapped_column(Integer, default=0)
+    bucket: Mapped[str | None] = mapped_column(String(16), nullable=True, index=True)
+    buckets: Mapped[str] = mapped_column(String(128), default="")  # все темы через запятую
+    country: Mapped[str] = mapped_column(String(8), default="", index=True)
+    org: Mapped[str] = mapped_column(String(20), default="", index=True)
+    minhash: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)  # подпись сюжета (analyzer.dedup)
+    __table_args__ = (
+        UniqueConstraint("url", name="uq_news_url"),
+        Index("ix_news_pub_score", "published_at", "score"),
+        Index("ix_news_source_pub", "source_id", "published_at"),  # внешний ключ + выборки по ленте
+    )
     source = relationship("Source")
 
+@event.listens_for(NewsItem.__table__, "after_create")
+def _create_search_index(target, connection, **kw):
+    # поисковый индекс (services/search.py) вне метаданных: create_all (бенчмарки, тесты) создаёт его вместе с таблицей
+    from .services import search
+    search.create_index(connection)
+
+class FeedState(Base):
+    # валидаторы условного GET по ленте + счётчики попаданий кеша
+    __tablename__ = "feed_state"
+    url: Mapped[str] = mapped_column(String(500), primary_key=True)
+    etag: Mapped[str] = mapped_column(String(256), default="")
+    last_modified: Mapped[str] = mapped_column(String(64), default="")
+    body_hash: Mapped[str] = mapped_column(String(64), default="")
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+    misses: Mapped[int] = mapped_column(Integer, default=0)
+    # курсор потокового разбора (services/feedparse.py): хеши ключей последних записей и самая свежая дата
+    cursor_keys: Mapped[str] = mapped_column(Text, default="")
+    cursor_published: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class TranscriptCache(Base):
+    # транскрипты YouTube по id видео; status=none — субтитров нет (перепроверка через TRANSCRIPT_RETRY_H)
+    __tablename__ = "transcript_cache"
+    video_id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    status: Mapped[str] = mapped_column(String(8), default="ok")  # ok | none
+    text: Mapped[str] = mapped_column(Text, default="")
+    fetched_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class RawBlob(Base):
+    # большие поля raw вне news_items (services/blobstore.py): ключ — sha256 текста, данные сжаты
+    __tablename__ = "raw_blobs"
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    codec: Mapped[str] = mapped_column(String(8), default="zlib")   # zlib | zstd
+    size: Mapped[int] = mapped_column(Integer, default=0)           # байт до сжатия
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    touched_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+class ArchiveSegment(Base):
+    # news_items старше RETENTION_DAYS (services/compaction.py): JSON Lines за месяц публикации, сжатые
+    __tablename__ = "archive_segments"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    month: Mapped[str] = mapped_column(String(7), index=True)       # YYYY-MM
+    codec: Mapped[str] = mapped_column(String(8), default="zlib")
+    rows: Mapped[int] = mapped_column(Integer, default=0)
+    size: Mapped[int] = mapped_column(Integer, default=0)           # байт до сжатия
+    min_id: Mapped[int] = mapped_column(Integer, default=0)
+    max_id: Mapped[int] = mapped_column(Integer, default=0)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class TrendAggregate(Base):
+    # скользящие агрегаты сигналов (score >= 1) по дням; обновляются при ингесте.
+    # t — смещение публикации от начала суток (сек), w — вес (score):
+    # суммы t, t², t·w, w, w² — достаточная статистика для регрессии w по времени
+    __tablename__ = "trend_aggregates"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    bucket: Mapped[str] = mapped_column(String(16), primary_key=True)
+    country: Mapped[str] = mapped_column(String(8), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    weight_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    weight_sq: Mapped[float] = mapped_column(Float, default=0.0)
+    t_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    t_sq: Mapped[float] = mapped_column(Float, default=0.0)
+    tw_sum: Mapped[float] = mapped_column(Float, default=0.0)
+
+class LLMCache(Base):
+    # кеш completion'ов: ключ = sha256(provider, model, max_tokens, sha256(prompt))
+    __tablename__ = "llm_cache"
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    provider: Mapped[str] = mapped_column(String(16))
+    model: Mapped[str] = mapped_column(String(64))
+    content: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+
 class Report(Base):
     __tablename__ = "reports"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
     period: Mapped[str] = mapped_column(String(64), default="daily")
     region: Mapped[str] = mapped_column(String(64), default="Baltics")
-    lang: Mapped[str] = mapped_column(String(8), default="ru")
+    lang: Mapped[str] = mapped_column(String(8), default="ru", index=True)
+    run_id: Mapped[str | None] = mapped_column(String(32), index=True, nullable=True)  # один прогон — все языки
     content: Mapped[str] = mapped_column(Text)
     meta: Mapped[dict] = mapped_column(JSON, default={})
+    __table_args__ = (
+        Index("ix_reports_lang_created", "lang", "created_at"),  # последний отчёт на языке, /reports?lang=
+    )
+
+class LeaderLock(Base):
+    # блокировка-лидер с истечением: одну задачу (отчёт по cron) выполняет один процесс
+    __tablename__ = "leader_locks"
+    name: Mapped[str] = mapped_column(String(128), primary_key=True)
+    owner: Mapped[str] = mapped_column(String(64))
+    until: Mapped[datetime] = mapped_column(DateTime, index=True)
+    acquired_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class OutboxMessage(Base):
+    # исходящие сообщения Telegram: одна строка — одна часть текста одному чату
+    __tablename__ = "telegram_outbox"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    key: Mapped[str] = mapped_column(String(64), unique=True)        # идемпотентность: (ключ, чат, часть)
+    chat_id: Mapped[str] = mapped_column(String(64), index=True)
+    part: Mapped[int] = mapped_column(Integer, default=0)
+    text: Mapped[str] = mapped_column(Text)
+    parse_mode: Mapped[str] = mapped_column(String(16), default="HTML")
+    status: Mapped[str] = mapped_column(String(12), default="pending", index=True)  # pending|sending|sent|failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    last_error: Mapped[str] = mapped_column(String(300), default="")
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    __table_args__ = (
+        Index("ix_outbox_due", "status", "next_attempt_at"),  # проход доставки каждые TG_POLL_S
+    )
@@ -9,59 +9,83 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from .db import engine
-from .models import Source, NewsItem
-from .services.notify import send_telegram
-from .services.fetchers import fetch_any
-from .services.reports import generate_daily_report
+from . import migrate
+from .config import settings
+from .models import Report
+from .services import compaction, jobs, leases, notify, polling, seen
+from .services.pipeline import run_ingest
 
 TZ = ZoneInfo("Europe/Tallinn")
 async_session_maker = sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
 
 async def do_ingest(session: AsyncSession) -> int:
-    from sqlalchemy import select
-    sources = (await session.execute(select(Source))).scalars().all()
-    total = 0
-    for src in sources:
-        is_shvets = "швец" in (src.name or "").lower() or "yuryshvets" in (src.url or "").lower()
-        items = await fetch_any(getattr(src, "type", "rss"), src.url, shvets=is_shvets)
-        for it in items:
-            from sqlalchemy import select as _sel
-            exists = (await session.execute(_sel(NewsItem).where(NewsItem.url == it["url"]))).scalars().first()
-            if exists:
-                continue
-            pub = it["published_at"]
-            if hasattr(pub, "tzinfo") and pub.tzinfo is not None:
-                pub = pub.replace(tzinfo=None)
-            session.add(NewsItem(
-                source_id=src.id,
-                title=(it["title"] or "")[:500],
-                url=(it["url"] or "")[:1000],
-                published_at=pub if isinstance(pub, datetime) else datetime.utcnow(),
-                lang="ru",
-                raw=it.get("raw", {})
-            ))
-            total += 1
-    await session.commit()
-    return total
+    res = await run_ingest(session)
+    return res["added"]
 
 async def job_once(tag: str):
     async with async_session_maker() as session:
-        added = await do_ingest(session)
-        rep = await generate_daily_report(session)
+        # процессов планировщика может быть несколько: отчёт слота строит один
+        slot = f"report:{datetime.now(TZ):%Y%m%d}:{tag}"
+        if not await leases.acquire_lock(session, slot, settings.report_lock_s):
+            print(f"[scheduler] {tag}: report slot taken by another worker")
+            return
+        if not settings.poller:
+            # без непрерывного опроса — ингест всех лент перед отчётом, как раньше
+            await do_ingest(session)
+        # через реестр заданий: если отчёт за то же окно уже генерируется — ждём его
+        job = await jobs.wait(jobs.submit())
+        if job.status != "done":
+            print(f"[scheduler] {tag}: report failed: {job.error}")
+            return
+        rep = await session.get(Report, job.report_id)
         title = f"🛰️ AlertBox Baltic — обзор ({datetime.now(TZ).strftime('%d.%m.%Y %H:%M %Z')})"
         text = f"<b>{title}</b>\n\n{rep.content}"
-        await send_telegram(text)
+        await notify.enqueue(text, key=f"report:{rep.id}")
+
+async def job_compact():
+    async with async_session_maker() as session:
+        # раз в сутки на всех воркеров; сам проход ещё держит блокировку от ручного python -m app.compact
+        if not await leases.acquire_lock(session, f"compaction:{datetime.now(TZ):%Y%m%d}", 23 * 3600):
+            return
+    try:
+        await compaction.run_compaction()
+    except Exception as e:
+        print(f"[scheduler] compaction failed: {e!r}")
 
 async def run_scheduler():
-    print("[scheduler] Europe/Tallinn cron at 10:00 & 22:00")
+    print(f"[scheduler] worker {leases.WORKER_ID}; Europe/Tallinn report cron at 10:00 & 22:00")
+    await migrate.upgrade()
+    # фильтр виденных url — до первого опроса
+    async with async_session_maker() as session:
+        await seen.warm_up(session)
     sched = AsyncIOScheduler(timezone=TZ, event_loop=asyncio.get_running_loop())
     sched.add_job(job_once, CronTrigger(hour=10, minute=0, timezone=TZ), kwargs={"tag": "morning"})
     sched.add_job(job_once, CronTrigger(hour=22, minute=0, timezone=TZ), kwargs={"tag": "evening"})
+    sched.add_job(job_compact, CronTrigger(hour=settings.compact_hour, minute=30, timezone=TZ))
     sched.start()
+    tasks = [asyncio.create_task(notify.run_outbox_worker(), name="outbox")]  # доставка Telegram — в этом же процессе
+    if settings.poller:
+        # ленты опрашиваются непрерывно, каждая со своим интервалом; cron — только отчёты
+        tasks.append(asyncio.create_task(polling.run_poller(), name="poller"))
+    for t in tasks:
+        t.add_done_callback(_report_exit)
     for j in sched.get_jobs():
         print("[scheduler] next:", j.trigger, "->", j.next_run_time)
-    # держим цикл вечно
-    await asyncio.Event().wait()
+    try:
+        await asyncio.Event().wait()  # держим цикл до остановки процесса
+    finally:
+        sched.shutdown(wait=False)
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await notify.close_client()
+
+def _report_exit(task: asyncio.Task):
+    # фоновые циклы сами не завершаются: выход — это падение, молча терять его нельзя
+    if task.cancelled():
+        return
+    exc = task.exception()
+    print(f"[scheduler] {task.get_name()} task stopped: {exc!r}" if exc else f"[scheduler] {task.get_name()} task exited")
 
 def main():
     asyncio.run(run_scheduler())
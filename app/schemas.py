@@ -7,7 +7,20 @@ class ReportOut(BaseModel):
     period: str
     region: str
     lang: str
+    run_id: str | None = None
     content: str
 
     class Config:
         from_attributes = True
+
+class NewsOut(BaseModel):
+    id: int
+    source_id: int
+    title: str
+    url: str
+    published_at: datetime
+    score: int
+    bucket: str | None = None
+    buckets: str | None = None
+    country: str | None = None
+    org: str | None = None
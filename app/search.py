@@ -0,0 +1,46 @@
+"""
+Полнотекстовый индекс новостей (services/search.py):
+
+    python -m app.search --rebuild          # пересобрать по news_items
+    python -m app.search "дрон* -учения"    # запрос, как GET /news?q=
+
+Индекс ведёт ингест; пересборка нужна после ручной правки news_items
+или восстановления БД из копии без него.
+"""
+import argparse
+import asyncio
+import time
+
+from . import migrate
+from .db import SessionLocal
+from .services import search
+
+async def rebuild() -> int | None:
+    await migrate.upgrade()
+    return await search.refill(force=True)
+
+async def query(q: str, limit: int) -> None:
+    async with SessionLocal() as session:
+        t0 = time.perf_counter()
+        rows = await search.search_news(session, q, limit=limit)
+        ms = (time.perf_counter() - t0) * 1000
+    for r in rows:
+        print(f"{r['id']:>8} {r['published_at']:%Y-%m-%d %H:%M} {r['score']} {r['title'][:100]}")
+    print(f"[search] {len(rows)} rows in {ms:.1f} ms")
+
+def main():
+    ap = argparse.ArgumentParser(description="Full-text index of news items")
+    ap.add_argument("q", nargs="?", help="query: words, \"phrase\", prefix*, -exclude")
+    ap.add_argument("--rebuild", action="store_true", help="rebuild the index from news_items")
+    ap.add_argument("--limit", type=int, default=20)
+    args = ap.parse_args()
+    if args.rebuild:
+        if asyncio.run(rebuild()) is None:
+            print("[search] another process is rebuilding the index")
+    elif args.q:
+        asyncio.run(query(args.q, args.limit))
+    else:
+        ap.error("give a query or --rebuild")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Связка детектора всплесков (analyzer/alerts.py) с ингестом и outbox:
+новые строки после коммита пакета -> детектор -> короткий алерт в Telegram.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..analyzer.alerts import Alert, BASE_SLOT_MIN, BASE_SLOTS, BurstDetector
+from ..config import settings
+from ..models import NewsItem
+from . import notify
+
+_DETECTOR: BurstDetector | None = None
+_warm = False
+
+def get_detector() -> BurstDetector:
+    global _DETECTOR
+    if _DETECTOR is None:
+        _DETECTOR = BurstDetector(
+            [b.strip() for b in settings.alert_buckets if b.strip()],
+            window_min=settings.alert_window_min, min_items=settings.alert_min_items,
+            min_countries=settings.alert_min_countries, min_score=settings.alert_min_score,
+            baseline_x=settings.alert_baseline_x, cooldown_min=settings.alert_cooldown_min,
+            max_lag_min=settings.alert_max_lag_min,
+        )
+    return _DETECTOR
+
+async def warm_up(session: AsyncSession):
+    """
+    После рестарта база пустая и любой шум выглядел бы всплеском: поднимаем сутки
+    истории в базовую линию. Один раз на процесс, до записи первого пакета.
+    """
+    global _warm
+    if _warm or not settings.alerts:
+        return
+    _warm = True
+    det = get_detector()
+    since = datetime.utcnow() - timedelta(minutes=BASE_SLOT_MIN * BASE_SLOTS)
+    rows = (await session.execute(
+        select(NewsItem.published_at, NewsItem.score, NewsItem.bucket, NewsItem.buckets)
+        .where(NewsItem.published_at >= since, NewsItem.score >= det.min_score)
+    )).mappings().all()
+    for r in rows:
+        det.prime(r)
+
+async def handle(session: AsyncSession, rows: Iterable[Dict[str, Any]]) -> List[Alert]:
+    """Новые (только что вставленные) строки news_items -> алерты, уже поставленные в outbox."""
+    if not settings.alerts:
+        return []
+    det = get_detector()
+    fired = [a for r in rows for a in det.observe(r)]
+    for a in fired:
+        print(f"[alerts] {a.bucket}: {a.count} items, {a.countries}")
+        await notify.enqueue(a.text(), key=a.key, session=session)
+    return fired
+
+def stats() -> dict:
+    return get_detector().stats() if _DETECTOR is not None else {}
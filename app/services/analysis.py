@@ -1,6 +1,7 @@
-def build_prompt(news_block: list[dict], region: str, langs: list[str]):
-    joined = "\n\n".join([f"- {n['title']} ({n['url']})" for n in news_block[:30]])
-    return f"""
+from ..config import settings
+from .packer import SIGNALS, TOP_SIGNALS, Unit, pack, signal_priority
+
+PROMPT = """
 Ты — аналитик ситуационного мониторинга по региону {region}.
 На основе новостей составь краткий ситуационный отчёт с пунктами:
 1) ключевые события (по категориям),
@@ -8,5 +9,19 @@ def build_prompt(news_block: list[dict], region: str, langs: list[str]):
 3) что отслеживать дальше,
 4) короткий вывод.
 Сначала на русском, затем на английском. Новости:
-{joined}
+{news}
 """
+
+def build_prompt(news_block: list[dict], region: str, langs: list[str], budget: int | None = None):
+    # новости по весу, пока влезают в бюджет токенов (вместо фиксированных 30)
+    ranked = sorted(
+        ((signal_priority(n.get("score") or 0, n.get("priority") or 5, n.get("size") or 1), n) for n in news_block),
+        key=lambda wn: -wn[0],
+    )
+    units = [
+        Unit("news", f"- {n['title']} ({n['url']})", TOP_SIGNALS if i < settings.pack_min_signals else SIGNALS,
+             weight=w, order=i)
+        for i, (w, n) in enumerate(ranked)
+    ]
+    packed = pack(units, budget or settings.llm_input_budget, overhead=PROMPT.format(region=region, news=""))
+    return PROMPT.format(region=region, news="\n\n".join(packed.sections.get("news", [])))
@@ -0,0 +1,134 @@
+"""
+Большие поля raw (транскрипты, длинные summary) — вне news_items.
+
+Поле длиннее BLOB_MIN_BYTES при записи уходит в raw_blobs: ключ — sha256
+текста (одинаковый текст хранится один раз), данные сжаты zstd (если есть
+пакет zstandard) или zlib. В raw остаётся ссылка {"_blobs": {поле: sha256}},
+так что строка news_items короткая и сканы таблицы не тянут транскрипты
+через кеш страниц. Кому нужен полный raw — hydrate().
+
+touched_at обновляется при каждой повторной ссылке: сборщик мусора
+(compaction.gc_blobs) удаляет только блобы, не тронутые с начала прохода.
+"""
+import hashlib
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models import RawBlob
+
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
+FIELDS = ("transcript", "summary")
+LOOKUP_CHUNK = 500
+
+def codec() -> str:
+    want = settings.blob_codec
+    if want == "zstd" or (want == "auto" and zstandard is not None):
+        return "zstd" if zstandard is not None else "zlib"
+    return "zlib"
+
+def compress(data: bytes, how: str | None = None) -> tuple[str, bytes]:
+    how = how or codec()
+    if how == "zstd":
+        return how, zstandard.ZstdCompressor(level=9).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+def decompress(how: str, data: bytes) -> bytes:
+    if how == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd blob, but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+def _upsert_stmt(session: AsyncSession):
+    # повторная ссылка на тот же текст — только touched_at
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(RawBlob)
+    return stmt.on_conflict_do_update(index_elements=["hash"], set_={"touched_at": stmt.excluded.touched_at})
+
+async def put_many(session: AsyncSession, texts: Dict[str, str]) -> int:
+    """{sha256: текст} -> raw_blobs; коммит — на вызывающем."""
+    if not texts:
+        return 0
+    now = datetime.utcnow()
+    rows = []
+    for h, text in texts.items():
+        data = text.encode()
+        how, packed = compress(data)
+        rows.append({"hash": h, "codec": how, "size": len(data), "data": packed, "touched_at": now})
+    stmt = _upsert_stmt(session)
+    if stmt is not None:
+        await session.execute(stmt, rows)
+        return len(rows)
+    for r in rows:
+        blob = await session.get(RawBlob, r["hash"])
+        if blob is None:
+            session.add(RawBlob(**r))
+        else:
+            blob.touched_at = now
+    return len(rows)
+
+def split_raw(raw: Dict[str, Any], pending: Dict[str, str]) -> Dict[str, Any]:
+    """Копия raw без больших полей (ссылки в _blobs); тексты — в pending."""
+    out = None
+    for f in FIELDS:
+        text = raw.get(f)
+        if not isinstance(text, str) or len(text.encode()) < settings.blob_min_bytes:
+            continue
+        h = hashlib.sha256(text.encode()).hexdigest()
+        pending[h] = text
+        if out is None:
+            out = {**raw, "_blobs": dict(raw.get("_blobs") or {})}
+        del out[f]
+        out["_blobs"][f] = h
+    return raw if out is None else out
+
+async def externalize(session: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """Строки news_items (dict) перед вставкой: большие поля raw -> raw_blobs."""
+    if settings.blob_min_bytes <= 0:
+        return 0
+    pending: Dict[str, str] = {}
+    for r in rows:
+        if r.get("raw"):
+            r["raw"] = split_raw(r["raw"], pending)
+    return await put_many(session, pending)
+
+async def get_texts(session: AsyncSession, hashes: Iterable[str]) -> Dict[str, str]:
+    want = list(set(hashes))
+    out: Dict[str, str] = {}
+    for i in range(0, len(want), LOOKUP_CHUNK):
+        for b in (await session.execute(
+            select(RawBlob.hash, RawBlob.codec, RawBlob.data).where(RawBlob.hash.in_(want[i:i + LOOKUP_CHUNK]))
+        )).all():
+            out[b.hash] = decompress(b.codec, b.data).decode()
+    return out
+
+async def hydrate(session: AsyncSession, raws: Iterable[Dict[str, Any]], fields: Iterable[str] = FIELDS) -> int:
+    """Вернуть большие поля в raw на месте (запрос на каждые LOOKUP_CHUNK ссылок)."""
+    fields = tuple(fields)
+    raws = [r for r in raws if r and r.get("_blobs")]
+    blobs = await get_texts(session, (h for r in raws for f, h in r["_blobs"].items() if f in fields))
+    if not blobs:
+        return 0
+    for r in raws:
+        refs = r["_blobs"]
+        for f in fields:
+            if f in refs and refs[f] in blobs:
+                r[f] = blobs[refs.pop(f)]
+        if not refs:
+            del r["_blobs"]
+    return len(blobs)
@@ -0,0 +1,240 @@
+"""
+Хранение истории: вынос больших полей raw, архив старых строк, сборка мусора.
+
+Один проход run_compaction (раз в сутки из планировщика под блокировкой
+лидера; вручную — python -m app.compact):
+1. externalize_existing — большие поля raw строк, записанных до blobstore,
+   -> raw_blobs;
+2. archive_old — строки старше RETENTION_DAYS -> archive_segments (JSON Lines
+   за месяц публикации, raw вместе с транскриптами, сжато) и удаление из
+   news_items и из поискового индекса; пачками по ARCHIVE_BATCH, каждая
+   в своей транзакции;
+3. merge_segments — порции закрытого месяца -> сегменты до ARCHIVE_SEGMENT_ROWS;
+4. gc_blobs — блобы, на которые больше не ссылается news_items;
+5. COMPACT_VACUUM=1 — VACUUM для SQLite (иначе освобождённые страницы
+   переиспользуются, но файл не уменьшается).
+
+В news_items остаются только RETENTION_DAYS дней, так что размер горячей
+таблицы и время её сканов не растут с историей. Архив читается через
+iter_archived (пересборка trend_aggregates и прочие backfill'ы).
+"""
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List
+
+from sqlalchemy import Text, cast, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..db import SessionLocal, engine
+from ..models import ArchiveSegment, NewsItem, RawBlob
+from . import blobstore, leases, search
+
+COLUMNS = (NewsItem.id, NewsItem.source_id, NewsItem.title, NewsItem.url, NewsItem.url_hash,
+           NewsItem.published_at, NewsItem.lang, NewsItem.raw, NewsItem.score, NewsItem.bucket,
+           NewsItem.buckets, NewsItem.country, NewsItem.org, NewsItem.minhash)
+GC_CHUNK = 20000
+LOOKUP_CHUNK = 500
+
+LAST: Dict[str, Any] = {}
+
+# ---------- сегменты ----------
+
+def _encode(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    lines = []
+    for r in rows:
+        r = {**r, "published_at": r["published_at"].isoformat(),
+             "minhash": r["minhash"].hex() if r.get("minhash") else None}
+        lines.append(json.dumps(r, ensure_ascii=False, separators=(",", ":")))
+    data = "\n".join(lines).encode()
+    how, packed = blobstore.compress(data)
+    return {"codec": how, "rows": len(rows), "size": len(data), "data": packed,
+            "min_id": min(r["id"] for r in rows), "max_id": max(r["id"] for r in rows)}
+
+def _decode(codec: str, data: bytes) -> List[Dict[str, Any]]:
+    rows = []
+    for line in blobstore.decompress(codec, data).decode().splitlines():
+        r = json.loads(line)
+        r["published_at"] = datetime.fromisoformat(r["published_at"])
+        r["minhash"] = bytes.fromhex(r["minhash"]) if r.get("minhash") else None
+        rows.append(r)
+    return rows
+
+async def iter_archived(session: AsyncSession, since: datetime | None = None,
+                        until: datetime | None = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Архивные строки news_items (dict, raw целиком) пачками по сегменту."""
+    q = select(ArchiveSegment.id).order_by(ArchiveSegment.month, ArchiveSegment.min_id)
+    if since is not None:
+        q = q.where(ArchiveSegment.month >= f"{since:%Y-%m}")
+    if until is not None:
+        q = q.where(ArchiveSegment.month <= f"{until:%Y-%m}")
+    for seg_id in (await session.execute(q)).scalars().all():
+        seg = (await session.execute(
+            select(ArchiveSegment.codec, ArchiveSegment.data).where(ArchiveSegment.id == seg_id)
+        )).one()
+        rows = [r for r in _decode(seg.codec, seg.data)
+                if (since is None or r["published_at"] >= since) and (until is None or r["published_at"] < until)]
+        if rows:
+            yield rows
+
+# ---------- проход ----------
+
+async def externalize_existing(session: AsyncSession, batch: int | None = None) -> int:
+    """Старые строки с большим raw inline -> ссылки на raw_blobs."""
+    batch = batch or settings.archive_batch
+    last_id, done = 0, 0
+    while True:
+        rows = (await session.execute(
+            select(NewsItem.id, NewsItem.raw)
+            .where(NewsItem.id > last_id, func.length(cast(NewsItem.raw, Text)) > settings.blob_min_bytes)
+            .order_by(NewsItem.id).limit(batch)
+        )).all()
+        if not rows:
+            break
+        pending: Dict[str, str] = {}
+        params = []
+        for r in rows:
+            raw = blobstore.split_raw(r.raw or {}, pending)
+            if raw is not r.raw:
+                params.append({"id": r.id, "raw": raw})
+        await blobstore.put_many(session, pending)
+        if params:
+            await session.execute(update(NewsItem), params)
+        await session.commit()
+        done += len(params)
+        last_id = rows[-1].id
+    return done
+
+async def archive_old(session: AsyncSession, days: int, batch: int | None = None,
+                      now: datetime | None = None) -> int:
+    batch = batch or settings.archive_batch
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    done = 0
+    while True:
+        rows = [dict(r._mapping) for r in (await session.execute(
+            select(*COLUMNS).where(NewsItem.published_at < cutoff).order_by(NewsItem.id).limit(batch)
+        )).all()]
+        if not rows:
+            break
+        await blobstore.hydrate(session, [r["raw"] for r in rows])  # сегмент самодостаточен
+        await search.unindex(session, [(r["id"], r["title"], search.doc_text(r["raw"])) for r in rows])
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for r in rows:
+            by_month.setdefault(f"{r['published_at']:%Y-%m}", []).append(r)
+        session.add_all([ArchiveSegment(month=m, **_encode(rs)) for m, rs in by_month.items()])
+        # ровно выбранные строки: все старые с id <= последнего (выборка шла по id)
+        await session.execute(delete(NewsItem).where(NewsItem.published_at < cutoff, NewsItem.id <= rows[-1]["id"]))
+        await session.commit()
+        done += len(rows)
+    return done
+
+async def merge_segments(session: AsyncSession, days: int, now: datetime | None = None) -> int:
+    """Склеить порции закрытых месяцев (целиком старше окна) в сегменты до ARCHIVE_SEGMENT_ROWS."""
+    closed = f"{(now or datetime.utcnow()) - timedelta(days=days):%Y-%m}"  # этот месяц ещё пополняется
+    months = (await session.execute(
+        select(ArchiveSegment.month).where(ArchiveSegment.month < closed)
+        .group_by(ArchiveSegment.month).having(func.count() > 1)
+    )).scalars().all()
+    merged = 0
+    for month in months:
+        parts = (await session.execute(
+            select(ArchiveSegment.id, ArchiveSegment.rows).where(ArchiveSegment.month == month)
+            .order_by(ArchiveSegment.min_id)
+        )).all()
+        groups, cur, n = [], [], 0
+        for p in parts:
+            if cur and n + p.rows > settings.archive_segment_rows:
+                groups.append(cur)
+                cur, n = [], 0
+            cur.append(p.id)
+            n += p.rows
+        groups.append(cur)
+        for ids in groups:
+            if len(ids) < 2:
+                continue
+            rows: List[Dict[str, Any]] = []
+            for seg in (await session.execute(
+                select(ArchiveSegment.codec, ArchiveSegment.data).where(ArchiveSegment.id.in_(ids))
+            )).all():
+                rows += _decode(seg.codec, seg.data)
+            rows.sort(key=lambda r: r["id"])
+            session.add(ArchiveSegment(month=month, **_encode(rows)))
+            await session.execute(delete(ArchiveSegment).where(ArchiveSegment.id.in_(ids)))
+            await session.commit()
+            merged += len(ids)
+    return merged
+
+async def gc_blobs(session: AsyncSession) -> int:
+    started = datetime.utcnow()
+    used: set[str] = set()
+    last_id = 0
+    while True:
+        rows = (await session.execute(
+            select(NewsItem.id, NewsItem.raw["_blobs"]).where(NewsItem.id > last_id)
+            .order_by(NewsItem.id).limit(GC_CHUNK)
+        )).all()
+        if not rows:
+            break
+        for _, refs in rows:
+            if refs:
+                used.update(refs.values())
+        last_id = rows[-1][0]
+    # тронутые после начала прохода не трогаем: их мог только что сослаться ингест
+    stale = [h for h in (await session.execute(
+        select(RawBlob.hash).where(RawBlob.touched_at < started)
+    )).scalars() if h not in used]
+    for i in range(0, len(stale), LOOKUP_CHUNK):
+        await session.execute(delete(RawBlob).where(RawBlob.hash.in_(stale[i:i + LOOKUP_CHUNK])))
+    await session.commit()
+    return len(stale)
+
+async def vacuum_sqlite() -> bool:
+    if engine.dialect.name != "sqlite":
+        return False
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("VACUUM")
+    return True
+
+async def run_compaction(days: int | None = None, vacuum: bool | None = None,
+                         now: datetime | None = None) -> Dict[str, Any]:
+    days = settings.retention_days if days is None else days
+    vacuum = settings.compact_vacuum if vacuum is None else vacuum
+    t0 = time.monotonic()
+    async with SessionLocal() as session:
+        if not await leases.acquire_lock(session, "compaction", 6 * 3600):
+            return {"skipped": "another worker is compacting"}
+        try:
+            res: Dict[str, Any] = {"externalized": await externalize_existing(session)}
+            if days > 0:
+                res["archived"] = await archive_old(session, days, now=now)
+                res["merged_segments"] = await merge_segments(session, days, now=now)
+            res["blobs_deleted"] = await gc_blobs(session)
+        finally:
+            await leases.release_lock(session, "compaction")
+    if vacuum:
+        res["vacuum"] = await vacuum_sqlite()
+    res["seconds"] = round(time.monotonic() - t0, 1)
+    LAST.clear()
+    LAST.update(res, at=datetime.utcnow())
+    print(f"[compaction] {res}")
+    return res
+
+async def storage_stats(session: AsyncSession) -> Dict[str, Any]:
+    hot = (await session.execute(select(func.count(), func.min(NewsItem.published_at)).select_from(NewsItem))).one()
+    blobs = (await session.execute(
+        select(func.count(), func.sum(RawBlob.size), func.sum(func.length(RawBlob.data)))
+    )).one()
+    segs = (await session.execute(
+        select(func.count(), func.sum(ArchiveSegment.rows), func.sum(ArchiveSegment.size),
+               func.sum(func.length(ArchiveSegment.data)), func.min(ArchiveSegment.month))
+    )).one()
+    return {
+        "retention_days": settings.retention_days,
+        "hot": {"rows": hot[0], "oldest": hot[1]},
+        "blobs": {"count": blobs[0], "bytes": blobs[1] or 0, "stored": blobs[2] or 0, "codec": blobstore.codec()},
+        "archive": {"segments": segs[0], "rows": segs[1] or 0, "bytes": segs[2] or 0, "stored": segs[3] or 0,
+                    "oldest_month": segs[4]},
+        "last_run": LAST or None,
+    }
@@ -0,0 +1,151 @@
+"""
+Быстрый потоковый разбор RSS 2.0 / RSS 1.0 (RDF) / Atom.
+
+Тело скармливается XMLPullParser кусками по CHUNK байт; каждая запись
+(<item>/<entry>) превращается в элемент сразу по закрытию тега и удаляется
+из дерева — в памяти не держится весь документ. Курсор ленты (хеши ключей
+guid/id/link последних записей + самая свежая published_at) позволяет
+остановить разбор, как только пошли уже виденные записи: CURSOR_RUN
+известных подряд (одна «закреплённая» старая запись наверху разбор не
+обрывает); известной считается и запись старше курсора больше чем на
+CURSOR_SLACK. Обрыв — только пока даты идут по убыванию: в неупорядоченной
+ленте известные записи отсекаются, но разбирается она целиком.
+
+Невалидный XML (HTML-сущности, битая кодировка) — ParseError, вызывающий
+откатывается на feedparser (fetchers.parse_items).
+"""
+import hashlib
+import re
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from xml.etree.ElementTree import Element, ParseError, XMLPullParser
+
+CHUNK = 16384
+CURSOR_KEYS = 64            # сколько последних ключей помнить на ленту
+CURSOR_RUN = 3              # столько известных подряд — дальше всё известно
+CURSOR_SLACK = timedelta(hours=24)
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+RSS1 = "{http://purl.org/rss/1.0/}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+CONTENT = "{http://purl.org/rss/1.0/modules/content/}"
+MEDIA = "{http://search.yahoo.com/mrss/}"
+
+ENTRY_TAGS = {"item", RSS1 + "item", ATOM + "entry"}
+ROOT_TAGS = {"rss", "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}RDF", ATOM + "feed"}
+
+_WS = re.compile(r"\s+")
+
+def entry_key(guid: str, link: str) -> str:
+    return hashlib.sha1((guid or link).encode()).hexdigest()[:12]
+
+def _text(el: Element | None) -> str:
+    if el is None:
+        return ""
+    return "".join(el.itertext()).strip()
+
+def _date(s: str) -> datetime | None:
+    s = (s or "").strip()
+    if not s:
+        return None
+    try:
+        dt = datetime.fromisoformat(s)        # Atom, dc:date
+    except ValueError:
+        try:
+            dt = parsedate_to_datetime(s)     # RFC 822 (pubDate)
+        except (TypeError, ValueError, IndexError):
+            return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+def _atom_link(el: Element) -> str:
+    first = ""
+    for ln in el.iter(ATOM + "link"):
+        href = ln.get("href") or ""
+        if ln.get("rel", "alternate") == "alternate":
+            return href
+        first = first or href
+    return first
+
+def entry_item(el: Element) -> Dict[str, Any]:
+    """<item>/<entry> -> элемент в формате fetchers.entry_item (+ guid для курсора)."""
+    if el.tag == ATOM + "entry":
+        title = _text(el.find(ATOM + "title"))
+        link = _atom_link(el)
+        guid = _text(el.find(ATOM + "id"))
+        pub = _date(_text(el.find(ATOM + "published")) or _text(el.find(ATOM + "updated")))
+        summary = (_text(el.find(ATOM + "summary")) or _text(el.find(ATOM + "content"))
+                   or _text(el.find(f".//{MEDIA}description")))
+    else:
+        ns = RSS1 if el.tag.startswith(RSS1) else ""
+        title = _text(el.find(ns + "title"))
+        link = _text(el.find(ns + "link")) or el.get("{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about", "")
+        guid_el = el.find("guid")
+        guid = _text(guid_el)
+        if not link and guid_el is not None and guid_el.get("isPermaLink", "true") != "false":
+            link = guid
+        pub = _date(_text(el.find("pubDate")) or _text(el.find(DC + "date")))
+        summary = _text(el.find(ns + "description")) or _text(el.find(CONTENT + "encoded"))
+    return {"title": _WS.sub(" ", title), "url": link.strip(), "guid": guid,
+            "published_at": pub or datetime.now(timezone.utc), "has_date": pub is not None,
+            "raw": {"summary": summary}}
+
+def iter_entries(body: bytes) -> Iterator[Dict[str, Any]]:
+    """Записи по мере чтения тела; ParseError — если это не RSS/Atom или XML битый."""
+    parser = XMLPullParser(events=("start", "end"))
+    stack: List[Element] = []
+    for i in range(0, len(body) or 1, CHUNK):
+        parser.feed(body[i:i + CHUNK])
+        for ev, el in parser.read_events():
+            if ev == "start":
+                if not stack and el.tag not in ROOT_TAGS:
+                    raise ParseError(f"not a feed: <{el.tag}>")
+                stack.append(el)
+                continue
+            stack.pop()
+            if el.tag in ENTRY_TAGS:
+                yield entry_item(el)
+                if stack:
+                    stack[-1].remove(el)  # запись разобрана — из дерева долой
+    parser.close()
+
+def select_new(entries: Iterable[Dict[str, Any]], max_items: int | None = None,
+               cursor: Dict[str, Any] | None = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    -> (новые записи, новый курсор). cursor: {"keys": [...], "published": naive UTC | None};
+    без курсора — все записи (до max_items). entries читаются лениво: после
+    CURSOR_RUN известных подряд остаток ленты не разбирается.
+    """
+    keys = list((cursor or {}).get("keys") or [])
+    known = set(keys)
+    newest: datetime | None = (cursor or {}).get("published")
+    floor = newest.replace(tzinfo=timezone.utc) - CURSOR_SLACK if newest else None
+    items: List[Dict[str, Any]] = []
+    fresh: List[str] = []
+    cap = datetime.utcnow() + timedelta(minutes=5)  # даты из будущего не двигают курсор
+    run, prev, ordered = 0, None, True
+    for n, it in enumerate(entries):
+        if max_items is not None and n >= max_items:
+            break
+        if it.get("has_date"):
+            # лента не «свежие сверху» — новые могут быть где угодно, разбираем целиком
+            ordered = ordered and (prev is None or it["published_at"] <= prev)
+            prev = it["published_at"]
+        k = entry_key(it.get("guid", ""), it["url"])
+        if k in known or (floor is not None and it.get("has_date") and it["published_at"] < floor):
+            run += 1
+            if run >= CURSOR_RUN and ordered:
+                break
+            continue
+        run = 0
+        fresh.append(k)
+        items.append(it)
+        if it.get("has_date"):
+            pub = min(it["published_at"].astimezone(timezone.utc).replace(tzinfo=None), cap)
+            if newest is None or pub > newest:
+                newest = pub
+    seen = set(fresh)
+    return items, {"keys": (fresh + [k for k in keys if k not in seen])[:CURSOR_KEYS], "published": newest}
+
+def parse(body: bytes, max_items: int | None = None, cursor: Dict[str, Any] | None = None):
+    return select_new(iter_entries(body), max_items, cursor)
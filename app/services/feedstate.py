@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import FeedState
+from .fetchers import FEED_CACHE
+
+# Кеш условного GET живёт в памяти процесса (fetchers.FEED_CACHE),
+# между перезапусками — в таблице feed_state (вместе с курсором разбора ленты).
+
+async def load_feed_cache(session: AsyncSession) -> int:
+    rows = (await session.execute(select(FeedState))).scalars().all()
+    for r in rows:
+        ent = FEED_CACHE.setdefault(r.url, {"hits": 0, "misses": 0})
+        ent.update(etag=r.etag or "", last_modified=r.last_modified or "", body_hash=r.body_hash or "")
+        # счётчики в памяти могут быть свежее БД — берём максимум
+        ent["hits"] = max(ent.get("hits", 0), r.hits or 0)
+        ent["misses"] = max(ent.get("misses", 0), r.misses or 0)
+        # курсор — как валидаторы: из БД, где он сдвигается только вместе с коммитом строк
+        if r.cursor_keys or r.cursor_published:
+            ent["cursor"] = {"keys": (r.cursor_keys or "").split(), "published": r.cursor_published}
+        else:
+            ent.pop("cursor", None)
+    # лента без строки в БД: прошлый прогон не дошёл до save_feed_cache — валидаторы в памяти не в счёт
+    stored = {r.url for r in rows}
+    for url, ent in FEED_CACHE.items():
+        if url[:500] not in stored:
+            ent.update(etag="", last_modified="", body_hash="")
+            ent.pop("cursor", None)
+    return len(rows)
+
+async def stage_cursor(session: AsyncSession, url: str, cursor: Dict[str, Any]) -> None:
+    """Курсор ленты -> feed_state в транзакции пакета с её строками; коммит — на вызывающем."""
+    row = await session.get(FeedState, url[:500])
+    if row is None:
+        row = FeedState(url=url[:500])
+        session.add(row)
+    row.cursor_keys = " ".join(cursor.get("keys") or [])
+    row.cursor_published = cursor.get("published")
+    row.updated_at = datetime.utcnow()
+
+async def save_feed_cache(session: AsyncSession, urls: Iterable[str]) -> int:
+    """
+    Валидаторы и счётчики только лент этого прогона (арендованных этим
+    воркером): чужие записи в feed_state не перетираем своей устаревшей копией.
+    Курсор здесь не пишется — только stage_cursor, вместе со строками.
+    """
+    now = datetime.utcnow()
+    n = 0
+    for url in dict.fromkeys(urls):
+        ent = FEED_CACHE.get(url)
+        if ent is None:
+            continue
+        row = await session.get(FeedState, url[:500])
+        if row is None:
+            row = FeedState(url=url[:500])
+            session.add(row)
+        row.etag = (ent.get("etag") or "")[:256]
+        row.last_modified = (ent.get("last_modified") or "")[:64]
+        row.body_hash = ent.get("body_hash") or ""
+        row.hits, row.misses, row.updated_at = ent.get("hits", 0), ent.get("misses", 0), now
+        n += 1
+    return n
@@ -1,8 +1,14 @@
-import os, re
+import os, re, asyncio, random, hashlib
 from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from xml.etree.ElementTree import ParseError
 import feedparser
+import httpx
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+
+from ..config import settings
+from . import feedparse
 
 # --- Триггеры «военка/угрозы» (ru+en), без мусора ---
 TRIGGERS = [
@@ -46,22 +52,152 @@ def _rss_for_source(src_type: str, url_or_handle: str) -> str:
         return f"{RSSHUB_BASE}/telegram/channel/{ch}"
     return s
 
+# --- Общий пул HTTP: один клиент, лимиты на всё и на хост ---
+USER_AGENT = "AlertBoxBaltic/0.1 (+feeds)"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_client: httpx.AsyncClient | None = None
+_global_sem: asyncio.Semaphore | None = None
+_host_sems: Dict[str, asyncio.Semaphore] = {}
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=settings.fetch_timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(
+                max_connections=settings.fetch_concurrency,
+                max_keepalive_connections=settings.fetch_concurrency,
+            ),
+        )
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+def _sems_for(url: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+    global _global_sem
+    if _global_sem is None:
+        _global_sem = asyncio.Semaphore(settings.fetch_concurrency)
+    host = (urlsplit(url).hostname or "").lower()
+    sem = _host_sems.get(host)
+    if sem is None:
+        sem = _host_sems[host] = asyncio.Semaphore(settings.fetch_per_host)
+    return _global_sem, sem
+
+# --- Условный GET: ETag / Last-Modified / хеш тела по каждой ленте ---
+# url -> {"etag","last_modified","body_hash","hits","misses"}; в БД живёт в feed_state
+FEED_CACHE: Dict[str, Dict[str, Any]] = {}
+
+def _cache_entry(url: str) -> Dict[str, Any]:
+    ent = FEED_CACHE.get(url)
+    if ent is None:
+        ent = FEED_CACHE[url] = {"etag": "", "last_modified": "", "body_hash": "", "hits": 0, "misses": 0}
+    return ent
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {u: {"hits": e["hits"], "misses": e["misses"]} for u, e in FEED_CACHE.items()}
+
+async def fetch_bytes(url: str, *, retries: int | None = None, timeout: float | None = None,
+                      conditional: bool = False) -> bytes | None:
+    """
+    Скачивает ленту через общий клиент; 429/5xx и сетевые ошибки — повтор с backoff.
+    conditional=True: шлёт If-None-Match/If-Modified-Since и возвращает None,
+    если лента не изменилась (304 или тот же хеш тела).
+    """
+    retries = settings.fetch_retries if retries is None else retries
+    timeout = timeout or settings.fetch_timeout
+    headers = {}
+    ent = _cache_entry(url) if conditional else None
+    if ent:
+        if ent["etag"]: headers["If-None-Match"] = ent["etag"]
+        if ent["last_modified"]: headers["If-Modified-Since"] = ent["last_modified"]
+    g, h = _sems_for(url)
+    backoff = 1.0
+    for attempt in range(retries + 1):
+        try:
+            # сначала слот хоста, потом общий: ждущие занятый хост не держат общих слотов
+            async with h, g:
+                r = await get_client().get(url, timeout=timeout, headers=headers)
+            if ent is not None and r.status_code == 304:
+                ent["hits"] += 1
+                return None
+            if r.status_code in RETRY_STATUSES and attempt < retries:
+                ra = r.headers.get("retry-after")
+                sleep_for = float(ra) if ra and ra.isdigit() else backoff + random.uniform(0, 0.5)
+            else:
+                r.raise_for_status()
+                if ent is None:
+                    return r.content
+                return _remember(ent, r)
+        except httpx.TransportError:
+            if attempt >= retries:
+                raise
+            sleep_for = backoff + random.uniform(0, 0.5)
+        # семафоры не держим во время паузы
+        await asyncio.sleep(min(sleep_for, 10.0))
+        backoff = min(backoff * 2, 10.0)
+    raise RuntimeError(f"fetch failed: {url}")
+
+def _remember(ent: Dict[str, Any], r: httpx.Response) -> bytes | None:
+    ent["etag"] = r.headers.get("etag", "")
+    ent["last_modified"] = r.headers.get("last-modified", "")
+    digest = hashlib.sha256(r.content).hexdigest()
+    if digest == ent["body_hash"]:
+        ent["hits"] += 1
+        return None
+    ent["body_hash"] = digest
+    ent["misses"] += 1
+    return r.content
+
+def entry_item(e) -> Dict[str, Any]:
+    title = getattr(e, "title", "") or ""
+    link = getattr(e, "link", "") or ""
+    summary = getattr(e, "summary", "") or getattr(e, "description", "") or ""
+    has_date = bool(getattr(e, "published_parsed", None) or getattr(e, "updated_parsed", None))
+    return {"title": title, "url": link, "guid": getattr(e, "id", "") or "", "published_at": feed_time(e),
+            "has_date": has_date, "raw": {"summary": summary}}
+
+def classify_item(it: Dict[str, Any]) -> Dict[str, Any]:
+    score = 2 if is_relevant(it["title"], it["raw"].get("summary", "")) else 0
+    it["raw"]["score"] = score
+    it["score"] = score
+    return it
+
+def parse_items(body: bytes, max_items: int | None = None,
+                url: str | None = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Синхронный разбор: вызывать через asyncio.to_thread. Сначала потоковый
+    feedparse (с курсором ленты url — только новые записи), на битом XML —
+    feedparser целиком, курсор применяется к его записям.
+    -> (записи, новый курсор). Курсор в FEED_CACHE не пишется: сдвигать его
+    можно только после коммита строк (commit_cursor), иначе записи упавшего
+    пакета при следующем опросе сочтутся виденными.
+    """
+    ent = FEED_CACHE.get(url) if url else None
+    cursor = ent.get("cursor") if ent else None
+    try:
+        return feedparse.parse(body, max_items, cursor)
+    except ParseError:
+        feed = feedparser.parse(body)
+        return feedparse.select_new(map(entry_item, getattr(feed, "entries", [])), max_items, cursor)
+
+def commit_cursor(url: str, cursor: Dict[str, Any]) -> None:
+    _cache_entry(url)["cursor"] = cursor
+
 async def fetch_rss(url: str) -> List[Dict[str, Any]]:
-    feed = feedparser.parse(url)
-    items = []
-    for e in getattr(feed, "entries", []):
-        title = getattr(e, "title", "") or ""
-        link = getattr(e, "link", "") or ""
-        summary = getattr(e, "summary", "") or getattr(e, "description", "") or ""
-        score = 2 if is_relevant(title, summary) else 0
-        items.append({
-            "title": title,
-            "url": link,
-            "published_at": feed_time(e),
-            "raw": {"summary": summary, "score": score},
-            "score": score,
-        })
-    return items
+    # сеть — асинхронно, разбор XML — в пуле потоков, чтобы не держать event loop;
+    # строки здесь не пишутся — курсор не сдвигаем
+    body = await fetch_bytes(url, conditional=True)
+    if body is None:
+        return []  # лента не изменилась — не парсим
+    items, _ = await asyncio.to_thread(parse_items, body, None, url)
+    return [classify_item(it) for it in items]
 
 # --- YouTube + транскрипты для Швеца ---
 try:
@@ -69,6 +205,9 @@ try:
 except Exception:
     YouTubeTranscriptApi = None
 
+TRANSCRIPT_LIMIT = 15000  # безопасный предел
+YOUTUBE_MAX_ITEMS = 10
+
 def _youtube_feed_url(channel_or_url: str) -> str:
     s = channel_or_url.strip()
     if s.startswith("UC"):
@@ -89,41 +228,29 @@ def _yt_video_id(url: str) -> str:
     if "youtu.be/" in url: return url.split("youtu.be/")[1].split("?")[0]
     return ""
 
-def _pull_transcript(video_url: str) -> str:
-    if not YouTubeTranscriptApi: return ""
-    vid = _yt_video_id(video_url)
-    if not vid: return ""
-    try:
-        segs = YouTubeTranscriptApi.get_transcript(vid, languages=['ru','uk','en'])
-        text = " ".join(s.get("text","") for s in segs if s.get("text"))
-        return re.sub(r"\s+", " ", text).strip()
-    except Exception:
-        return ""
-
 async def fetch_youtube(channel_or_url: str, need_transcript: bool = False, max_items: int = 10) -> List[Dict[str, Any]]:
     url = _youtube_feed_url(channel_or_url)
-    feed = feedparser.parse(url)
-    items = []
-    for e in getattr(feed, "entries", [])[:max_items]:
-        title = getattr(e, "title", "") or ""
-        link = getattr(e, "link", "") or ""
-        desc = getattr(e, "summary", "") or ""
-        score = 2 if is_relevant(title, desc) else 0
-        raw = {"summary": desc, "score": score}
-        if need_transcript:
-            tr = _pull_transcript(link)
-            if tr: raw["transcript"] = tr[:15000]  # безопасный предел
-        items.append({
-            "title": title,
-            "url": link,
-            "published_at": feed_time(e),
-            "raw": raw,
-            "score": score,
-        })
+    body = await fetch_bytes(url, conditional=True)
+    if body is None:
+        return []
+    items, _ = await asyncio.to_thread(parse_items, body, max_items, url)
+    items = [classify_item(it) for it in items]
+    if need_transcript:
+        from .transcripts import attach  # пул потоков + кеш в БД
+        await attach(items)
     return items
 
+def is_shvets_source(name: str, url: str) -> bool:
+    return "швец" in (name or "").lower() or "yuryshvets" in (url or "").lower()
+
+def feed_url(src_type: str, url_or_handle: str) -> str:
+    t = (src_type or "rss").lower()
+    if t == "youtube":
+        return _youtube_feed_url(url_or_handle)
+    return _rss_for_source(t, url_or_handle)
+
 async def fetch_any(src_type: str, url_or_handle: str, *, shvets: bool = False):
     t = (src_type or "rss").lower()
     if t == "youtube":
-        return await fetch_youtube(url_or_handle, need_transcript=shvets, max_items=10)
+        return await fetch_youtube(url_or_handle, need_transcript=shvets, max_items=YOUTUBE_MAX_ITEMS)
     return await fetch_rss(_rss_for_source(t, url_or_handle))
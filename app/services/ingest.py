@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..analyzer.urlset import normalize_url, url_hash
+from ..config import settings
+from ..db import copy_enabled, copy_insert
+from ..models import NewsItem
+from . import blobstore, search, seen
+
+def news_row(source_id: int, it: Dict[str, Any]) -> Dict[str, Any]:
+    """Элемент из fetchers -> строка для news_items (naive UTC, обрезка по длинам колонок)."""
+    pub = it.get("published_at")
+    if hasattr(pub, "tzinfo") and pub.tzinfo is not None:
+        pub = pub.replace(tzinfo=None)
+    url = (it.get("url") or "")[:1000]
+    return {
+        "source_id": source_id,
+        "title": (it.get("title") or "")[:500],
+        "url": url,
+        "url_hash": url_hash(url),
+        "published_at": pub if isinstance(pub, datetime) else datetime.utcnow(),
+        "lang": "ru",
+        "raw": it.get("raw", {}),
+        "score": int(it.get("score") or 0),
+        "bucket": it.get("bucket"),
+        "buckets": it.get("buckets") or "",
+        "country": it.get("country") or "",
+        "org": it.get("org") or "",
+        "minhash": it.get("minhash"),
+    }
+
+def _insert_stmt(session: AsyncSession):
+    # INSERT ... ON CONFLICT (url) DO NOTHING RETURNING url, id там, где диалект умеет; гонки между
+    # API и планировщиками не роняют пакет на uq_news_url, а RETURNING говорит, что реально вставлено
+    # (и с каким id — для поискового индекса)
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(NewsItem)
+    return dialect_insert(NewsItem).on_conflict_do_nothing(index_elements=["url"]).returning(NewsItem.url, NewsItem.id)
+
+async def existing_urls(session: AsyncSession, urls: Iterable[str]) -> set[str]:
+    """Какие из urls уже есть в news_items — с точностью до нормализации, как seen.known_urls."""
+    by_hash: Dict[int, List[str]] = {}
+    for u in urls:
+        by_hash.setdefault(url_hash(u), []).append(u)
+    return await seen.lookup(session, by_hash)
+
+async def bulk_insert_items(session: AsyncSession, rows: List[Dict[str, Any]], *,
+                            collect: List[Dict[str, Any]] | None = None) -> Dict[int, Dict[str, int]]:
+    """
+    Пакетная запись: повторы внутри пакета и уже сохранённые url отсекаются
+    фильтром виденных url (services/seen.py; без него — запросом по url_hash);
+    url равны с точностью до нормализации (analyzer/urlset.py) при любом
+    SEEN_FILTER. Большие поля raw уходят в raw_blobs, новые строки — одним executemany
+    (PostgreSQL от PG_COPY_MIN_ROWS строк — COPY, app/db.py) и сразу попадают
+    в поисковый индекс (services/search.py).
+    Возвращает {source_id: {"added": n, "skipped": m}}; collect — сюда
+    складываются записанные строки (для агрегатов). Коммит — на вызывающем.
+    """
+    stats: Dict[int, Dict[str, int]] = {}
+    fresh: Dict[str, Dict[str, Any]] = {}  # нормализованный url -> строка
+    # старше окна хранения — уже ушло бы в архив (services/compaction.py), дубль там не сверить
+    oldest = datetime.utcnow() - timedelta(days=settings.retention_days) if settings.retention_days > 0 else None
+    for r in rows:
+        st = stats.setdefault(r["source_id"], {"added": 0, "skipped": 0})
+        key = normalize_url(r["url"]) if r["url"] else ""
+        if not key or key in fresh or (oldest is not None and r["published_at"] < oldest):
+            st["skipped"] += 1
+            continue
+        fresh[key] = r
+    urls = [r["url"] for r in fresh.values()]
+    if seen.get_filter() is not None:
+        known = await seen.known_urls(session, urls)
+    else:
+        known = await existing_urls(session, urls)
+    new_rows = []
+    for r in fresh.values():
+        if r["url"] in known:
+            stats[r["source_id"]]["skipped"] += 1
+        else:
+            stats[r["source_id"]]["added"] += 1
+            new_rows.append(r)
+    if new_rows:
+        # текст для поиска — до выноса транскриптов в raw_blobs
+        docs = {r["url"]: search.doc_text(r["raw"]) for r in new_rows}
+        # транскрипты и длинные summary -> raw_blobs, в строке — ссылка
+        await blobstore.externalize(session, new_rows)
+        inserted = None
+        if copy_enabled(session, len(new_rows)):
+            # PostgreSQL: COPY + INSERT ... SELECT ON CONFLICT вместо executemany
+            inserted = dict(await copy_insert(session, NewsItem.__table__, new_rows, conflict="url",
+                                              returning=("url", "id")))
+        else:
+            stmt = _insert_stmt(session)
+            res = await session.execute(stmt, new_rows)
+            if stmt.exported_columns:  # есть RETURNING
+                inserted = {url: id_ for url, id_ in res.all()}
+        if inserted is not None:
+            # url, который фильтр не знал (вставлен другим процессом), — конфликт, не новая строка
+            for r in new_rows:
+                if r["url"] not in inserted:
+                    stats[r["source_id"]]["added"] -= 1
+                    stats[r["source_id"]]["skipped"] += 1
+            new_rows = [r for r in new_rows if r["url"] in inserted]
+            for r in new_rows:
+                r["id"] = inserted[r["url"]]
+            await search.index_rows(session, [(r["id"], r["title"], docs[r["url"]]) for r in new_rows])
+        seen.remember(new_rows)
+        if collect is not None:
+            collect.extend(new_rows)
+    return stats
@@ -0,0 +1,161 @@
+"""
+Фоновые задания отчётов (прогон — отчёты на всех языках REPORT_LANGS).
+
+POST /report ставит задание и сразу отвечает его id; генерация (скан БД +
+вызов LLM) идёт в фоне. Одинаковые запросы — то же окно и язык — пока
+задание в работе, присоединяются к нему (single-flight), а не платят за
+второй ответ модели. Одновременно генерируется не больше REPORT_WORKERS
+отчётов. Реестр — в памяти процесса, последние REPORT_JOBS_KEEP заданий.
+
+API и планировщик — разные процессы, поэтому между процессами задания
+сходятся через аренду в БД (leases) на ключ из параметров отчёта: прогон
+делает тот, кто её взял, остальные ждут её освобождения и берут отчёты,
+сохранённые после их запроса с тем же ключом (meta.job_key). Аренда живёт
+REPORT_JOB_LEASE_S и продлевается, пока идёт генерация: упавший процесс
+не держит остальных дольше срока.
+"""
+import asyncio
+import hashlib
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models import Report
+from . import leases
+from .reports import generate_reports
+
+Key = Tuple[str, int, str, bool]  # (period, window_h, языки через запятую, перевод)
+POLL_S = 2.0  # как часто ждущий процесс проверяет чужую аренду
+
+@dataclass
+class Job:
+    id: str
+    key: Key
+    status: str = "queued"          # queued | running | done | error
+    report_id: int | None = None     # основной (первый язык)
+    report_ids: Dict[str, int] = field(default_factory=dict)
+    run_id: str | None = None
+    error: str | None = None
+    joined: int = 0                 # сколько запросов присоединилось к заданию
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    task: asyncio.Task | None = field(default=None, repr=False)
+
+    def as_dict(self) -> dict:
+        period, window_h, langs, translate = self.key
+        return {
+            "id": self.id, "status": self.status, "period": period, "window_h": window_h,
+            "langs": langs.split(","), "translate": translate, "run_id": self.run_id,
+            "report_id": self.report_id, "report_ids": self.report_ids, "error": self.error, "joined": self.joined,
+            "created_at": self.created_at, "started_at": self.started_at, "finished_at": self.finished_at,
+        }
+
+JOBS: "OrderedDict[str, Job]" = OrderedDict()
+_INFLIGHT: Dict[Key, Job] = {}
+_sem: asyncio.Semaphore | None = None
+
+def _workers() -> asyncio.Semaphore:
+    global _sem
+    if _sem is None:
+        _sem = asyncio.Semaphore(max(settings.report_workers, 1))
+    return _sem
+
+def lease_name(key: Key) -> str:
+    return "report-job:" + hashlib.sha1(repr(key).encode()).hexdigest()[:24]
+
+async def _finished_elsewhere(session: AsyncSession, job: Job, name: str) -> List[Report]:
+    """Отчёты прогона с тем же ключом, сохранённые после нашего запроса (основной — первый)."""
+    rows = (await session.execute(
+        select(Report).where(Report.created_at >= job.created_at).order_by(Report.id)
+    )).scalars().all()
+    run_id = next((r.run_id for r in reversed(rows) if (r.meta or {}).get("job_key") == name), None)
+    return [r for r in rows if run_id and r.run_id == run_id]
+
+async def _keep_lease(name: str):
+    """Продлевать аренду, пока идёт генерация: медленный прогон не отдаёт её другому процессу."""
+    ttl = settings.report_job_lease_s
+    while True:
+        await asyncio.sleep(ttl / 3)
+        try:
+            async with SessionLocal() as session:
+                if not await leases.acquire_lock(session, name, ttl):
+                    print(f"[jobs] lease {name} lost")
+        except Exception as e:
+            print(f"[jobs] lease {name} renew failed: {e}")
+
+async def _generate(session: AsyncSession, job: Job, name: str) -> List[Report]:
+    reps = await _finished_elsewhere(session, job, name)
+    if reps:
+        print(f"[jobs] report {job.id} joined run {reps[0].run_id} of another worker")
+        return reps
+    job.status, job.started_at = "running", datetime.utcnow()
+    _, window_h, langs, translate = job.key
+    keeper = asyncio.create_task(_keep_lease(name))
+    try:
+        reps = await generate_reports(session, window_h, langs.split(","), translate)
+    finally:
+        keeper.cancel()
+    for r in reps:
+        r.meta = {**(r.meta or {}), "job_key": name}
+    await session.commit()
+    return reps
+
+async def _run(job: Job):
+    name = lease_name(job.key)
+    try:
+        async with SessionLocal() as session:
+            while True:
+                # аренду берём уже со слотом воркера: очередь за REPORT_WORKERS её не тратит;
+                # тот же отчёт делает другой процесс (API / планировщик) — ждём без слота
+                async with _workers():
+                    if await leases.acquire_lock(session, name, settings.report_job_lease_s):
+                        try:
+                            reps = await _generate(session, job, name)
+                        finally:
+                            await leases.release_lock(session, name)
+                        break
+                await asyncio.sleep(POLL_S)
+        job.report_ids = {r.lang: r.id for r in reps}
+        job.report_id, job.run_id, job.status = reps[0].id, reps[0].run_id, "done"
+    except Exception as e:
+        job.status, job.error = "error", str(e) or e.__class__.__name__
+        print(f"[jobs] report {job.id} failed: {job.error}")
+    finally:
+        job.finished_at = datetime.utcnow()
+        _INFLIGHT.pop(job.key, None)
+        job.done.set()
+
+def submit(period: str = "daily", window_h: int = 48, langs: List[str] | None = None,
+           translate: bool | None = None) -> Job:
+    langs = [l.strip() for l in (langs or settings.report_langs) if l.strip()] or ["ru"]
+    translate = settings.report_translate if translate is None else translate
+    key = (period, window_h, ",".join(langs), bool(translate))
+    job = _INFLIGHT.get(key)
+    if job is not None:
+        job.joined += 1
+        return job
+    job = Job(id=uuid.uuid4().hex, key=key)
+    JOBS[job.id] = job
+    _INFLIGHT[key] = job
+    while len(JOBS) > settings.report_jobs_keep:
+        if not next(iter(JOBS.values())).done.is_set():
+            break  # незавершённые не вытесняем
+        JOBS.popitem(last=False)
+    job.task = asyncio.create_task(_run(job))
+    return job
+
+def get(job_id: str) -> Job | None:
+    return JOBS.get(job_id)
+
+async def wait(job: Job, timeout: float | None = None) -> Job:
+    await asyncio.wait_for(job.done.wait(), timeout)
+    return job
@@ -0,0 +1,93 @@
+"""
+Аренды в БД для нескольких процессов планировщика.
+
+- Источники: воркер забирает пачку «созревших» лент условным UPDATE
+  (lease_owner/lease_until), чужие непросроченные аренды не трогает.
+  Упавший воркер аренду не отпустит — она истечёт через LEASE_S и ленты
+  заберёт другой.
+- Лидер: строка в leader_locks с владельцем и сроком; захват — тоже
+  условным UPDATE (свободна, просрочена или уже наша). Отчёт по cron
+  строит только тот, кто взял блокировку этого слота.
+
+Работает одинаково на SQLite и PostgreSQL: гонки решает WHERE в UPDATE.
+"""
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models import LeaderLock, Source
+
+WORKER_ID = (os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}")[:48] + ":" + uuid.uuid4().hex[:6]
+
+def _free(now: datetime):
+    return or_(Source.lease_until.is_(None), Source.lease_until < now)
+
+async def claim_sources(session: AsyncSession, limit: int, now: datetime | None = None) -> List[Source]:
+    """Созревшие (next_poll_at <= now) и не арендованные ленты -> аренда на LEASE_S."""
+    now = now or datetime.utcnow()
+    due = and_(or_(Source.next_poll_at.is_(None), Source.next_poll_at <= now), _free(now))
+    ids = (await session.execute(
+        select(Source.id).where(due)
+        .order_by(Source.next_poll_at.is_(None).desc(), Source.next_poll_at, Source.priority.desc())
+        .limit(limit)
+    )).scalars().all()
+    if not ids:
+        return []
+    stale = (await session.execute(
+        select(Source.lease_owner).where(Source.id.in_(ids), Source.lease_owner.is_not(None))
+    )).scalars().all()
+    until = now + timedelta(seconds=settings.lease_s)
+    await session.execute(
+        update(Source).where(Source.id.in_(ids), due)
+        .values(lease_owner=WORKER_ID, lease_until=until)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    if stale:
+        print(f"[leases] reclaimed {len(stale)} expired leases from {sorted(set(stale))}")
+    # что досталось именно нам (часть могли перехватить между SELECT и UPDATE)
+    return (await session.execute(
+        select(Source).where(Source.lease_owner == WORKER_ID, Source.lease_until == until)
+        .execution_options(populate_existing=True)
+    )).scalars().all()
+
+async def release_sources(session: AsyncSession, ids: List[int]):
+    # только свои: если аренда истекла и ленту уже забрал другой — его аренду не трогаем
+    await session.execute(
+        update(Source).where(Source.id.in_(ids), Source.lease_owner == WORKER_ID)
+        .values(lease_owner=None, lease_until=None)
+        .execution_options(synchronize_session=False)
+    )
+
+async def acquire_lock(session: AsyncSession, name: str, ttl_s: float, now: datetime | None = None) -> bool:
+    """True, если блокировка name наша (взята сейчас или продлена)."""
+    now = now or datetime.utcnow()
+    until = now + timedelta(seconds=ttl_s)
+    if await session.get(LeaderLock, name) is None:
+        session.add(LeaderLock(name=name, owner="", until=now - timedelta(seconds=1), acquired_at=now))
+        try:
+            await session.commit()
+        except Exception:
+            await session.rollback()  # строку вставил другой процесс — дальше обычный захват
+    res = await session.execute(
+        update(LeaderLock)
+        .where(LeaderLock.name == name, or_(LeaderLock.until < now, LeaderLock.owner == WORKER_ID))
+        .values(owner=WORKER_ID, until=until, acquired_at=now)
+    )
+    # старые одноразовые блокировки (слоты отчётов) не копим
+    await session.execute(delete(LeaderLock).where(LeaderLock.until < now - timedelta(days=7)))
+    await session.commit()
+    return res.rowcount == 1
+
+async def release_lock(session: AsyncSession, name: str):
+    await session.execute(
+        update(LeaderLock).where(LeaderLock.name == name, LeaderLock.owner == WORKER_ID)
+        .values(until=datetime.utcnow())
+    )
+    await session.commit()
@@ -1,66 +1,334 @@
-import asyncio, random
+import asyncio, random, hashlib, importlib.util, json, time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List
 import httpx
+from sqlalchemy import delete, select, update
 from ..config import settings
+from ..db import SessionLocal
+from ..models import LLMCache
 
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
-OPENAI_URL = "https://api.openai.com/v1/chat/completions"
+GROQ_URL = settings.groq_url
+OPENAI_URL = settings.openai_url
+GROQ_MODEL = "mixtral-8x7b-32768"
+
+# --- один долгоживущий клиент на процесс: TLS/keep-alive переиспользуются между отчётами ---
+_HTTP2 = importlib.util.find_spec("h2") is not None
+_client: httpx.AsyncClient | None = None
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=90, http2=_HTTP2,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=120),
+        )
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
 
 async def _post_json(url: str, headers: dict, payload: dict, retries: int = 5):
     backoff = 1.0
     last_exc = None
-    async with httpx.AsyncClient(timeout=90) as client:
-        for attempt in range(1, retries + 1):
-            r = await client.post(url, headers=headers, json=payload)
-            if r.status_code < 400:
-                return r.json()
-            # 429/5xx — подождём и попробуем снова
-            if r.status_code in (429, 500, 502, 503, 504):
-                ra = r.headers.get("retry-after")
-                if ra and ra.isdigit():
-                    sleep_for = float(ra)
-                else:
-                    jitter = random.uniform(0, 0.5)
-                    sleep_for = min(backoff, 10.0) + jitter
-                await asyncio.sleep(sleep_for)
-                backoff = min(backoff * 2, 10.0)
-                last_exc = httpx.HTTPStatusError(f"{r.status_code} {r.reason_phrase}", request=r.request, response=r)
-                continue
-            r.raise_for_status()
-        if last_exc:
-            raise last_exc
+    client = get_client()
+    for attempt in range(1, retries + 1):
+        r = await client.post(url, headers=headers, json=payload)
+        if r.status_code < 400:
+            return r.json()
+        # 429/5xx — подождём и попробуем снова
+        if r.status_code in (429, 500, 502, 503, 504):
+            ra = r.headers.get("retry-after")
+            if ra and ra.isdigit():
+                sleep_for = float(ra)
+            else:
+                jitter = random.uniform(0, 0.5)
+                sleep_for = min(backoff, 10.0) + jitter
+            await asyncio.sleep(sleep_for)
+            backoff = min(backoff * 2, 10.0)
+            last_exc = httpx.HTTPStatusError(f"{r.status_code} {r.reason_phrase}", request=r.request, response=r)
+            continue
+        r.raise_for_status()
+    if last_exc:
+        raise last_exc
 
-async def chat(prompt: str, model_groq: str = "mixtral-8x7b-32768"):
-    # Пытаемся Groq (если есть ключ)
-    if settings.groq_api_key:
-        payload = {
-            "model": model_groq,
+# --- кеш ответов: одинаковый промпт на неизменном окне новостей не оплачиваем дважды ---
+@dataclass
+class ChatResult:
+    content: str
+    provider: str
+    model: str
+    cached: bool = False
+
+    def meta(self) -> dict:
+        return {"provider": self.provider, "model": self.model, "cached": self.cached}
+
+def cache_key(provider: str, model: str, max_tokens: int, prompt: str) -> str:
+    ph = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{provider}\n{model}\n{max_tokens}\n{ph}".encode()).hexdigest()
+
+async def cache_get(key: str) -> LLMCache | None:
+    if not settings.llm_cache:
+        return None
+    fresh_since = datetime.utcnow() - timedelta(seconds=settings.llm_cache_ttl_s)
+    async with SessionLocal() as session:
+        row = await session.get(LLMCache, key)
+        if row is None or row.created_at < fresh_since:
+            return None
+        await session.execute(update(LLMCache).where(LLMCache.key == key).values(hits=LLMCache.hits + 1))
+        await session.commit()
+        return row
+
+async def cache_put(key: str, provider: str, model: str, content: str):
+    if not settings.llm_cache:
+        return
+    now = datetime.utcnow()
+    async with SessionLocal() as session:
+        await session.merge(LLMCache(key=key, provider=provider, model=model, content=content, created_at=now, hits=0))
+        # вытеснение: всё просроченное + самые старые сверх LLM_CACHE_MAX
+        await session.execute(delete(LLMCache).where(LLMCache.created_at < now - timedelta(seconds=settings.llm_cache_ttl_s)))
+        keep = select(LLMCache.key).order_by(LLMCache.created_at.desc()).limit(settings.llm_cache_max)
+        await session.execute(delete(LLMCache).where(LLMCache.key.not_in(keep)))
+        await session.commit()
+
+# --- провайдеры и маршрутизатор с учётом задержек ---
+@dataclass
+class Provider:
+    name: str
+    url: str
+    api_key: str
+    model: str
+    retries: int
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def payload(self, prompt: str, **extra) -> dict:
+        return {
+            "model": self.model,
             "messages": [{"role": "user", "content": prompt}],
             "max_tokens": settings.max_tokens,
+            **extra,
         }
-        try:
-            data = await _post_json(
-                GROQ_URL,
-                headers={"Authorization": f"Bearer {settings.groq_api_key}"},
-                payload=payload,
-                retries=3,
-            )
-            return data["choices"][0]["message"]["content"]
-        except Exception:
-            pass  # fallback на OpenAI
-
-    # OpenAI (основной или фолбэк)
+
+@dataclass
+class ProviderStats:
+    latencies: deque = field(default_factory=lambda: deque(maxlen=200))
+    calls: int = 0
+    errors: int = 0
+    error_rate: float = 0.0   # EWMA, свежие ошибки весят больше
+
+    def record(self, latency: float | None, ok: bool):
+        self.calls += 1
+        if ok and latency is not None:
+            self.latencies.append(latency)
+        else:
+            self.errors += 1
+        self.error_rate = 0.8 * self.error_rate + 0.2 * (0.0 if ok else 1.0)
+
+    def pct(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        xs = sorted(self.latencies)
+        return xs[min(int(q * len(xs)), len(xs) - 1)]
+
+    def cost(self) -> float | None:
+        p50 = self.pct(0.5)
+        # ошибка (429/5xx) обходится дорого: ретраи с backoff
+        return None if p50 is None else p50 * (1.0 + 4.0 * self.error_rate)
+
+    def snapshot(self) -> dict:
+        return {"calls": self.calls, "errors": self.errors, "error_rate": round(self.error_rate, 3),
+                "p50": self.pct(0.5), "p95": self.pct(0.95)}
+
+STATS: Dict[str, ProviderStats] = {}
+
+def provider_stats() -> dict:
+    return {name: st.snapshot() for name, st in STATS.items()}
+
+def _providers(model_groq: str) -> List[Provider]:
+    # в порядке приоритета по умолчанию: Groq (если есть ключ), затем OpenAI
+    out = []
+    if settings.groq_api_key:
+        out.append(Provider("groq", GROQ_URL, settings.groq_api_key, model_groq, 3))
     if settings.openai_api_key:
-        payload = {
-            "model": settings.openai_model,
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": settings.max_tokens,
-        }
-        data = await _post_json(
-            OPENAI_URL,
-            headers={"Authorization": f"Bearer {settings.openai_api_key}"},
-            payload=payload,
-            retries=5,
-        )
-        return data["choices"][0]["message"]["content"]
+        out.append(Provider("openai", OPENAI_URL, settings.openai_api_key, settings.openai_model, 5))
+    if not out:
+        raise RuntimeError("No LLM keys configured: set GROQ_API_KEY or OPENAI_API_KEY")
+    return out
+
+def route(providers: List[Provider]) -> List[Provider]:
+    """Первым идёт провайдер с меньшей «стоимостью» (p50 × штраф за ошибки); без статистики — порядок по умолчанию."""
+    def key(ip):
+        i, p = ip
+        c = STATS.setdefault(p.name, ProviderStats()).cost()
+        return (c is None, c if c is not None else 0.0, i)
+    return [p for _, p in sorted(enumerate(providers), key=key)]
+
+async def _call(p: Provider, prompt: str) -> str:
+    t0 = time.monotonic()
+    try:
+        data = await _post_json(p.url, headers=p.headers, payload=p.payload(prompt), retries=p.retries)
+        content = data["choices"][0]["message"]["content"]
+        if not content:
+            raise RuntimeError(f"{p.name}: empty completion")  # пустой текст — не ответ, пробуем следующего
+    except asyncio.CancelledError:
+        raise  # проиграл хедж — не ошибка провайдера
+    except Exception:
+        STATS.setdefault(p.name, ProviderStats()).record(None, ok=False)
+        raise
+    STATS.setdefault(p.name, ProviderStats()).record(time.monotonic() - t0, ok=True)
+    return content
+
+async def _hedged(providers: List[Provider], start) -> tuple:
+    """
+    Запускает первого провайдера; если он не ответил за LLM_HEDGE_DELAY_S (или упал) —
+    следующего. Берём первый успешный ответ, остальные отменяем.
+    start(provider) -> корутина. Возвращает (provider, результат).
+    """
+    order = route(providers)
+    delay = settings.llm_hedge_delay_s if settings.llm_hedge else None
+    running: Dict[asyncio.Task, Provider] = {}
+    nxt, last_exc = 0, None
+
+    def launch():
+        nonlocal nxt
+        p = order[nxt]; nxt += 1
+        running[asyncio.create_task(start(p))] = p
+
+    launch()
+    try:
+        while running:
+            timeout = delay if nxt < len(order) else None
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                launch()  # хедж: основной медлит
+                continue
+            for t in done:
+                p = running.pop(t)
+                if t.exception() is None:
+                    return p, t.result()
+                last_exc = t.exception()
+            if nxt < len(order) and (not running or delay is None):
+                launch()  # упал — сразу следующий
+    finally:
+        for t in running:
+            t.cancel()
+    raise last_exc
+
+async def chat_ex(prompt: str, model_groq: str = GROQ_MODEL) -> ChatResult:
+    providers = _providers(model_groq)
+    keys = {p.name: cache_key(p.name, p.model, settings.max_tokens, prompt) for p in providers}
+    for p in providers:
+        hit = await cache_get(keys[p.name])
+        if hit is not None:
+            return ChatResult(hit.content, p.name, p.model, cached=True)
+
+    p, content = await _hedged(providers, lambda p: _call(p, prompt))
+    await cache_put(keys[p.name], p.name, p.model, content)
+    return ChatResult(content, p.name, p.model)
+
+async def chat(prompt: str, model_groq: str = GROQ_MODEL):
+    return (await chat_ex(prompt, model_groq)).content
+
+# --- потоковая выдача (SSE, stream=true) ---
+async def _stream_to_queue(p: Provider, prompt: str, q: asyncio.Queue):
+    """
+    Пишет в очередь куски текста, в конце None; ошибка — в очередь самим
+    исключением (в том числе после первых кусков), потребитель поднимает её
+    (_take) — иначе он ждал бы None вечно.
+    """
+    t0 = time.monotonic()
+    first = True
+    try:
+        async with get_client().stream("POST", p.url, headers=p.headers,
+                                       json=p.payload(prompt, stream=True)) as r:
+            if r.status_code >= 400:
+                await r.aread()
+                r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                delta = (json.loads(data).get("choices") or [{}])[0].get("delta", {}).get("content")
+                if delta:
+                    if first:
+                        STATS.setdefault(p.name, ProviderStats()).record(time.monotonic() - t0, ok=True)
+                        first = False
+                    await q.put(delta)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        if first:
+            STATS.setdefault(p.name, ProviderStats()).record(None, ok=False)
+        await q.put(e)
+        return
+    await q.put(None)
+
+def _take(item):
+    if isinstance(item, BaseException):
+        raise item
+    return item
+
+async def chat_stream(prompt: str, model_groq: str = GROQ_MODEL, result: dict | None = None) -> AsyncIterator[str]:
+    """
+    Отдаёт текст по мере генерации. Хедж по первому куску: кто первым начал
+    отвечать, тот и стримит. В result кладутся provider/model/cached.
+    Полный ответ уходит в кеш, как у chat_ex.
+    """
+    providers = _providers(model_groq)
+    keys = {p.name: cache_key(p.name, p.model, settings.max_tokens, prompt) for p in providers}
+    for p in providers:
+        hit = await cache_get(keys[p.name])
+        if hit is not None:
+            if result is not None:
+                result.update(ChatResult(hit.content, p.name, p.model, cached=True).meta())
+            yield hit.content
+            return
+
+    queues: Dict[str, asyncio.Queue] = {}
+    pumps: Dict[str, asyncio.Task] = {}
+
+    async def first_chunk(p: Provider):
+        q = queues[p.name] = asyncio.Queue()
+        task = pumps[p.name] = asyncio.create_task(_stream_to_queue(p, prompt, q))
+        getter = asyncio.create_task(q.get())
+        try:
+            done, _ = await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not getter.done():
+                getter.cancel()
+        if getter in done:
+            chunk = _take(getter.result())
+        else:
+            task.result()  # поток закончился раньше первого куска: в очереди None или ошибка
+            chunk = _take(q.get_nowait()) if not q.empty() else None
+        if chunk is None:
+            STATS.setdefault(p.name, ProviderStats()).record(None, ok=False)
+            raise RuntimeError(f"{p.name}: empty stream")  # _hedged пробует следующего
+        return chunk
 
-    raise RuntimeError("No LLM keys configured: set GROQ_API_KEY or OPENAI_API_KEY")
+    try:
+        p, chunk = await _hedged(providers, first_chunk)
+        for name, t in pumps.items():
+            if name != p.name:
+                t.cancel()  # проигравшие хеджи
+        if result is not None:
+            result.update(ChatResult("", p.name, p.model).meta())
+        parts = []
+        q = queues[p.name]
+        while chunk is not None:
+            parts.append(chunk)
+            yield chunk
+            chunk = _take(await q.get())
+        await cache_put(keys[p.name], p.name, p.model, "".join(parts))
+    finally:
+        for t in pumps.values():
+            t.cancel()
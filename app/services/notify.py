@@ -1,28 +1,257 @@
-import os, math, asyncio
+import os, asyncio, hashlib, random, uuid
+from datetime import datetime, timedelta
+from typing import Dict, List
 import httpx
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models import OutboxMessage
 
 BOT = os.getenv("TELEGRAM_BOT_TOKEN", "")
-CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
+CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")   # можно несколько через запятую — рассылка всем
 
 API = f"https://api.telegram.org/bot{BOT}/sendMessage"
 
+# сколько строка может висеть в "sending" (упавший процесс): потом её заберёт другой воркер
+SEND_LEASE_S = 120
+BATCH = 100
+
 def _chunks(s: str, n: int = 3500):
     for i in range(0, len(s), n):
         yield s[i:i+n]
 
-async def send_telegram(text: str, *, parse_mode: str = "HTML"):
-    if not BOT or not CHAT_ID:
+def chat_ids() -> List[str]:
+    return [c.strip() for c in CHAT_ID.split(",") if c.strip()]
+
+# --- один клиент на процесс ---
+_client: httpx.AsyncClient | None = None
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=20, limits=httpx.Limits(max_connections=10, max_keepalive_connections=5))
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+# --- лимиты Telegram: token bucket на бота и на каждый чат ---
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate, self.capacity = rate, capacity
+        self.tokens = capacity
+        self.last: float | None = None
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        if self.last is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    async def acquire(self):
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            self._refill(loop.time())
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill(loop.time())
+            self.tokens -= 1
+
+    def pause(self, seconds: float):
+        # retry_after от Telegram: опустошаем ведро так, чтобы токен появился через seconds
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+_GLOBAL: TokenBucket | None = None
+_CHATS: Dict[str, TokenBucket] = {}
+
+def _global_bucket() -> TokenBucket:
+    global _GLOBAL
+    if _GLOBAL is None:
+        _GLOBAL = TokenBucket(settings.tg_rate_global, settings.tg_rate_global)
+    return _GLOBAL
+
+def _chat_bucket(chat_id: str) -> TokenBucket:
+    b = _CHATS.get(chat_id)
+    if b is None:
+        b = _CHATS[chat_id] = TokenBucket(settings.tg_rate_chat, settings.tg_chat_burst)
+    return b
+
+# --- очередь (outbox) ---
+_wake: asyncio.Event | None = None
+
+def _wake_event() -> asyncio.Event:
+    global _wake
+    if _wake is None:
+        _wake = asyncio.Event()
+    return _wake
+
+def _insert_stmt(session: AsyncSession):
+    # INSERT ... ON CONFLICT (key) DO NOTHING: повторная постановка того же сообщения — no-op
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(OutboxMessage).on_conflict_do_nothing(index_elements=["key"])
+
+async def enqueue(text: str, *, key: str | None = None, chats: List[str] | None = None,
+                  parse_mode: str = "HTML", session: AsyncSession | None = None) -> dict:
+    """
+    Ставит текст в outbox для каждого чата (по частям ≤3500 символов) и сразу
+    возвращается. key — ключ идемпотентности (например, "report:42"): повторная
+    постановка с тем же ключом ничего не добавит. Без key — разовое сообщение.
+    """
+    chats = chats if chats is not None else chat_ids()
+    if not BOT or not chats:
         return {"ok": False, "reason": "No telegram creds"}
-    async with httpx.AsyncClient(timeout=20) as cli:
-        resps = []
-        for part in _chunks(text, 3500):  # телега лимит ~4096
-            r = await cli.post(API, data={
-                "chat_id": CHAT_ID,
-                "text": part,
-                "parse_mode": parse_mode,
-                "disable_web_page_preview": True
-            })
-            resps.append(r.status_code)
-            if r.status_code >= 400:
-                break
-        return {"ok": all(code < 400 for code in resps), "parts": len(resps)}
+    key = key or uuid.uuid4().hex
+    now = datetime.utcnow()
+    rows = [
+        {"key": hashlib.sha256(f"{key}\n{chat}\n{i}".encode()).hexdigest(), "chat_id": chat, "part": i,
+         "text": part, "parse_mode": parse_mode, "status": "pending", "attempts": 0,
+         "next_attempt_at": now, "last_error": "", "created_at": now}
+        for chat in chats for i, part in enumerate(_chunks(text, 3500))  # телега лимит ~4096
+    ]
+    own = session is None
+    session = session or SessionLocal()
+    try:
+        have = set((await session.execute(
+            select(OutboxMessage.key).where(OutboxMessage.key.in_([r["key"] for r in rows]))
+        )).scalars())
+        fresh = [r for r in rows if r["key"] not in have]
+        stmt = _insert_stmt(session)
+        if fresh and stmt is not None:
+            await session.execute(stmt, fresh)  # гонка с другим процессом — тоже no-op
+        elif fresh:
+            session.add_all([OutboxMessage(**r) for r in fresh])
+        queued = len(fresh)
+        await session.commit()
+    finally:
+        if own:
+            await session.close()
+    _wake_event().set()
+    return {"ok": True, "key": key, "chats": len(chats), "queued": queued, "duplicate": len(rows) - queued}
+
+async def send_telegram(text: str, *, parse_mode: str = "HTML", key: str | None = None):
+    # совместимость: теперь только ставит в очередь, доставляет воркер
+    return await enqueue(text, key=key, parse_mode=parse_mode)
+
+async def outbox_stats(session: AsyncSession) -> dict:
+    rows = (await session.execute(
+        select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+    )).all()
+    return {status: n for status, n in rows}
+
+# --- доставка ---
+async def _post(msg: OutboxMessage) -> tuple[str, float]:
+    """-> (итог, пауза): sent | retry (пауза из retry_after/backoff) | failed."""
+    try:
+        r = await get_client().post(API, data={
+            "chat_id": msg.chat_id,
+            "text": msg.text,
+            "parse_mode": msg.parse_mode,
+            "disable_web_page_preview": True,
+        })
+    except httpx.HTTPError as e:
+        return f"retry:{e.__class__.__name__}", 0.0
+    if r.status_code < 400:
+        return "sent", 0.0
+    try:
+        body = r.json()
+    except ValueError:
+        body = {}
+    if r.status_code == 429:
+        return f"retry:429 {body.get('description', '')}", float((body.get("parameters") or {}).get("retry_after") or 1)
+    if r.status_code >= 500:
+        return f"retry:{r.status_code}", 0.0
+    return f"failed:{r.status_code} {body.get('description', '')}", 0.0
+
+async def _claim(session: AsyncSession, msg_id: int, now: datetime) -> bool:
+    res = await session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id == msg_id, OutboxMessage.status.in_(("pending", "sending")),
+               OutboxMessage.next_attempt_at <= now)
+        .values(status="sending", next_attempt_at=now + timedelta(seconds=SEND_LEASE_S))
+    )
+    await session.commit()
+    return res.rowcount == 1
+
+async def _deliver_chat(chat_id: str, msgs: List[OutboxMessage]) -> Dict[str, int]:
+    out = {"sent": 0, "retry": 0, "failed": 0}
+    async with SessionLocal() as session:
+        for msg in msgs:  # части одного чата — строго по порядку
+            now = datetime.utcnow()
+            if not await _claim(session, msg.id, now):
+                break  # забрал другой воркер
+            await _chat_bucket(chat_id).acquire()
+            await _global_bucket().acquire()
+            result, pause = await _post(msg)
+            kind = result.split(":", 1)[0]
+            values = {"attempts": msg.attempts + 1, "last_error": result[len(kind) + 1:][:300]}
+            if kind == "sent":
+                values.update(status="sent", sent_at=datetime.utcnow(), last_error="")
+            elif kind == "retry" and msg.attempts + 1 < settings.tg_max_attempts:
+                if pause:
+                    _chat_bucket(chat_id).pause(pause)
+                else:
+                    pause = min(2 ** msg.attempts, 300) + random.uniform(0, 1)
+                values.update(status="pending", next_attempt_at=datetime.utcnow() + timedelta(seconds=pause))
+            else:
+                kind = "failed"
+                values.update(status="failed")
+            await session.execute(update(OutboxMessage).where(OutboxMessage.id == msg.id).values(**values))
+            await session.commit()
+            out[kind] += 1
+            if kind != "sent":
+                if kind == "failed":
+                    print(f"[notify] chat {chat_id} part {msg.part} failed: {values['last_error']}")
+                break  # остальные части этого чата — после повтора
+    return out
+
+async def deliver_once(limit: int = BATCH) -> Dict[str, int]:
+    """Один проход по готовым к отправке строкам: чаты параллельно, внутри чата — по порядку."""
+    now = datetime.utcnow()
+    # часть чата ждёт, пока более ранняя (меньший id) ещё не ушла: ждёт повтора или её шлёт другой воркер
+    earlier = aliased(OutboxMessage)
+    blocked = exists().where(earlier.chat_id == OutboxMessage.chat_id, earlier.id < OutboxMessage.id,
+                             earlier.status.in_(("pending", "sending")), earlier.next_attempt_at > now)
+    async with SessionLocal() as session:
+        msgs = (await session.execute(
+            select(OutboxMessage)
+            .where(OutboxMessage.status.in_(("pending", "sending")), OutboxMessage.next_attempt_at <= now, ~blocked)
+            .order_by(OutboxMessage.id).limit(limit)
+        )).scalars().all()
+    by_chat: Dict[str, List[OutboxMessage]] = {}
+    for m in msgs:
+        by_chat.setdefault(m.chat_id, []).append(m)
+    total = {"sent": 0, "retry": 0, "failed": 0}
+    for res in await asyncio.gather(*[_deliver_chat(c, ms) for c, ms in by_chat.items()]):
+        for k, v in res.items():
+            total[k] += v
+    return total
+
+async def run_outbox_worker():
+    """Фоновая доставка: после enqueue — сразу, иначе раз в TG_POLL_S (повторы по расписанию)."""
+    wake = _wake_event()
+    while True:
+        try:
+            res = await deliver_once()
+            if res["sent"] or res["failed"]:
+                print(f"[notify] outbox: {res}")
+            if res["sent"] + res["retry"] + res["failed"] >= BATCH:
+                continue  # очередь не разобрана — сразу следующий проход
+        except Exception as e:
+            print(f"[notify] outbox worker error: {e}")
+        wake.clear()
+        try:
+            await asyncio.wait_for(wake.wait(), timeout=settings.tg_poll_s)
+        except asyncio.TimeoutError:
+            pass
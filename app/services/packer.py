@@ -0,0 +1,103 @@
+"""
+Упаковка промпта в бюджет входных токенов (LLM_INPUT_BUDGET).
+
+Промпт собирается из кусков (Unit): обязательная шапка, строки сигналов,
+строки скрытых трендов, блок приоров. Куски берутся по убыванию ранга
+(ярус, вес), пока помещаются; в тексте они остаются в исходном порядке
+своей секции. Решения (что взято/отброшено, сколько токенов) уходят в
+Report.meta["packing"].
+
+Токены считаются приближённо локально: латиница ~4 символа на токен,
+кириллица и прочее ~2.5, знаки препинания — по токену. Если установлен
+tiktoken, используется он.
+"""
+from __future__ import annotations
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List
+
+try:
+    import tiktoken
+    _ENC = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENC = None
+
+_PIECE = re.compile(r"[A-Za-z0-9]+|[^\W\d_A-Za-z]+|\S", re.UNICODE)
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _ENC is not None:
+        return len(_ENC.encode(text))
+    n = 0
+    for m in _PIECE.finditer(text):
+        w = m.group()
+        if len(w) == 1:
+            n += 1
+        elif w.isascii():
+            n += math.ceil(len(w) / 4)
+        else:
+            n += math.ceil(len(w) / 2.5)
+    return n
+
+def tokenizer_name() -> str:
+    return "tiktoken:cl100k_base" if _ENC is not None else "approx"
+
+# ярусы: меньше — важнее
+REQUIRED, TOP_SIGNALS, TRENDS, PRIORS, SIGNALS = range(5)
+
+@dataclass
+class Unit:
+    section: str
+    text: str
+    tier: int
+    weight: float = 0.0
+    order: int = 0
+    tokens: int = 0
+
+def signal_priority(score: int, src_priority: int = 5, cluster_size: int = 1) -> float:
+    """Вес сигнала: score главнее всего, затем число источников сюжета, затем приоритет ленты (1..10)."""
+    return score * 100 + math.log2(max(cluster_size, 1)) * 10 + src_priority
+
+def lines(section: str, text: str, tier: int) -> List[Unit]:
+    """Блок построчно: более ранние строки весят больше (заголовок блока — первым)."""
+    rows = [r for r in (text or "").splitlines() if r.strip()]
+    return [Unit(section, r, tier, weight=-i, order=i) for i, r in enumerate(rows)]
+
+@dataclass
+class Packed:
+    sections: Dict[str, List[str]]
+    decisions: dict
+
+    def text(self, section: str) -> str:
+        return "\n".join(self.sections.get(section, []))
+
+def pack(units: Iterable[Unit], budget: int, overhead: str = "") -> Packed:
+    """
+    Жадная упаковка: REQUIRED берутся всегда, остальное — по (ярус, -вес),
+    пока суммарная оценка не превысит budget. overhead — неизменная часть
+    шаблона (инструкции), она тоже считается.
+    """
+    units = list(units)
+    for u in units:
+        u.tokens = estimate_tokens(u.text) + 1  # +1 — перевод строки
+    used = estimate_tokens(overhead)
+    kept: List[Unit] = []
+    stats: Dict[str, dict] = {}
+    for u in sorted(units, key=lambda u: (u.tier, -u.weight, u.order)):
+        st = stats.setdefault(u.section, {"kept": 0, "dropped": 0, "tokens": 0})
+        if u.tier == REQUIRED or used + u.tokens <= budget:
+            kept.append(u)
+            used += u.tokens
+            st["kept"] += 1
+            st["tokens"] += u.tokens
+        else:
+            st["dropped"] += 1
+    sections: Dict[str, List[Unit]] = {}
+    for u in kept:
+        sections.setdefault(u.section, []).append(u)
+    return Packed(
+        sections={k: [u.text for u in sorted(v, key=lambda u: u.order)] for k, v in sections.items()},
+        decisions={"budget": budget, "tokens": used, "tokenizer": tokenizer_name(), "sections": stats},
+    )
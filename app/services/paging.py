@@ -0,0 +1,50 @@
+"""
+Keyset-пагинация и условные GET для списков API.
+
+Курсор — ключ сортировки последней строки страницы (base64url JSON):
+следующая страница — WHERE ключ < курсора по индексу, без OFFSET, поэтому
+глубокие страницы стоят столько же, сколько первая. Ссылка на следующую
+страницу — в заголовке Link (rel="next"), тело ответа остаётся списком.
+
+ETag — слабый, от содержимого страницы; If-None-Match с тем же значением
+-> 304 без тела.
+"""
+import base64
+import hashlib
+import json
+from typing import Any, List
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+
+def encode_cursor(*values: Any) -> str:
+    data = json.dumps(jsonable_encoder(list(values)), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def decode_cursor(cursor: str | None, n: int) -> List[Any] | None:
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != n:
+        raise HTTPException(status_code=400, detail="Bad cursor")
+    return values
+
+def clamp(limit: int, hi: int) -> int:
+    return min(max(limit, 1), hi)
+
+def etag_of(payload: Any) -> str:
+    data = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":")).encode()
+    return 'W/"' + hashlib.sha1(data).hexdigest()[:20] + '"'
+
+def not_modified(request: Request, etag: str) -> bool:
+    tags = [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
+    return etag in tags or "*" in tags
+
+def page_headers(request: Request, response: Response, etag: str, cursor: str | None) -> None:
+    response.headers["ETag"] = etag
+    if cursor:
+        url = request.url.include_query_params(cursor=cursor)
+        response.headers["Link"] = f'<{url}>; rel="next"'
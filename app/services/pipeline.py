@@ -0,0 +1,218 @@
+"""
+Единый конвейер ингеста для API (/ingest/all) и планировщика.
+
+fetch → parse → normalize → classify → dedupe → batch → write
+
+Каждая стадия — async-генератор; между стадиями стоят ограниченные очереди,
+так что медленная запись притормаживает сбор (backpressure), а память не
+растёт с числом источников. Пакеты коммитятся по мере готовности: первые
+строки попадают в БД раньше, чем ответит самый медленный источник.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..analyzer.classify import classify
+from ..analyzer.dedup import signature
+from ..config import settings
+from ..models import Source
+from . import alerting, fetchers, seen, transcripts
+from .feedstate import load_feed_cache, save_feed_cache, stage_cursor
+from .ingest import news_row, bulk_insert_items
+from .trends import update_aggregates
+
+_DONE = object()
+
+class _Failed:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+class _SourceDone:
+    # метка конца строк источника в потоке: курсор ленты сдвигается после коммита пакета с ней
+    def __init__(self, url: str, cursor: Dict[str, Any]):
+        self.url = url
+        self.cursor = cursor
+
+async def buffered(stream: AsyncIterator[Any], maxsize: int | None = None) -> AsyncIterator[Any]:
+    """Гонит стадию в отдельной задаче через очередь ограниченного размера."""
+    q: asyncio.Queue = asyncio.Queue(maxsize or settings.ingest_queue_size)
+
+    async def pump():
+        try:
+            async for x in stream:
+                await q.put(x)
+        except Exception as e:
+            await q.put(_Failed(e))
+            return
+        await q.put(_DONE)
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            x = await q.get()
+            if x is _DONE:
+                break
+            if isinstance(x, _Failed):
+                raise x.exc
+            yield x
+    finally:
+        task.cancel()
+
+def _new_stat() -> Dict[str, Any]:
+    return {"added": 0, "skipped": 0, "fetched": 0, "status": "ok"}
+
+# ---------- стадии ----------
+
+async def fetch_stage(sources: Sequence[Source], stats: Dict[int, Dict[str, Any]]) -> AsyncIterator[Tuple[Source, bytes]]:
+    """Пул воркеров качает ленты; число тел в памяти ≤ воркеры + длина очереди."""
+    q: asyncio.Queue = asyncio.Queue(settings.ingest_queue_size)
+    todo = list(sources)
+
+    async def worker():
+        while todo:
+            src = todo.pop()
+            url = fetchers.feed_url(getattr(src, "type", "rss"), src.url)
+            try:
+                body = await asyncio.wait_for(
+                    fetchers.fetch_bytes(url, conditional=True),
+                    timeout=settings.fetch_source_deadline,
+                )
+            except Exception as e:
+                print(f"[ingest] {src.name}: {type(e).__name__}: {e}")
+                stats[src.id]["status"] = "error"
+                continue
+            if body is None:
+                stats[src.id]["status"] = "not_modified"
+                continue
+            await q.put((src, body))
+
+    async def run_workers():
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(settings.fetch_concurrency, len(todo)) or 1)))
+        finally:
+            await q.put(_DONE)
+
+    task = asyncio.create_task(run_workers())
+    try:
+        while True:
+            x = await q.get()
+            if x is _DONE:
+                break
+            yield x
+        await task
+    finally:
+        task.cancel()
+
+async def parse_stage(stream) -> AsyncIterator[Tuple[Source, List[Dict[str, Any]], _SourceDone]]:
+    async for src, body in stream:
+        limit = fetchers.YOUTUBE_MAX_ITEMS if (src.type or "").lower() == "youtube" else None
+        try:
+            # курсор ленты: разбор останавливается на уже виденных записях
+            url = fetchers.feed_url(getattr(src, "type", "rss"), src.url)
+            items, cursor = await asyncio.to_thread(fetchers.parse_items, body, limit, url)
+        except Exception as e:
+            print(f"[ingest] {src.name}: parse failed: {e}")
+            continue
+        del body
+        yield src, items, _SourceDone(url, cursor)
+
+async def normalize_stage(stream) -> AsyncIterator[Tuple[Source, Dict[str, Any] | _SourceDone]]:
+    # транскрипты — пачкой на источник: уже сохранённые видео и кеш не ходят в YouTube
+    async for src, items, done in stream:
+        if (src.type or "").lower() == "youtube" and fetchers.is_shvets_source(src.name, src.url):
+            try:
+                await transcripts.attach(items)
+            except Exception as e:
+                print(f"[ingest] {src.name}: transcripts failed: {e}")
+        for it in items:
+            yield src, it
+        yield src, done
+
+async def classify_stage(stream) -> AsyncIterator[Tuple[Source, Dict[str, Any] | _SourceDone]]:
+    # один проход матчера: релевантность (raw.score) + score/bucket(s)/country/org в колонки;
+    # подпись сюжета для склейки почти-дубликатов в отчёте
+    async for src, it in stream:
+        if isinstance(it, _SourceDone):
+            yield src, it
+            continue
+        it.update(classify(it["title"], it["url"], it["raw"], src.country, src.org))
+        it["minhash"] = signature(it["title"], it["raw"].get("summary", ""))
+        yield src, it
+
+async def dedupe_stage(stream, stats: Dict[int, Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    # повторы внутри прогона (одна ссылка в нескольких лентах); с БД сверяет write
+    seen: set[str] = set()
+    async for src, it in stream:
+        if isinstance(it, _SourceDone):
+            yield it
+            continue
+        row = news_row(src.id, it)
+        stats[src.id]["fetched"] += 1
+        if not row["url"] or row["url"] in seen:
+            stats[src.id]["skipped"] += 1
+            continue
+        seen.add(row["url"])
+        yield row
+
+async def batch_stage(stream, size: int) -> AsyncIterator[Tuple[List[Dict[str, Any]], List[_SourceDone]]]:
+    # метка источника едет с пакетом, где (или до которого) лежат все его строки
+    batch: List[Dict[str, Any]] = []
+    done: List[_SourceDone] = []
+    async for row in stream:
+        if isinstance(row, _SourceDone):
+            done.append(row)
+            continue
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch, done
+            batch, done = [], []
+    if batch or done:
+        yield batch, done
+
+async def write_stage(session: AsyncSession, batches, stats: Dict[int, Dict[str, Any]]) -> None:
+    async for batch, done in batches:
+        new_rows: List[Dict[str, Any]] = []
+        if batch:
+            for sid, st in (await bulk_insert_items(session, batch, collect=new_rows)).items():
+                stats[sid]["added"] += st["added"]
+                stats[sid]["skipped"] += st["skipped"]
+            # агрегаты трендов — в той же транзакции, что и сами строки
+            await update_aggregates(session, new_rows)
+        # курсоры лент, чьи строки все в этом или прошлых пакетах, — в той же транзакции
+        for d in done:
+            await stage_cursor(session, d.url, d.cursor)
+        await session.commit()
+        for d in done:
+            fetchers.commit_cursor(d.url, d.cursor)
+        # срочные алерты — сразу после коммита пакета, не дожидаясь конца ингеста
+        if new_rows:
+            await alerting.handle(session, new_rows)
+
+# ---------- сборка ----------
+
+async def run_ingest(session: AsyncSession, sources: Sequence[Source] | None = None, *,
+                     batch_size: int | None = None) -> Dict[str, Any]:
+    if sources is None:
+        sources = (await session.execute(select(Source))).scalars().all()
+    stats: Dict[int, Dict[str, Any]] = {src.id: _new_stat() for src in sources}
+    await load_feed_cache(session)
+    await alerting.warm_up(session)
+    await seen.warm_up(session)
+
+    stream = fetch_stage(sources, stats)
+    stream = buffered(parse_stage(stream))
+    stream = buffered(normalize_stage(stream))
+    stream = classify_stage(stream)
+    rows = dedupe_stage(stream, stats)
+    await write_stage(session, batch_stage(rows, batch_size or settings.ingest_batch_size), stats)
+
+    await save_feed_cache(session, [fetchers.feed_url(getattr(src, "type", "rss"), src.url) for src in sources])
+    await session.commit()
+    return {
+        "sources": len(sources),
+        "added": sum(st["added"] for st in stats.values()),
+        "skipped": sum(st["skipped"] for st in stats.values()),
+        "per_source": stats,
+    }
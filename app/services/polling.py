@@ -0,0 +1,132 @@
+"""
+Непрерывный опрос лент: у каждого источника свой интервал.
+
+Интервал = среднее геометрическое «по приоритету» (priority 10 → POLL_MIN_S,
+1 → POLL_MAX_S, логарифмически) и «по темпу публикаций» (POLL_ITEMS_PER_POLL
+новых строк на опрос при наблюдаемом publish_rate), затем:
+- x1.5 за каждый опрос подряд без новых строк (304/без изменений), до x11;
+- x2 за каждую ошибку подряд, до x64;
+- ±POLL_JITTER, чтобы ленты не сбивались в одну секунду;
+- пропорциональное растяжение, если прогноз запросов в сутки выше бюджета:
+  по умолчанию (POLL_BUDGET_PER_DAY=0) — прежний объём cron, 2 опроса
+  источника в сутки, т.е. частые ленты опрашиваются чаще за счёт редких;
+  больше — явным POLL_BUDGET_PER_DAY=N, без лимита — отрицательным.
+Отчёты остаются на своём cron (scheduler.py). Процессов может быть
+несколько: ленты раздаются арендами (leases.py).
+"""
+import asyncio
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models import Source
+from . import leases
+from .pipeline import run_ingest
+
+RATE_ALPHA = 0.3
+TICK_MAX_S = 60     # не спать дольше: новые источники подхватываются без рестарта
+
+def base_interval(priority: int | None) -> float:
+    p = min(max(priority or 5, 1), 10)
+    lo, hi = settings.poll_min_s, settings.poll_max_s
+    return hi * (lo / hi) ** ((p - 1) / 9)
+
+def raw_interval(src: Source) -> float:
+    """Интервал без джиттера и бюджета, в [POLL_MIN_S, POLL_MAX_S]."""
+    iv = base_interval(src.priority)
+    if src.last_polled_at is not None:
+        rate = max(src.publish_rate or 0.0, 1e-3)  # строк в час
+        iv = math.sqrt(iv * settings.poll_items_per_poll * 3600 / rate)
+    iv *= 1.5 ** min(src.idle_streak or 0, 6)
+    iv *= 2 ** min(src.fail_streak or 0, 6)
+    return min(max(iv, settings.poll_min_s), settings.poll_max_s)
+
+def next_interval(src: Source, budget_scale: float = 1.0) -> float:
+    iv = raw_interval(src) * budget_scale
+    return iv * random.uniform(1 - settings.poll_jitter, 1 + settings.poll_jitter)
+
+def observe(src: Source, st: Dict[str, Any], now: datetime, budget_scale: float = 1.0):
+    """Обновить счётчики источника по итогу опроса и назначить следующий."""
+    if st["status"] == "error":
+        src.fail_streak = (src.fail_streak or 0) + 1
+    else:
+        src.fail_streak = 0
+        src.idle_streak = 0 if st["added"] else (src.idle_streak or 0) + 1
+        if src.last_polled_at is not None:  # первый опрос — это накопленный хвост ленты, не темп
+            hours = max((now - src.last_polled_at).total_seconds() / 3600, 0.05)
+            src.publish_rate = (1 - RATE_ALPHA) * (src.publish_rate or 0.0) + RATE_ALPHA * st["added"] / hours
+        src.last_polled_at = now
+    iv = next_interval(src, budget_scale)
+    src.poll_interval_s = int(iv)
+    src.next_poll_at = now + timedelta(seconds=iv)
+
+async def projected_per_day(session: AsyncSession) -> float:
+    return sum(86400 / raw_interval(src) for src in (await session.execute(select(Source))).scalars())
+
+async def budget_per_day(session: AsyncSession) -> int | None:
+    """Лимит запросов в сутки; None — без лимита."""
+    if settings.poll_budget_per_day < 0:
+        return None
+    if settings.poll_budget_per_day > 0:
+        return settings.poll_budget_per_day
+    # как при опросе по cron 10:00/22:00
+    return 2 * (await session.execute(select(func.count()).select_from(Source))).scalar()
+
+async def _budget_scale(session: AsyncSession) -> float:
+    budget = await budget_per_day(session)
+    if not budget:
+        return 1.0
+    return max(await projected_per_day(session) / budget, 1.0)
+
+async def poll_once(session: AsyncSession, now: datetime | None = None) -> Dict[str, Any]:
+    now = now or datetime.utcnow()
+    # аренда: несколько процессов планировщика не опрашивают одну ленту дважды
+    due: List[Source] = await leases.claim_sources(session, settings.poll_batch, now)
+    if not due:
+        return {"sources": 0, "added": 0}
+    res = await run_ingest(session, due)
+    scale = await _budget_scale(session)
+    for src in due:
+        observe(src, res["per_source"][src.id], now, scale)
+    await session.flush()
+    await leases.release_sources(session, [src.id for src in due])
+    await session.commit()
+    return {"sources": len(due), "added": res["added"], "budget_scale": round(scale, 2)}
+
+async def sleep_until_next(session: AsyncSession):
+    nxt = (await session.execute(select(func.min(Source.next_poll_at)))).scalar()
+    wait = TICK_MAX_S if nxt is None else (nxt - datetime.utcnow()).total_seconds()
+    await asyncio.sleep(min(max(wait, 1.0), TICK_MAX_S))
+
+async def run_poller():
+    try:
+        async with SessionLocal() as session:
+            print(f"[poller] ~{await projected_per_day(session):.0f} requests/day across sources,"
+                  f" budget {await budget_per_day(session) or 'unlimited'}")
+    except Exception as e:
+        print(f"[poller] error: {e}")
+    while True:
+        try:
+            async with SessionLocal() as session:
+                res = await poll_once(session)
+                if res["sources"]:
+                    print(f"[poller] polled {res['sources']} sources, +{res['added']} items")
+                await sleep_until_next(session)
+        except Exception as e:
+            print(f"[poller] error: {e}")
+            await asyncio.sleep(TICK_MAX_S)
+
+async def schedule_view(session: AsyncSession) -> List[Dict[str, Any]]:
+    rows = (await session.execute(select(Source).order_by(Source.next_poll_at))).scalars().all()
+    return [
+        {"id": s.id, "name": s.name, "priority": s.priority, "interval_s": s.poll_interval_s,
+         "next_poll_at": s.next_poll_at, "publish_rate_h": round(s.publish_rate or 0.0, 3),
+         "idle_streak": s.idle_streak, "fail_streak": s.fail_streak}
+        for s in rows
+    ]
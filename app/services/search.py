@@ -0,0 +1,246 @@
+"""
+Полнотекстовый поиск по news_items: заголовок, summary и транскрипт.
+
+SQLite — FTS5 news_fts без собственного содержимого (content=''): хранится
+только индекс, rowid = news_items.id, текст остаётся в raw/raw_blobs.
+PostgreSQL — news_search(id, tsv) с GIN-индексом и ON DELETE CASCADE.
+Без стемминга: unicode61 с удалением диакритики / конфигурация simple —
+для русского помогает префикс (дрон*).
+
+Индекс пополняет ингест (bulk_insert_items), архив старых строк
+(services/compaction.py) из него убирает, python -m app.search --rebuild
+пересобирает его по news_items.
+
+Запрос: слова (все обязательны), "фраза", префикс слово*, -исключить.
+Выдача — от новых к старым по id (порядок записи), keyset-пагинация по id:
+FTS5 отдаёт совпадения в порядке rowid, и LIMIT останавливает проход, не
+дочитывая все совпадения частого слова.
+"""
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import SessionLocal
+from ..models import NewsItem
+from . import blobstore, leases
+
+FTS = "news_fts"
+CHUNK = 2000
+LOOKUP_CHUNK = 500
+MAX_TERMS = 16
+
+Doc = Tuple[int, str, str]  # id, заголовок, текст (summary + транскрипт)
+Term = Tuple[bool, List[str], bool]  # исключить, слова (фраза), префикс
+
+CHUNKS = re.compile(r'-?"[^"]*"?|\S+')
+WORD = re.compile(r"\w+")
+
+COLUMNS = (NewsItem.id, NewsItem.source_id, NewsItem.title, NewsItem.url, NewsItem.published_at,
+           NewsItem.score, NewsItem.bucket, NewsItem.buckets, NewsItem.country, NewsItem.org)
+
+def doc_text(raw: Dict[str, Any] | None) -> str:
+    raw = raw or {}
+    return "\n".join(v for v in (raw.get("summary"), raw.get("transcript")) if isinstance(v, str) and v)
+
+def parse_query(q: str) -> List[Term]:
+    terms: List[Term] = []
+    for chunk in CHUNKS.findall(q or "")[:MAX_TERMS]:
+        neg = chunk.startswith("-") and len(chunk) > 1
+        chunk = chunk[1:] if neg else chunk
+        prefix = not chunk.startswith('"') and chunk.endswith("*")
+        words = [w.lower() for w in WORD.findall(chunk)]
+        if words:
+            terms.append((neg, words, prefix))
+    if terms and all(neg for neg, _, _ in terms):
+        raise ValueError("query needs at least one word that is not excluded")
+    return terms
+
+def fts5_query(terms: Sequence[Term]) -> str:
+    # слова — только \w+, кавычки внутри невозможны
+    def one(words, prefix):
+        return '"' + " ".join(words) + '"' + (" *" if prefix else "")
+    pos = " AND ".join(one(w, p) for neg, w, p in terms if not neg)
+    return f"({pos})" + "".join(f" NOT {one(w, p)}" for neg, w, p in terms if neg)
+
+def pg_tsquery(terms: Sequence[Term]) -> str:
+    def one(words, prefix):
+        q = " <-> ".join(f"'{w}'" for w in words)
+        return q + ":*" if prefix else q
+    return " & ".join(("!" if neg else "") + f"({one(w, p)})" for neg, w, p in terms)
+
+# ---------- индекс ----------
+
+def index_ddl(dialect: str) -> List[str]:
+    """DDL индекса: миграция 0003, create_all (after_create у news_items) и доводка старой БД в app/migrate.py."""
+    if dialect == "sqlite":
+        return [f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS} USING fts5(title, body, content='',"
+                f" tokenize='unicode61 remove_diacritics 2')"]
+    if dialect == "postgresql":
+        return ["CREATE TABLE IF NOT EXISTS news_search (id INTEGER PRIMARY KEY REFERENCES news_items (id)"
+                " ON DELETE CASCADE, tsv TSVECTOR NOT NULL)",
+                "CREATE INDEX IF NOT EXISTS ix_news_search_tsv ON news_search USING GIN (tsv)"]
+    return []
+
+def drop_ddl(dialect: str) -> List[str]:
+    table_name = {"sqlite": FTS, "postgresql": "news_search"}.get(dialect)
+    return [f"DROP TABLE IF EXISTS {table_name}"] if table_name else []
+
+def create_index(sync_conn) -> None:
+    for ddl in index_ddl(sync_conn.dialect.name):
+        sync_conn.exec_driver_sql(ddl)
+
+def is_index_table(name: str) -> bool:
+    """Таблицы индекса (news_fts и её теневые news_fts_*) — не из моделей, автогенерация их не трогает."""
+    return name == "news_search" or name == FTS or name.startswith(FTS + "_")
+
+async def index_rows(session: AsyncSession, docs: Sequence[Doc]) -> int:
+    """Новые строки -> индекс; в транзакции вызывающего."""
+    if not docs:
+        return 0
+    dialect = session.get_bind().dialect.name
+    params = [{"id": i, "title": t or "", "body": b or ""} for i, t, b in docs]
+    if dialect == "sqlite":
+        await session.execute(text(f"INSERT INTO {FTS} (rowid, title, body) VALUES (:id, :title, :body)"), params)
+    elif dialect == "postgresql":
+        await session.execute(text(
+            "INSERT INTO news_search (id, tsv) VALUES (:id, setweight(to_tsvector('simple', :title), 'A')"
+            " || to_tsvector('simple', :body)) ON CONFLICT (id) DO UPDATE SET tsv = EXCLUDED.tsv"
+        ), params)
+    else:
+        return 0
+    return len(params)
+
+async def _indexed(session: AsyncSession, ids: Sequence[int]) -> set[int]:
+    found: set[int] = set()
+    for i in range(0, len(ids), LOOKUP_CHUNK):
+        found.update((await session.execute(
+            select(column("id")).select_from(table(f"{FTS}_docsize")).where(column("id").in_(ids[i:i + LOOKUP_CHUNK]))
+        )).scalars())
+    return found
+
+async def unindex(session: AsyncSession, docs: Sequence[Doc]) -> int:
+    """
+    Перед удалением строк из news_items. PostgreSQL чистит news_search сам
+    (каскад); FTS5 без содержимого удаляет документ только командой 'delete'
+    с тем же текстом, что индексировался, — поэтому docs с полным raw.
+    """
+    if not docs or session.get_bind().dialect.name != "sqlite":
+        return 0
+    indexed = await _indexed(session, [d[0] for d in docs])
+    params = [{"id": i, "title": t or "", "body": b or ""} for i, t, b in docs if i in indexed]
+    if params:
+        await session.execute(text(
+            f"INSERT INTO {FTS} ({FTS}, rowid, title, body) VALUES ('delete', :id, :title, :body)"
+        ), params)
+    return len(params)
+
+async def is_empty(session: AsyncSession) -> bool:
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        q = f"SELECT 1 FROM {FTS}_docsize LIMIT 1"
+    elif dialect == "postgresql":
+        q = "SELECT 1 FROM news_search LIMIT 1"
+    else:
+        return False
+    return (await session.execute(text(q))).first() is None
+
+async def rebuild(session: AsyncSession) -> int:
+    """Индекс заново по news_items (транскрипты — из raw_blobs); коммитит пачками."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        await session.execute(text(f"INSERT INTO {FTS} ({FTS}) VALUES ('delete-all')"))
+    elif dialect == "postgresql":
+        await session.execute(text("TRUNCATE news_search"))
+    else:
+        return 0
+    await session.commit()
+    last_id, done = 0, 0
+    while True:
+        rows = (await session.execute(
+            select(NewsItem.id, NewsItem.title, NewsItem.raw).where(NewsItem.id > last_id)
+            .order_by(NewsItem.id).limit(CHUNK)
+        )).all()
+        if not rows:
+            break
+        if dialect == "sqlite":
+            # ингест, идущий параллельно, уже внёс свои новые строки; повторная вставка rowid — ошибка
+            indexed = await _indexed(session, [r.id for r in rows])
+            todo = [r for r in rows if r.id not in indexed]
+        else:
+            todo = rows
+        raws = [r.raw or {} for r in todo]
+        await blobstore.hydrate(session, raws)
+        done += await index_rows(session, [(r.id, r.title, doc_text(raw)) for r, raw in zip(todo, raws)])
+        await session.commit()
+        last_id = rows[-1].id
+    if dialect == "sqlite":
+        await session.execute(text(f"INSERT INTO {FTS} ({FTS}) VALUES ('optimize')"))
+        await session.commit()
+    return done
+
+async def refill(force: bool = False) -> int | None:
+    """
+    rebuild под блокировкой (один процесс на всех). Без force — только если
+    индекс пуст, а news_items нет: старт API на БД до миграции 0003.
+    None — пересобирает другой процесс.
+    """
+    async with SessionLocal() as session:
+        if not force and (not await is_empty(session)
+                          or (await session.execute(select(NewsItem.id).limit(1))).first() is None):
+            return 0
+        if not await leases.acquire_lock(session, "search-rebuild", 6 * 3600):
+            return None
+        try:
+            n = await rebuild(session)
+        finally:
+            await leases.release_lock(session, "search-rebuild")
+    print(f"[search] index rebuilt: {n} rows")
+    return n
+
+# ---------- запрос ----------
+
+async def search_news(session: AsyncSession, q: str = "", *, country: Iterable[str] = (), bucket: Iterable[str] = (),
+                      org: Iterable[str] = (), source_id: int | None = None, min_score: int | None = None,
+                      since: datetime | None = None, until: datetime | None = None,
+                      before_id: int | None = None, limit: int = 50) -> List[Dict[str, Any]]:
+    terms = parse_query(q)
+    stmt = select(*COLUMNS)
+    if terms:
+        dialect = session.get_bind().dialect.name
+        if dialect == "sqlite":
+            fts = table(FTS, column("rowid"))
+            # FTS5 — внешний цикл: совпадения по убыванию rowid, фильтры — по ходу, LIMIT обрывает проход
+            stmt = (stmt.select_from(fts).join(NewsItem, NewsItem.id == fts.c.rowid)
+                    .where(text(f"{FTS} MATCH :match").bindparams(match=fts5_query(terms))))
+            order = fts.c.rowid
+        elif dialect == "postgresql":
+            srch = table("news_search", column("id"), column("tsv"))
+            stmt = (stmt.join(srch, srch.c.id == NewsItem.id)
+                    .where(srch.c.tsv.op("@@")(func.to_tsquery("simple", pg_tsquery(terms)))))
+            order = NewsItem.id
+        else:
+            raise ValueError(f"full-text search is not available on {dialect}")
+    else:
+        order = NewsItem.id
+    country, bucket, org = list(country), list(bucket), list(org)
+    if country:
+        stmt = stmt.where(NewsItem.country.in_(country))
+    if bucket:
+        stmt = stmt.where(NewsItem.bucket.in_(bucket))
+    if org:
+        stmt = stmt.where(NewsItem.org.in_(org))
+    if source_id is not None:
+        stmt = stmt.where(NewsItem.source_id == source_id)
+    if min_score is not None:
+        stmt = stmt.where(NewsItem.score >= min_score)
+    if since is not None:
+        stmt = stmt.where(NewsItem.published_at >= since.replace(tzinfo=None))
+    if until is not None:
+        stmt = stmt.where(NewsItem.published_at < until.replace(tzinfo=None))
+    if before_id is not None:
+        stmt = stmt.where(order < before_id)
+    rows = (await session.execute(stmt.order_by(order.desc()).limit(limit))).all()
+    return [dict(r._mapping) for r in rows]
@@ -0,0 +1,102 @@
+"""
+Фильтр уже сохранённых url (analyzer/urlset.py) для ингеста.
+
+Заполняется из news_items.url_hash один раз на процесс (warm_up перед
+первым пакетом), дальше — при каждой вставке. bulk_insert_items
+спрашивает фильтр: «нет» — url новый, в БД не ходим; «да» — сверка одним
+запросом по узкому индексу url_hash вместо строкового url (SEEN_CONFIRM=0 —
+верить фильтру, теряя долю SEEN_FP_RATE новых строк). url, вставленные
+другим процессом, фильтр не знает — их отсекает ON CONFLICT при вставке.
+"""
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..analyzer.urlset import BloomFilter, normalize_url, url_hash
+from ..config import settings
+from ..models import NewsItem
+
+CHUNK = 50000
+LOOKUP_CHUNK = 500
+
+_FILTER: BloomFilter | None = None
+STATS = {"checked": 0, "negative": 0, "positive": 0, "confirmed": 0, "false_positive": 0}
+
+def get_filter() -> BloomFilter | None:
+    # None — фильтр выключен или ещё не прогрет: ингест идёт старым путём
+    return _FILTER
+
+async def warm_up(session: AsyncSession) -> int:
+    global _FILTER
+    if _FILTER is not None or not settings.seen_filter:
+        return 0
+    total = (await session.execute(select(func.count()).select_from(NewsItem))).scalar() or 0
+    # запас x2 под рост; иначе доля ложных срабатываний уплывёт вверх раньше рестарта
+    bf = BloomFilter(max(settings.seen_capacity, 2 * total), settings.seen_fp_rate)
+    last_id = 0
+    while True:
+        rows = (await session.execute(
+            select(NewsItem.id, NewsItem.url_hash, NewsItem.url)
+            .where(NewsItem.id > last_id).order_by(NewsItem.id).limit(CHUNK)
+        )).all()
+        if not rows:
+            break
+        # строки до появления url_hash (python -m app.backfill их дозаполнит) — хешируем тут
+        bf.add_many(r.url_hash if r.url_hash is not None else url_hash(r.url) for r in rows)
+        last_id = rows[-1].id
+    _FILTER = bf
+    print(f"[seen] {bf.count} urls, {bf.nbytes / 1024:.0f} KB, k={bf.k}, est. fp {bf.fp_rate():.2e}")
+    return bf.count
+
+def remember(rows: Iterable[Dict]):
+    if _FILTER is not None:
+        for r in rows:
+            _FILTER.add(r["url_hash"])
+
+async def known_urls(session: AsyncSession, urls: Iterable[str]) -> Set[str]:
+    """Какие из urls уже есть в news_items (с точностью до нормализации)."""
+    bf = _FILTER
+    maybe: Dict[int, List[str]] = {}
+    for u in urls:
+        h = url_hash(u)
+        STATS["checked"] += 1
+        if h in bf:
+            STATS["positive"] += 1
+            maybe.setdefault(h, []).append(u)
+        else:
+            STATS["negative"] += 1
+    if not maybe:
+        return set()
+    if not settings.seen_confirm:
+        return {u for us in maybe.values() for u in us}
+    found = await lookup(session, maybe)
+    STATS["confirmed"] += len(found)
+    STATS["false_positive"] += sum(len(us) for us in maybe.values()) - len(found)
+    return found
+
+async def lookup(session: AsyncSession, by_hash: Dict[int, List[str]]) -> Set[str]:
+    """
+    url из by_hash ({url_hash: [url, ...]}), которые есть в news_items:
+    по индексу url_hash, затем сравнение нормализованных url. Одна мера
+    равенства и с фильтром, и без него (ingest.existing_urls).
+    """
+    found: Set[str] = set()
+    hashes = list(by_hash)
+    for i in range(0, len(hashes), LOOKUP_CHUNK):
+        rows = (await session.execute(
+            select(NewsItem.url_hash, NewsItem.url).where(NewsItem.url_hash.in_(hashes[i:i + LOOKUP_CHUNK]))
+        )).all()
+        for r in rows:
+            # совпал 64-битный хеш — сравниваем нормализованные url
+            found.update(u for u in by_hash.get(r.url_hash, ()) if normalize_url(u) == normalize_url(r.url))
+    return found
+
+def stats() -> dict:
+    bf = _FILTER
+    out = {"enabled": settings.seen_filter, "ready": bf is not None, "confirm": settings.seen_confirm, **STATS}
+    if bf is not None:
+        out.update(items=bf.count, bytes=bf.nbytes, bits=bf.m, hashes=bf.k, target_fp=settings.seen_fp_rate,
+                   estimated_fp=bf.fp_rate(),
+                   observed_fp=STATS["false_positive"] / max(STATS["checked"] - STATS["confirmed"], 1))
+    return out
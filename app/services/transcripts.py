@@ -0,0 +1,124 @@
+"""
+Транскрипты YouTube: свой пул потоков и кеш в БД по id видео.
+
+youtube_transcript_api синхронный: вызовы идут в пул из TRANSCRIPT_WORKERS
+потоков — event loop не блокируется, а медленный YouTube не занимает общий
+пул asyncio.to_thread (разбор лент). Результат сохраняется в
+transcript_cache, в том числе «субтитров нет» (status=none): такой ответ
+перепроверяется через TRANSCRIPT_RETRY_H — субтитры часто появляются через
+несколько часов после публикации. Сетевые ошибки не кешируются. Видео, чей
+url уже есть в news_items, не запрашивается вовсе.
+"""
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import select
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models import TranscriptCache
+from . import fetchers
+from .ingest import existing_urls
+
+try:
+    from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
+    NO_TRANSCRIPT = (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable)
+except Exception:
+    NO_TRANSCRIPT = ()
+
+STATS = {"known": 0, "cached": 0, "negative": 0, "fetched": 0, "missing": 0, "errors": 0}
+
+_pool: ThreadPoolExecutor | None = None
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=max(settings.transcript_workers, 1), thread_name_prefix="transcript")
+    return _pool
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+def _fetch(vid: str) -> str | None:
+    """Синхронно, в пуле: текст | "" (субтитров нет) | None (ошибка, повторить позже)."""
+    try:
+        segs = fetchers.YouTubeTranscriptApi.get_transcript(vid, languages=['ru','uk','en'])
+    except NO_TRANSCRIPT:
+        return ""
+    except Exception:
+        return None
+    text = " ".join(s.get("text","") for s in segs if s.get("text"))
+    return re.sub(r"\s+", " ", text).strip()[:fetchers.TRANSCRIPT_LIMIT]
+
+async def attach(items: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Кладёт транскрипты в it["raw"]["transcript"] для пачки видео одного
+    источника: один запрос на уже сохранённые url, один — в кеш, недостающие
+    качаются параллельно (не больше TRANSCRIPT_WORKERS), новые ответы
+    пишутся одним коммитом.
+    """
+    out = {"known": 0, "cached": 0, "fetched": 0}
+    if not fetchers.YouTubeTranscriptApi:
+        return out
+    vids = {it["url"]: fetchers._yt_video_id(it["url"]) for it in items}
+    vids = {u: v for u, v in vids.items() if v}
+    if not vids:
+        return out
+    now = datetime.utcnow()
+    retry_after = now - timedelta(hours=settings.transcript_retry_h)
+    async with SessionLocal() as session:
+        known = await existing_urls(session, vids)
+        cache = {r.video_id: r for r in (await session.execute(
+            select(TranscriptCache).where(TranscriptCache.video_id.in_(set(vids.values())))
+        )).scalars()}
+
+        todo: Dict[str, List[Dict[str, Any]]] = {}
+        for it in items:
+            vid = vids.get(it["url"])
+            if not vid:
+                continue
+            if it["url"] in known:
+                out["known"] += 1  # строка уже в БД — ингест её всё равно пропустит
+                continue
+            hit = cache.get(vid)
+            if hit is not None and (hit.status == "ok" or hit.fetched_at >= retry_after):
+                out["cached"] += 1
+                STATS["negative" if hit.status != "ok" else "cached"] += 1
+                if hit.text:
+                    it["raw"]["transcript"] = hit.text
+                continue
+            todo.setdefault(vid, []).append(it)
+        STATS["known"] += out["known"]
+        if not todo:
+            return out
+
+        loop = asyncio.get_running_loop()
+        texts = await asyncio.gather(*(loop.run_in_executor(_executor(), _fetch, vid) for vid in todo))
+        for (vid, its), text in zip(todo.items(), texts):
+            if text is None:
+                STATS["errors"] += 1
+                continue
+            out["fetched"] += 1
+            STATS["fetched" if text else "missing"] += 1
+            for it in its:
+                if text:
+                    it["raw"]["transcript"] = text
+            await session.merge(TranscriptCache(video_id=vid, status="ok" if text else "none",
+                                                text=text, fetched_at=now))
+        await session.commit()
+    return out
+
+async def transcript_for(url: str) -> str:
+    # одиночный вызов (fetchers.fetch_youtube)
+    it = {"url": url, "raw": {}}
+    await attach([it])
+    return it["raw"].get("transcript", "")
+
+def stats() -> dict:
+    return {**STATS, "workers": settings.transcript_workers, "available": bool(fetchers.YouTubeTranscriptApi)}
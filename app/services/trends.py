@@ -0,0 +1,143 @@
+"""
+Инкрементальные агрегаты трендов (trend_aggregates).
+
+Ингест добавляет в них только что записанные строки; отчёт читает
+агрегаты за окно вместо повторного скана news_items. Окно (30, 90 дней)
+меняется без лишних сканов — нужны лишь строки агрегатов за эти дни.
+Если агрегаты разошлись с историей — rebuild_aggregates пересобирает их
+(news_items и архив старше RETENTION_DAYS, services/compaction.py).
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..analyzer import vectorized
+from ..analyzer.context_tracker import DayAgg, summarize_aggregates
+from ..config import settings
+from ..models import NewsItem, TrendAggregate
+from . import compaction
+
+_FIELDS = ("count", "weight_sum", "weight_sq", "t_sum", "t_sq", "tw_sum")
+REBUILD_CHUNK = 2000
+
+Key = Tuple[date, str, str]
+
+def accumulate(rows: Iterable[Dict[str, Any]]) -> Dict[Key, Dict[str, float]]:
+    """Строки news_items (dict) -> дельты по (день, тема, страна); только сигналы score >= 1."""
+    out: Dict[Key, Dict[str, float]] = {}
+    for r in rows:
+        w = float(r.get("score") or 0)
+        names = (r.get("buckets") or r.get("bucket") or "").split(",")
+        if w < 1 or not names[0]:
+            continue
+        t = r["published_at"]
+        off = float(t.hour * 3600 + t.minute * 60 + t.second)
+        for b in names:
+            d = out.setdefault((t.date(), b, r.get("country") or ""), dict.fromkeys(_FIELDS, 0.0))
+            d["count"] += 1
+            d["weight_sum"] += w
+            d["weight_sq"] += w * w
+            d["t_sum"] += off
+            d["t_sq"] += off * off
+            d["tw_sum"] += off * w
+    return out
+
+def _upsert_stmt(session: AsyncSession):
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(TrendAggregate)
+    return stmt.on_conflict_do_update(
+        index_elements=["day", "bucket", "country"],
+        set_={f: getattr(TrendAggregate, f) + getattr(stmt.excluded, f) for f in _FIELDS},
+    )
+
+async def apply_deltas(session: AsyncSession, deltas: Dict[Key, Dict[str, float]]) -> int:
+    if not deltas:
+        return 0
+    params = [
+        {"day": k[0], "bucket": k[1], "country": k[2], **{f: v[f] for f in _FIELDS}}
+        for k, v in deltas.items()
+    ]
+    for p in params:
+        p["count"] = int(p["count"])
+    stmt = _upsert_stmt(session)
+    if stmt is not None:
+        await session.execute(stmt, params)
+        return len(params)
+    # прочие диалекты: прочитать-изменить-записать через ORM
+    for p in params:
+        row = await session.get(TrendAggregate, (p["day"], p["bucket"], p["country"]))
+        if row is None:
+            session.add(TrendAggregate(**p))
+        else:
+            for f in _FIELDS:
+                setattr(row, f, getattr(row, f) + p[f])
+    return len(params)
+
+async def update_aggregates(session: AsyncSession, rows: Iterable[Dict[str, Any]]) -> int:
+    """Вызывается ингестом для новых строк; коммит — на вызывающем."""
+    return await apply_deltas(session, accumulate(rows))
+
+async def rebuild_aggregates(session: AsyncSession, since: datetime | None = None) -> int:
+    """Пересборка из news_items и архива (целиком или начиная с since); коммитит сама."""
+    q = delete(TrendAggregate)
+    if since is not None:
+        q = q.where(TrendAggregate.day >= since.date())
+    await session.execute(q)
+    last_id, total = 0, 0
+    while True:
+        stmt = (
+            select(NewsItem.id, NewsItem.published_at, NewsItem.score,
+                   NewsItem.bucket, NewsItem.buckets, NewsItem.country)
+            .where(NewsItem.id > last_id, NewsItem.score >= 1, NewsItem.bucket.is_not(None))
+            .order_by(NewsItem.id).limit(REBUILD_CHUNK)
+        )
+        if since is not None:
+            stmt = stmt.where(NewsItem.published_at >= datetime.combine(since.date(), datetime.min.time()))
+        rows = (await session.execute(stmt)).mappings().all()
+        if not rows:
+            break
+        await apply_deltas(session, accumulate(rows))
+        total += len(rows)
+        last_id = rows[-1]["id"]
+    day0 = None if since is None else datetime.combine(since.date(), datetime.min.time())
+    async for rows in compaction.iter_archived(session, since=day0):
+        rows = [r for r in rows if (r.get("score") or 0) >= 1 and r.get("bucket") is not None]
+        await apply_deltas(session, accumulate(rows))
+        total += len(rows)
+    await session.commit()
+    return total
+
+async def load_aggregates(session: AsyncSession, days: int) -> list[DayAgg]:
+    start = (datetime.now(timezone.utc) - timedelta(days=days)).date()
+    rows = (await session.execute(
+        select(TrendAggregate).where(TrendAggregate.day >= start)
+    )).scalars().all()
+    return [
+        DayAgg(day=r.day, bucket=r.bucket, country=r.country, count=r.count,
+               weight_sum=r.weight_sum, weight_sq=r.weight_sq,
+               t_sum=r.t_sum, t_sq=r.t_sq, tw_sum=r.tw_sum)
+        for r in rows
+    ]
+
+async def trend_summary(session: AsyncSession, days: int = 14) -> str:
+    cooccur = settings.trend_cooccur_days
+    # для скользящих окон совпадений нужен запас истории в cooccur дней
+    aggs = await load_aggregates(session, days + cooccur)
+    now = datetime.now(timezone.utc)
+    text = summarize_aggregates(aggs, now, days=days)
+    if vectorized.available() and aggs:
+        extra = vectorized.summarize_frame(
+            vectorized.SignalFrame.from_aggregates(aggs), now, days=days,
+            cooccur_days=cooccur, burst_z=settings.trend_burst_z,
+        )
+        if extra:
+            text += "\n" + extra
+    return text
@@ -0,0 +1,128 @@
+"""
+Рост хранилища по месяцам: raw inline без уплотнения (как было) против
+raw_blobs + ночного уплотнения с окном RETENTION_DAYS (services/compaction.py).
+
+    python -m bench.bench_compaction [--months 12] [--per-month 20000] [--days 90] [--transcripts 0.02]
+
+Каждый режим — в отдельном процессе со своей SQLite. Месяц за месяцем
+строки пишутся обычным ингестом (bulk_insert_items), затем «сутки проходят»:
+уплотнение с часами, сдвинутыми на конец месяца. После каждого месяца —
+размер файла, строк в news_items и время типичных сканов горячей таблицы
+(агрегат по score/bucket — как пересборка трендов; выборка сигналов за 48 ч —
+как отчёт).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+WORDS = ("граница дроны ПВО учения НАТО Эстония Латвия Литва министр заявил самолёт ракета "
+         "кибератака порт транзит энергетика Балтия правительство рынок").split()
+
+def month_rows(rnd: random.Random, start: datetime, n: int, first_id: int, share: float):
+    from app.services.ingest import news_row
+    transcript = " ".join(rnd.choice(WORDS) for _ in range(2200))[:15000]
+    rows = []
+    for i in range(first_id, first_id + n):
+        score = rnd.choice((1, 1, 2, 3)) if rnd.random() < 0.3 else 0
+        raw = {"summary": " ".join(rnd.choice(WORDS) for _ in range(60)), "score": score}
+        if rnd.random() < share:
+            raw["transcript"] = transcript + f" #{i}"  # у каждого видео свой текст
+        rows.append(news_row(1 + i % 40, {
+            "title": " ".join(rnd.choice(WORDS) for _ in range(9)), "url": f"https://news.example/{i}",
+            "published_at": start + timedelta(seconds=rnd.uniform(0, 30 * 86400)), "raw": raw, "score": score,
+            "bucket": "border" if score else None, "buckets": "border" if score else "", "country": "EE", "org": "MEDIA",
+        }))
+    return rows
+
+async def scans(session, now: datetime) -> dict:
+    from sqlalchemy import func, select
+    from app.models import NewsItem
+    t0 = time.perf_counter()
+    await session.execute(select(NewsItem.bucket, func.count(), func.sum(NewsItem.score))
+                          .where(NewsItem.score >= 1).group_by(NewsItem.bucket))
+    t1 = time.perf_counter()
+    await session.execute(select(NewsItem.id, NewsItem.title, NewsItem.score)
+                          .where(NewsItem.published_at >= now - timedelta(hours=48), NewsItem.score >= 1)
+                          .order_by(NewsItem.score.desc(), NewsItem.published_at.desc()).limit(900))
+    t2 = time.perf_counter()
+    return {"agg_ms": (t1 - t0) * 1000, "window_ms": (t2 - t1) * 1000}
+
+async def child(mode: str, db: str, months: int, per_month: int, days: int, share: float):
+    from sqlalchemy import func, select
+    from app.config import settings
+    from app.db import Base, SessionLocal, engine
+    from app.models import NewsItem
+    from app.services import compaction
+    from app.services.ingest import bulk_insert_items
+
+    settings.retention_days = 0  # ингест не отбрасывает «старые» даты; окно — в run_compaction(days=...)
+    if mode == "inline":
+        settings.blob_min_bytes = 0
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    rnd = random.Random(7)
+    t_start = datetime(2025, 1, 1)
+    for m in range(months):
+        start = t_start + timedelta(days=30 * m)
+        now = start + timedelta(days=30)
+        async with SessionLocal() as session:
+            rows = month_rows(rnd, start, per_month, 1 + m * per_month, share)
+            for i in range(0, len(rows), 1000):
+                await bulk_insert_items(session, rows[i:i + 1000])
+                await session.commit()
+        res = {}
+        if mode == "compact":
+            res = await compaction.run_compaction(days=days, vacuum=True, now=now)
+        else:
+            async with engine.connect() as conn:  # честное сравнение размера файла: тоже без свободных страниц
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.exec_driver_sql("VACUUM")
+        async with SessionLocal() as session:
+            hot = (await session.execute(select(func.count()).select_from(NewsItem))).scalar()
+            best = {}
+            for _ in range(3):
+                for k, v in (await scans(session, now)).items():
+                    best[k] = min(best.get(k, v), v)
+        print(json.dumps({"month": m + 1, "hot": hot, "mb": os.path.getsize(db) / 2**20,
+                          "compact_s": res.get("seconds", 0), **best}), flush=True)
+    await engine.dispose()
+
+def run_child(mode: str, args) -> list[dict]:
+    db = os.path.join(tempfile.mkdtemp(), f"{mode}.db")
+    env = {**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{db}", "SEEN_FILTER": "0"}
+    out = subprocess.run([sys.executable, "-m", "bench.bench_compaction", "--child", mode, "--db", db,
+                          "--months", str(args.months), "--per-month", str(args.per_month),
+                          "--days", str(args.days), "--transcripts", str(args.transcripts)],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    return [json.loads(line) for line in out.splitlines() if line.startswith("{")]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--per-month", type=int, default=20000)
+    ap.add_argument("--days", type=int, default=90, help="retention window for the compacted run")
+    ap.add_argument("--transcripts", type=float, default=0.02, help="share of rows with a 15k-char transcript")
+    ap.add_argument("--child", choices=("inline", "compact"), help=argparse.SUPPRESS)
+    ap.add_argument("--db", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        asyncio.run(child(args.child, args.db, args.months, args.per_month, args.days, args.transcripts))
+        return
+
+    res = {mode: run_child(mode, args) for mode in ("inline", "compact")}
+    print(f"{'month':>5} | {'inline: rows':>12} {'MB':>6} {'agg ms':>7} {'48h ms':>7} | "
+          f"{'compact: rows':>13} {'MB':>6} {'agg ms':>7} {'48h ms':>7} {'pass s':>6}")
+    for a, b in zip(res["inline"], res["compact"]):
+        print(f"{a['month']:>5} | {a['hot']:>12} {a['mb']:>6.1f} {a['agg_ms']:>7.1f} {a['window_ms']:>7.1f} | "
+              f"{b['hot']:>13} {b['mb']:>6.1f} {b['agg_ms']:>7.1f} {b['window_ms']:>7.1f} {b['compact_s']:>6.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Бенчмарк разбора лент: feedparser против потокового feedparse (app/services/feedparse.py).
+
+    python -m bench.bench_feedparse [--rounds 20] [--new 2]
+
+Фикстуры — bench/fixtures/*.xml в формате реальных источников (RSS 2.0 с
+CDATA/content:encoded, Atom YouTube, RSS 1.0 ведомств, битая лента с
+HTML-сущностями). Три режима:
+- feedparser: feedparser.parse + entry_item, как было;
+- fast: потоковый разбор всей ленты (без курсора — первый опрос);
+- cursor: следующий опрос — сверху --new новых записей, остальное известно.
+Пиковая память — tracemalloc на одном разборе.
+"""
+import argparse
+import glob
+import os
+import re
+import time
+import tracemalloc
+from xml.etree.ElementTree import ParseError
+
+import feedparser
+
+from app.services import feedparse
+from app.services.fetchers import entry_item, parse_items
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def best_ms(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def peak_kb(fn) -> float:
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+def with_new(body: bytes, n: int) -> bytes:
+    """Лента следующего опроса: n новых записей перед первой существующей."""
+    s = body.decode()
+    m = re.search(r"<(item|entry)[\s>]", s)
+    if m is None or n <= 0:
+        return body
+    first = s[m.start():s.index(f"</{m.group(1)}>", m.start()) + len(m.group(1)) + 3]
+    fresh = "".join(re.sub(r"(https?://[^\s<\"]+)", rf"\1-new{k}", first).replace(">yt:video:", f">yt:video:new{k}")
+                    .replace("-5000<", f"-new{k}<") for k in range(n))
+    return (s[:m.start()] + fresh + s[m.start():]).encode()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--new", type=int, default=2)
+    args = ap.parse_args()
+
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.xml"))):
+        body = open(path, "rb").read()
+        name = os.path.basename(path)
+        ref = lambda: [entry_item(e) for e in feedparser.parse(body).entries]
+        n = len(ref())
+        t_ref, m_ref = best_ms(ref, args.rounds), peak_kb(ref)
+        line = f"{name:<18} {len(body) / 1024:6.0f} KB {n:>4} items | feedparser {t_ref:7.2f} ms {m_ref:7.0f} KB"
+        try:
+            feedparse.parse(body)
+        except ParseError:
+            print(line + " | fast: не XML -> fallback на feedparser")
+            continue
+        fast = lambda: feedparse.parse(body)
+        t_fast, m_fast = best_ms(fast, args.rounds), peak_kb(fast)
+        _, cursor = feedparse.parse(body)
+        nxt = with_new(body, args.new)
+        inc = lambda: feedparse.parse(nxt, None, cursor)
+        got = len(inc()[0])
+        t_inc, m_inc = best_ms(inc, args.rounds), peak_kb(inc)
+        print(line + f" | fast {t_fast:6.2f} ms {m_fast:6.0f} KB (x{t_ref / t_fast:4.1f})"
+                     f" | cursor {t_inc:5.2f} ms {m_inc:5.0f} KB, {got} new (x{t_ref / t_inc:5.1f})")
+        print(f"{'':<18} throughput: feedparser {n / t_ref * 1000:8.0f} items/s,"
+              f" fast {n / t_fast * 1000:8.0f} items/s, {len(body) / 1024 / t_fast:6.1f} MB/s")
+    # путь приложения целиком: fast + курсор, при битом XML — feedparser
+    body = open(os.path.join(FIXTURES, "rss_news.xml"), "rb").read()
+    print(f"parse_items(rss_news.xml): {best_ms(lambda: parse_items(body), args.rounds):.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Бенчмарк маршрутизатора LLM (app/services/llm.py) на поддельных провайдерах.
+
+    python -m bench.bench_llm_router [--calls 200] [--scale 0.1] [--hedge-delay 1.0]
+
+Провайдеры подменяются транспортом httpx.MockTransport внутри процесса,
+сеть не нужна. Профиль задержек (в секундах до масштабирования --scale):
+- groq: обычно 0.4, но в 15% случаев хвост 6.0 и в 8% — 429 c Retry-After: 2;
+- openai: стабильно 1.2 ± 0.2.
+Сравниваются последовательный фолбэк (LLM_HEDGE=0) и хеджирование;
+для потока — время до первого куска и до конца ответа.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from app.config import settings
+from app.services import llm
+
+PROFILE = {
+    "groq": {"base": 0.4, "tail_p": 0.15, "tail": 6.0, "err_p": 0.08, "retry_after": 2},
+    "openai": {"base": 1.2, "jitter": 0.2},
+}
+
+def fake_transport(scale: float, rnd: random.Random) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        name = "groq" if "groq" in request.url.host else "openai"
+        prof = PROFILE[name]
+        body = json.loads(request.content)
+        if rnd.random() < prof.get("err_p", 0.0):
+            await asyncio.sleep(0.05 * scale)
+            # Retry-After целое: масштабируем только если не обнулится
+            return httpx.Response(429, headers={"retry-after": str(max(int(prof["retry_after"] * scale), 0))})
+        delay = prof["base"] + rnd.uniform(-1, 1) * prof.get("jitter", 0.0)
+        if rnd.random() < prof.get("tail_p", 0.0):
+            delay = prof["tail"]
+        delay *= scale
+        text = f"report from {name}"
+        if not body.get("stream"):
+            await asyncio.sleep(delay)
+            return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+        async def sse():
+            await asyncio.sleep(delay)  # время до первого куска
+            for word in text.split():
+                payload = {"choices": [{"delta": {"content": word + " "}}]}
+                yield f"data: {json.dumps(payload)}\n\n".encode()
+                await asyncio.sleep(0.05 * scale)
+            yield b"data: [DONE]\n\n"
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=sse())
+    return httpx.MockTransport(handler)
+
+def pct(xs, q):
+    xs = sorted(xs)
+    return xs[min(int(q * len(xs)), len(xs) - 1)]
+
+async def run(mode: str, calls: int, scale: float, hedge_delay: float, seed: int):
+    settings.llm_hedge = mode != "sequential"
+    settings.llm_hedge_delay_s = hedge_delay * scale
+    llm.STATS.clear()
+    llm._client = httpx.AsyncClient(transport=fake_transport(scale, random.Random(seed)))
+    total, first = [], []
+    for i in range(calls):
+        t0 = time.perf_counter()
+        if mode == "stream":
+            got_first = None
+            async for _ in llm.chat_stream(f"prompt {i}"):
+                if got_first is None:
+                    got_first = time.perf_counter() - t0
+            first.append(got_first / scale)
+        else:
+            await llm.chat_ex(f"prompt {i}")
+        total.append((time.perf_counter() - t0) / scale)
+    await llm.close_client()
+    line = f"{mode:>10}: p50 {pct(total, .5):5.2f}s  p95 {pct(total, .95):5.2f}s  max {max(total):5.2f}s"
+    if first:
+        line += f" | first chunk p50 {pct(first, .5):5.2f}s  p95 {pct(first, .95):5.2f}s"
+    print(line)
+    print(" " * 12 + "stats:", {k: {"calls": v["calls"], "errors": v["errors"]} for k, v in llm.provider_stats().items()})
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=200)
+    ap.add_argument("--scale", type=float, default=0.1, help="сжатие времени; результаты пересчитаны обратно")
+    ap.add_argument("--hedge-delay", type=float, default=1.0)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    settings.llm_cache = False
+    settings.groq_api_key = settings.groq_api_key or "fake"
+    settings.openai_api_key = settings.openai_api_key or "fake"
+    llm.GROQ_URL = "https://groq.fake/v1/chat/completions"
+    llm.OPENAI_URL = "https://openai.fake/v1/chat/completions"
+    print(f"calls={args.calls} hedge_delay={args.hedge_delay}s (times in unscaled seconds)")
+    for mode in ("sequential", "hedged", "stream"):
+        await run(mode, args.calls, args.scale, args.hedge_delay, args.seed)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Микробенчмарк: однопроходный матчер против текущих is_relevant + bucket_of.
+
+    python -m bench.bench_matcher [--docs 300] [--chars 15000]
+
+Корпус — синтетические тексты размера транскрипта (ru/en вперемешку),
+в части из них подмешаны триггеры. Проверяется совпадение результатов:
+релевантность и первая тема (как у bucket_of) должны быть идентичны.
+"""
+import argparse
+import random
+import time
+
+from app.analyzer.context_tracker import KEY_PATS, bucket_of
+from app.analyzer.matcher import reload
+from app.services.fetchers import is_relevant
+
+FILLER = (
+    "в регионе продолжается обсуждение бюджета транспорта выборов отопления школ "
+    "правительство заявило министр встретился с коллегами рынок недвижимости цены "
+    "the government said today that the economy grows in the region new policy "
+    "Latvia Estonia Lithuania Finland Poland council meeting parliament vote"
+).split()
+TRIGGERS = (
+    "ракеты БПЛА учения санкции DDoS incursion Patriot дроны беспилотник "
+    "посольство кибератака пусков переброска missiles ПВО приграничье UAV"
+).split()
+
+def corpus(n_docs: int, n_chars: int, seed: int = 7) -> list[str]:
+    rnd = random.Random(seed)
+    docs = []
+    for i in range(n_docs):
+        words, size = [], 0
+        while size < n_chars:
+            w = rnd.choice(TRIGGERS) if rnd.random() < (0.002 if i % 3 else 0.0) else rnd.choice(FILLER)
+            words.append(w)
+            size += len(w) + 1
+        docs.append(" ".join(words))
+    return docs
+
+def legacy(text: str):
+    # текущий путь: PAT для релевантности + до 7 последовательных KEY_PATS;
+    # для честного сравнения «всех тем» перебираем все паттерны
+    return is_relevant(text), bucket_of(text, ""), [k for k, p in KEY_PATS if p.search(text)]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=300)
+    ap.add_argument("--chars", type=int, default=15000)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    docs = corpus(args.docs, args.chars)
+    mb = sum(map(len, docs)) / 1e6
+    m = reload("")
+
+    def timed(fn):
+        best = float("inf")
+        for _ in range(args.rounds):
+            t0 = time.perf_counter()
+            for d in docs:
+                fn(d)
+            best = min(best, time.perf_counter() - t0)
+        return best
+
+    t_first = timed(lambda d: (is_relevant(d), bucket_of(d, "")))
+    t_all = timed(legacy)
+    t_new = timed(m.scan)
+
+    mismatches = 0
+    for d in docs:
+        rel, first, every = legacy(d)
+        r = m.scan(d)
+        if (rel, first, every) != (r.relevant, r.bucket, r.buckets):
+            mismatches += 1
+
+    print(f"corpus: {len(docs)} docs, {mb:.1f} MB")
+    print(f"legacy first-match (is_relevant + bucket_of): {t_first:.3f}s  {mb / t_first:.1f} MB/s")
+    print(f"legacy all buckets (PAT + 7 x KEY_PATS):      {t_all:.3f}s  {mb / t_all:.1f} MB/s")
+    print(f"single-pass matcher (all buckets + hits):     {t_new:.3f}s  {mb / t_new:.1f} MB/s")
+    print(f"speedup vs first-match: x{t_first / t_new:.1f}; vs all buckets: x{t_all / t_new:.1f}")
+    print(f"result mismatches: {mismatches}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+GET /news на больших объёмах: FTS5-индекс (services/search.py) против
+LIKE-скана, которым аналитики искали в SQLite вручную.
+
+    python -m bench.bench_news_search [--rows 1000000] [--db /tmp/news.db] [--repeat 5]
+
+БД строится один раз (--db переиспользуется): миграции, затем строки
+news_items и индекс напрямую через sqlite3 (ингест миллиона строк — это
+минуты). Частоты слов — по Ципфу на 50000 слов, тематические — от «в каждой
+четвёртой строке» (граница) до долей процента, редкие w… — десятки строк на
+миллион. Для каждого запроса — лучшее из --repeat время первой страницы
+(50 строк), 20-й страницы по курсору и LIKE на той же выборке. Худший случай
+FTS — частое слово с фильтром, который почти ничего не пропускает: совпадения
+перебираются до конца.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+THEMED = ("граница дроны ПВО учения НАТО Эстония Латвия Литва министр заявил самолёт ракета "
+          "кибератака порт транзит энергетика Балтия правительство рынок").split()
+COUNTRIES = ("EE", "LV", "LT", "FI", "PL")
+BUCKETS = ("border", "cyber", "energy", "military")
+
+QUERIES = [
+    ("частое слово", {"q": "дроны"}),
+    ("частое + фильтры", {"q": "дроны", "country": ["LT"], "min_score": 2}),
+    ("частое + редкий фильтр", {"q": "граница", "source_id": 7, "min_score": 3, "bucket": ["cyber"]}),
+    ("частое, фильтр без строк", {"q": "граница", "country": ["XX"]}),
+    ("редкое слово", {"q": "w37311"}),
+    ("фраза", {"q": '"ракета порт"'}),
+    ("префикс", {"q": "кибер*"}),
+    ("два слова -исключение", {"q": "энергетика транзит -рынок"}),
+    ("без q, фильтры и окно", {"country": ["EE", "LV"], "bucket": ["border"], "min_score": 1, "days": 7}),
+]
+
+def vocabulary():
+    """Ципф по 50000 словам; тематические — на местах 20..2000 (от ~25% строк до ~0.3%)."""
+    words = [f"w{i}" for i in range(50000)]
+    for k, w in enumerate(THEMED):
+        words[20 + k * 110] = w
+    cum, acc = [], 0.0
+    for k in range(len(words)):
+        acc += 1 / (k + 1)
+        cum.append(acc)
+    return words, cum
+
+def build_db(path: str, n: int, seed: int = 7):
+    env = {**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{path}"}
+    subprocess.run([sys.executable, "-m", "app.migrate"], env=env, check=True, capture_output=True)
+    rnd = random.Random(seed)
+    words, cum = vocabulary()
+    now = datetime.utcnow()
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=OFF")
+    con.execute("PRAGMA synchronous=OFF")
+    con.executemany("INSERT INTO sources (id, name, url, type, country, org, priority, fail_streak, idle_streak, publish_rate) "
+                    "VALUES (?, ?, ?, 'rss', ?, 'MEDIA', ?, 0, 0, 0)",
+                    [(i, f"src{i}", f"https://s{i}.example/rss", COUNTRIES[i % 5], 1 + i % 10) for i in range(1, 41)])
+    t0 = time.perf_counter()
+    news, fts = [], []
+    for i in range(1, n + 1):
+        title = " ".join(rnd.choices(words, cum_weights=cum, k=9))
+        summary = " ".join(rnd.choices(words, cum_weights=cum, k=60))
+        score = rnd.choice((1, 1, 2, 3)) if rnd.random() < 0.3 else 0
+        bucket = rnd.choice(BUCKETS) if score else None
+        # id растёт со временем публикации, как при ингесте
+        published = now - timedelta(seconds=(n - i) * 180 * 86400 / n)
+        news.append((i, 1 + i % 40, title, f"https://news.example/{i}", published, "ru",
+                     json.dumps({"summary": summary}, ensure_ascii=False), score, bucket, bucket or "",
+                     COUNTRIES[i % 5], "MEDIA"))
+        fts.append((i, title, summary))
+        if len(news) >= 20000 or i == n:
+            con.executemany("INSERT INTO news_items (id, source_id, title, url, published_at, lang, raw, score, bucket, "
+                            "buckets, country, org) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", news)
+            con.executemany("INSERT INTO news_fts (rowid, title, body) VALUES (?, ?, ?)", fts)
+            news, fts = [], []
+    con.execute("INSERT INTO news_fts (news_fts) VALUES ('optimize')")
+    con.commit()
+    con.execute("ANALYZE")
+    con.close()
+    print(f"built {n} rows in {time.perf_counter() - t0:.0f} s, {os.path.getsize(path) / 2**20:.0f} MB")
+
+def like_sql(params: dict) -> tuple[str, list]:
+    """То, что делали руками: LIKE по заголовку и raw, фильтры, сортировка по id."""
+    where, args = [], []
+    for term in (params.get("q") or "").replace('"', "").split():
+        neg = term.startswith("-")
+        term = term.lstrip("-").rstrip("*")
+        where.append(f"{'NOT ' if neg else ''}(title LIKE ? OR raw LIKE ?)")
+        args += [f"%{term}%"] * 2
+    for col in ("country", "bucket"):
+        if params.get(col):
+            where.append(f"{col} IN ({', '.join('?' * len(params[col]))})")
+            args += params[col]
+    if "source_id" in params:
+        where.append("source_id = ?")
+        args.append(params["source_id"])
+    if "min_score" in params:
+        where.append("score >= ?")
+        args.append(params["min_score"])
+    if "days" in params:
+        where.append("published_at >= ?")
+        args.append(str(datetime.utcnow() - timedelta(days=params["days"])))
+    return f"SELECT id FROM news_items WHERE {' AND '.join(where) or '1'} ORDER BY id DESC LIMIT 50", args
+
+def best_ms(fn, repeat: int):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        ms = (time.perf_counter() - t0) * 1000
+        best = ms if best is None else min(best, ms)
+    return best, out
+
+async def best_ms_async(fn, repeat: int):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = await fn()
+        ms = (time.perf_counter() - t0) * 1000
+        best = ms if best is None else min(best, ms)
+    return best, out
+
+async def run(path: str, repeat: int):
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    from app.db import SessionLocal, engine
+    from app.services import search
+
+    con = sqlite3.connect(path)
+    print(f"{'query':<24} {'rows':>5} {'page 1 ms':>10} {'page 20 ms':>11} {'LIKE ms':>9}")
+    async with SessionLocal() as session:
+        for name, p in QUERIES:
+            kw = {k: v for k, v in p.items() if k != "days"}
+            if "days" in p:
+                kw["since"] = datetime.utcnow() - timedelta(days=p["days"])
+
+            async def page(before=None):
+                return await search.search_news(session, before_id=before, limit=50, **kw)
+
+            best, first = await best_ms_async(page, repeat)
+            # страница 20: курсор берётся из 19 предыдущих, как при листании по Link
+            rows = first
+            for _ in range(19):
+                if len(rows) < 50:
+                    break
+                rows = await page(rows[-1]["id"])
+            deep = float("nan")
+            if len(rows) == 50:
+                cursor = rows[-1]["id"]
+                deep, _ = await best_ms_async(lambda: page(cursor), repeat)
+            sql, args = like_sql(p)
+            like, _ = best_ms(lambda: con.execute(sql, args).fetchall(), max(1, repeat // 2))
+            print(f"{name:<24} {len(first):>5} {best:>10.1f} {deep:>11.1f} {like:>9.0f}")
+    con.close()
+    await engine.dispose()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--db", help="reuse/keep the database at this path")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+    path = args.db or os.path.join(tempfile.mkdtemp(), f"news_{args.rows}.db")
+    if not os.path.exists(path):
+        build_db(path, args.rows)
+    asyncio.run(run(path, args.repeat))
+
+if __name__ == "__main__":
+    main()
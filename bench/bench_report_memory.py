@@ -0,0 +1,169 @@
+"""
+Память сборки отчёта: полные ORM-строки NewsItem (как было) против проекции
+колонок в SignalRow (services/reports.py: load_signal_rows).
+
+    python -m bench.bench_report_memory [--sizes 10000,100000,1000000] [--transcripts 0.02]
+
+Для каждого размера — SQLite с N строками за 30 дней (30% сигналов, у доли
+--transcripts строк в raw транскрипт на 15k символов, как у YouTube-источников).
+Каждый режим — в отдельном процессе: прирост пикового RSS на precompute_report,
+пик tracemalloc и число живых блоков аллокатора, удерживаемых выборкой.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+WORDS = ("граница дроны ПВО учения НАТО Эстония Латвия Литва министр заявил самолёт ракета "
+         "кибератака порт транзит энергетика Балтия правительство рынок").split()
+
+def build_db(path: str, n: int, transcript_share: float, seed: int = 7):
+    from sqlalchemy import create_engine
+    from app.analyzer.dedup import signature
+    from app.db import Base
+    import app.models  # noqa: F401 — таблицы в metadata
+
+    eng = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(eng)
+    eng.dispose()
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    transcript = " ".join(rnd.choice(WORDS) for _ in range(2200))[:15000]
+    # подписи сюжетов: пул на ~2% уникальных сюжетов, как после склейки дублей
+    titles = [" ".join(rnd.choice(WORDS) for _ in range(9)) for _ in range(2000)]
+    sigs = [signature(t, "") for t in titles]
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=OFF")
+    con.execute("PRAGMA synchronous=OFF")
+    con.executemany("INSERT INTO sources (id, name, url, type, country, org, priority, fail_streak, idle_streak, publish_rate) "
+                    "VALUES (?, ?, ?, 'rss', 'EE', 'MEDIA', ?, 0, 0, 0)",
+                    [(i, f"src{i}", f"https://s{i}.example/rss", 1 + i % 10) for i in range(1, 41)])
+    batch = []
+    for i in range(1, n + 1):
+        k = rnd.randrange(len(titles))
+        score = rnd.choice((1, 1, 2, 3)) if rnd.random() < 0.3 else 0
+        raw = {"summary": " ".join(rnd.choice(WORDS) for _ in range(60)), "score": score}
+        if rnd.random() < transcript_share:
+            raw["transcript"] = transcript
+        batch.append((i, 1 + i % 40, titles[k], f"https://news.example/{i}", now - timedelta(seconds=rnd.uniform(0, 30 * 86400)),
+                      "ru", json.dumps(raw, ensure_ascii=False), score, "border" if score else None,
+                      "border" if score else "", "EE", "MEDIA", sigs[k]))
+        if len(batch) >= 20000:
+            con.executemany("INSERT INTO news_items (id, source_id, title, url, published_at, lang, raw, score, bucket, "
+                            "buckets, country, org, minhash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        con.executemany("INSERT INTO news_items (id, source_id, title, url, published_at, lang, raw, score, bucket, "
+                        "buckets, country, org, minhash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    con.commit()
+    con.close()
+
+def _status_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+def reset_peak_rss() -> int:
+    """Сбросить пиковый RSS процесса (Linux: clear_refs 5) -> текущий RSS, КБ."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _status_kb("VmRSS")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def peak_rss() -> int:
+    return _status_kb("VmHWM") or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+async def legacy_rows(session, since, limit=900):
+    # как было: полные ORM-объекты, raw (с транскриптами) целиком
+    from sqlalchemy import select
+    from app.models import NewsItem
+    return (await session.execute(
+        select(NewsItem)
+        .where(NewsItem.published_at >= since.replace(tzinfo=None), NewsItem.score >= 1)
+        .order_by(NewsItem.score.desc(), NewsItem.published_at.desc())
+        .limit(limit)
+    )).scalars().all()
+
+async def child(mode: str, trace: bool) -> dict:
+    import gc
+    import tracemalloc
+    from app.db import SessionLocal, engine
+    from app.services import reports
+
+    if mode == "orm":
+        reports.load_signal_rows = legacy_rows
+    async with SessionLocal() as session:
+        await session.execute(reports.select(reports.Source.id))  # соединение и кеш схемы — до замера
+        since = datetime.utcnow() - timedelta(hours=48)
+        # весь precompute_report: выборка, сюжеты, упаковка
+        gc.collect()
+        rss0 = reset_peak_rss()
+        if trace:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        sections, meta = await reports.precompute_report(session, window_h=48)
+        dt = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+        rss = peak_rss() - rss0
+        if trace:
+            tracemalloc.stop()
+        session.expunge_all()
+        # блоки, которые держит сама выборка
+        gc.collect()
+        blocks0 = sys.getallocatedblocks()
+        rows = await reports.load_signal_rows(session, since)
+        blocks, n_rows = sys.getallocatedblocks() - blocks0, len(rows)
+    await engine.dispose()
+    return {"rss_kb": rss, "peak_kb": peak // 1024, "blocks": blocks, "rows": n_rows,
+            "used": meta["used"], "ms": dt * 1000}
+
+def run_child(db: str, mode: str, trace: bool) -> dict:
+    env = {**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{db}", "USE_HISTORICAL_PRIORS": "0"}
+    out = subprocess.run([sys.executable, "-m", "bench.bench_report_memory", "--child", mode] + (["--trace"] if trace else []),
+                         env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--transcripts", type=float, default=0.02, help="share of rows with a 15k-char transcript")
+    ap.add_argument("--dir", default="", help="keep generated DBs here (reused if present)")
+    ap.add_argument("--child", choices=("orm", "slots"), help=argparse.SUPPRESS)
+    ap.add_argument("--trace", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(child(args.child, args.trace))))
+        return
+
+    d = args.dir or tempfile.mkdtemp()
+    for n in map(int, args.sizes.split(",")):
+        db = os.path.join(d, f"report_{n}_{args.transcripts}.db")
+        if not os.path.exists(db):
+            t0 = time.perf_counter()
+            build_db(db, n, args.transcripts)
+            print(f"[bench] built {db} ({os.path.getsize(db) / 2**20:.0f} MB) in {time.perf_counter() - t0:.0f}s")
+        res = {}
+        for mode in ("orm", "slots"):
+            r = run_child(db, mode, trace=False)
+            r["peak_kb"] = run_child(db, mode, trace=True)["peak_kb"]
+            res[mode] = r
+        o, s = res["orm"], res["slots"]
+        print(f"n={n:>8}: rows={s['rows']} | ORM: RSS +{o['rss_kb'] / 1024:6.1f} MB, traced peak {o['peak_kb'] / 1024:6.1f} MB,"
+              f" {o['blocks']:>7} blocks, {o['ms']:6.0f} ms | slots: RSS +{s['rss_kb'] / 1024:5.1f} MB,"
+              f" traced peak {s['peak_kb'] / 1024:5.1f} MB, {s['blocks']:>6} blocks, {s['ms']:5.0f} ms")
+
+if __name__ == "__main__":
+    main()
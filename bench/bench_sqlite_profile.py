@@ -0,0 +1,121 @@
+"""
+API и планировщик на одной SQLite: профиль app/db.py (WAL, synchronous=NORMAL,
+mmap, busy_timeout) против умолчаний (rollback-журнал, synchronous=FULL).
+
+    python -m bench.bench_sqlite_profile [--seconds 15] [--batch 200] [--readers 2]
+
+Два режима, у каждого своя БД. Одновременно работают:
+- процесс-писатель — ингест пакетами по --batch строк (bulk_insert_items + commit), как планировщик;
+- --readers процессов-читателей — выборка сигналов отчёта за 48 ч и счётчик строк, как API.
+Итог: строк/с у писателя, время пакета и отдельно коммита, задержки чтения
+(p50/p99/max) и ошибки «database is locked». На одном ядре разница
+упирается в CPU Python; на диске с медленным fsync — в коммиты.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+MODES = {
+    "default": {"SQLITE_WAL": "0", "SQLITE_SYNCHRONOUS": "FULL", "SQLITE_MMAP_MB": "0"},
+    "profile": {},
+}
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(int(len(xs) * p), len(xs) - 1)] if xs else 0.0
+
+async def writer(seconds: float, batch: int) -> dict:
+    from app.db import SessionLocal, engine
+    from app.services.ingest import bulk_insert_items, news_row
+    rnd = random.Random(os.getpid())
+    n, lat, commit, errors = 0, [], [], 0
+    t_end = time.perf_counter() + seconds
+    async with SessionLocal() as session:
+        while time.perf_counter() < t_end:
+            rows = [news_row(1 + rnd.randrange(40), {
+                "title": f"title {rnd.random()}", "url": f"https://w.example/{os.getpid()}/{n + i}",
+                "published_at": datetime.utcnow() - timedelta(minutes=rnd.uniform(0, 2880)),
+                "raw": {"summary": "x" * 400}, "score": rnd.choice((0, 0, 1, 2)), "bucket": "border",
+                "minhash": b"\0" * 64,  # подпись есть — читатель не считает её сам
+            }) for i in range(batch)]
+            t0 = time.perf_counter()
+            try:
+                await bulk_insert_items(session, rows)
+                t1 = time.perf_counter()
+                await session.commit()
+                commit.append(time.perf_counter() - t1)
+                n += batch
+            except Exception:
+                await session.rollback()
+                errors += 1
+            lat.append(time.perf_counter() - t0)
+    await engine.dispose()
+    return {"rows": n, "batch_p50": pct(lat, 0.5), "commit_p50": pct(commit, 0.5), "commit_p99": pct(commit, 0.99),
+            "errors": errors}
+
+async def reader(seconds: float) -> dict:
+    from sqlalchemy import func, select
+    from app.db import SessionLocal, engine
+    from app.models import NewsItem
+    from app.services.reports import load_signal_rows
+    lat, errors = [], 0
+    t_end = time.perf_counter() + seconds
+    while time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        try:
+            async with SessionLocal() as session:  # как запрос API: своя сессия
+                await load_signal_rows(session, datetime.utcnow() - timedelta(hours=48))
+                await session.execute(select(func.count()).select_from(NewsItem))
+        except Exception:
+            errors += 1
+        lat.append(time.perf_counter() - t0)
+        await asyncio.sleep(0.005)
+    await engine.dispose()
+    return {"queries": len(lat), "p50": pct(lat, 0.5), "p99": pct(lat, 0.99), "max": max(lat, default=0), "errors": errors}
+
+def run_mode(mode: str, args) -> dict:
+    db = os.path.join(tempfile.mkdtemp(), f"{mode}.db")
+    env = {**os.environ, **MODES[mode], "DATABASE_URL": f"sqlite+aiosqlite:///{db}", "SEEN_FILTER": "0",
+           "BLOB_MIN_BYTES": "0", "RETENTION_DAYS": "0"}
+    subprocess.run([sys.executable, "-m", "app.migrate"], env=env, check=True, capture_output=True)
+    base = [sys.executable, "-m", "bench.bench_sqlite_profile", "--seconds", str(args.seconds), "--batch", str(args.batch)]
+    procs = [subprocess.Popen(base + ["--child", "writer"], env=env, stdout=subprocess.PIPE, text=True)]
+    procs += [subprocess.Popen(base + ["--child", "reader"], env=env, stdout=subprocess.PIPE, text=True)
+              for _ in range(args.readers)]
+    out = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+    readers = out[1:]
+    return {"writer": out[0],
+            "reader": {"queries": sum(r["queries"] for r in readers), "p50": max(r["p50"] for r in readers),
+                       "p99": max(r["p99"] for r in readers), "max": max(r["max"] for r in readers),
+                       "errors": sum(r["errors"] for r in readers)}}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=15)
+    ap.add_argument("--batch", type=int, default=200)
+    ap.add_argument("--readers", type=int, default=2)
+    ap.add_argument("--child", choices=("writer", "reader"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        res = asyncio.run(writer(args.seconds, args.batch) if args.child == "writer" else reader(args.seconds))
+        print(json.dumps(res))
+        return
+
+    for mode in MODES:
+        r = run_mode(mode, args)
+        w, q = r["writer"], r["reader"]
+        print(f"{mode:>8}: writer {w['rows'] / args.seconds:7.0f} rows/s, batch p50 {w['batch_p50'] * 1000:6.1f} ms,"
+              f" commit p50 {w['commit_p50'] * 1000:6.2f} ms"
+              f" p99 {w['commit_p99'] * 1000:7.1f} ms, errors {w['errors']} | readers {q['queries']:5} queries,"
+              f" p50 {q['p50'] * 1000:6.1f} ms p99 {q['p99'] * 1000:7.1f} ms max {q['max'] * 1000:7.1f} ms, errors {q['errors']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Бенчмарк векторизованной аналитики трендов (app/analyzer/vectorized.py).
+
+    python -m bench.bench_trends [--sizes 100000,300000,1000000] [--days 90]
+
+Синтетические сигналы за окно истории: наклоны, всплески и совпадения тем
+на колонках NumPy против текущего summarize_trends (циклы по Sig).
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.analyzer.context_tracker import KEY_BUCKETS, Sig, summarize_trends
+from app.analyzer.vectorized import SignalFrame, bucket_slopes, bursts, cooccurrence
+
+BUCKETS = [k for k, _ in KEY_BUCKETS]
+COUNTRIES = ["EE", "LV", "LT", "PL", "FI", "UA", "EU", "NATO"]
+
+def synth(n: int, days: int, now: datetime, seed: int = 3) -> SignalFrame:
+    rnd = np.random.default_rng(seed)
+    ts = now.timestamp() - rnd.uniform(0, days * 86400, n)
+    bucket = rnd.integers(0, len(BUCKETS), n).astype(np.int32)
+    # всплеск: кибер за последние сутки
+    burst = rnd.random(n) < 0.01
+    ts[burst] = now.timestamp() - rnd.uniform(0, 86400, burst.sum())
+    bucket[burst] = BUCKETS.index("cyber")
+    return SignalFrame(ts, rnd.integers(1, 4, n).astype(np.float64), np.ones(n),
+                       bucket, rnd.integers(0, len(COUNTRIES), n).astype(np.int32), BUCKETS, COUNTRIES)
+
+def best_ms(fn, rounds: int = 5) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100000,300000,1000000")
+    ap.add_argument("--days", type=int, default=90)
+    ap.add_argument("--legacy-max", type=int, default=300000, help="skip summarize_trends above this size")
+    args = ap.parse_args()
+    now = datetime.now(timezone.utc)
+
+    for n in map(int, args.sizes.split(",")):
+        f = synth(n, args.days, now)
+        t_slope = best_ms(lambda f=f: bucket_slopes(f, now, days=args.days))
+        t_burst = best_ms(lambda f=f: bursts(f, now, window_h=24, baseline_days=args.days))
+        t_co = best_ms(lambda f=f: cooccurrence(f, now, within_days=10, horizon_days=args.days))
+        line = f"n={n:>8}: slopes {t_slope:7.1f} ms | bursts {t_burst:6.1f} ms | co-occurrence {t_co:6.1f} ms"
+        if n <= args.legacy_max:
+            sigs = [Sig(t=datetime.fromtimestamp(t, timezone.utc), title="", url="", org="",
+                        country=COUNTRIES[c], bucket=BUCKETS[b], weight=int(w))
+                    for t, b, c, w in zip(f.ts, f.bucket, f.country, f.weight)]
+            t_old = best_ms(lambda sigs=sigs: summarize_trends(sigs, now, days=args.days), rounds=2)
+            line += f" | legacy summarize_trends {t_old:8.1f} ms"
+        print(line)
+        if n == int(args.sizes.split(",")[0]):
+            print("  bursts:", [(b, c, round(z, 1)) for b, c, _, z in bursts(f, now, baseline_days=args.days)])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Локальная проверка аренд: несколько процессов-воркеров на одной БД.
+
+    python -m bench.demo_leases [--workers 3] [--sources 40] [--seconds 30]
+    python -m bench.demo_leases --db postgresql+asyncpg://localhost/alertbox_demo
+
+Поднимает локальный RSS-сервер с --sources лентами, запускает воркеры
+(как `python -m app.scheduler`, только опрос + блокировка отчёта) и через
+треть времени убивает первый (SIGKILL, аренды не отпущены). В конце:
+- двойные опросы: одна лента запрошена двумя запросами ближе POLL_MIN_S;
+- число блокировок отчёта, взятых воркерами (должна быть одна);
+- реклейм: аренды убитого воркера подхвачены остальными.
+"""
+import argparse
+import asyncio
+import http.server
+import os
+import signal
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+HITS = defaultdict(list)  # путь -> [время запроса]
+
+class Feeds(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        HITS[self.path].append(time.monotonic())
+        # новая запись раз в 5 секунд — лентам есть что отдавать
+        n = int(time.time() // 5)
+        items = "".join(
+            f"<item><title>feed {self.path} item {k}</title><link>http://demo{self.path}/{k}</link></item>"
+            for k in range(n - 3, n + 1)
+        )
+        body = f'<?xml version="1.0"?><rss version="2.0"><channel><title>d</title>{items}</channel></rss>'.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *a):
+        pass
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+async def worker(seconds: float):
+    from app.db import SessionLocal
+    from app.services import leases, polling
+
+    async with SessionLocal() as session:
+        if await leases.acquire_lock(session, "report:demo", 3600):
+            print(f"[demo] {leases.WORKER_ID} holds report:demo", flush=True)
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        async with SessionLocal() as session:
+            res = await polling.poll_once(session)
+            if res["sources"]:
+                print(f"[demo] {leases.WORKER_ID} polled {res['sources']}", flush=True)
+        await asyncio.sleep(0.5)
+
+async def setup(n: int, port: int):
+    from app.db import Base, SessionLocal, engine
+    from app.models import Source
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as session:
+        session.add_all([
+            Source(name=f"demo{i}", url=f"http://127.0.0.1:{port}/f{i}", type="rss", priority=1 + i % 10)
+            for i in range(n)
+        ])
+        await session.commit()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=3)
+    ap.add_argument("--sources", type=int, default=40)
+    ap.add_argument("--seconds", type=float, default=30)
+    ap.add_argument("--db", default="")
+    ap.add_argument("--port", type=int, default=8791)
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        asyncio.run(worker(args.seconds))
+        return
+
+    db = args.db or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/demo.db"
+    env = {**os.environ, "DATABASE_URL": db, "POLL_MIN_S": "3", "POLL_MAX_S": "8", "LEASE_S": "20", "POLL_BATCH": "8",
+           "ALERTS": "0", "TELEGRAM_BOT_TOKEN": "", "PYTHONUNBUFFERED": "1"}
+    os.environ.update(env)
+    srv = Server(("127.0.0.1", args.port), Feeds)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    asyncio.run(setup(args.sources, args.port))
+
+    cmd = [sys.executable, "-m", "bench.demo_leases", "--worker", "--seconds", str(args.seconds)]
+    procs = [subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+             for _ in range(args.workers)]
+    time.sleep(args.seconds / 3)
+    procs[0].send_signal(signal.SIGKILL)
+    print(f"[demo] killed worker pid={procs[0].pid}")
+    outputs = [p.communicate()[0] for p in procs]
+    srv.shutdown()
+
+    log = "".join(outputs)
+    if os.getenv("DEMO_VERBOSE"): print(log)
+    doubles = sum(1 for ts in HITS.values() for a, b in zip(ts, ts[1:]) if b - a < 1.0)
+    print(f"workers={args.workers} sources={args.sources} requests={sum(map(len, HITS.values()))}")
+    print(f"feeds polled: {len(HITS)}/{args.sources}; double polls (<1s apart): {doubles}")
+    print(f"report lock holders: {log.count('holds report:demo')}")
+    print(f"stale lease reclaims logged: {log.count('reclaimed')}")
+    per_worker = defaultdict(int)
+    for line in log.splitlines():
+        if " polled " in line:
+            per_worker[line.split()[1]] += int(line.split()[-1])
+    print("polls per worker:", dict(per_worker))
+    for line in log.splitlines():
+        if "reclaimed" in line or "error" in line.lower():
+            print("  " + line)
+
+if __name__ == "__main__":
+    main()